@@ -3,6 +3,7 @@ Dev Agent - Development Agent
 重构后集成BaseAgent，支持TaskGroup和SDKExecutor
 """
 
+import asyncio
 import logging
 import os
 import re
@@ -13,9 +14,12 @@ from typing import Any, Optional, cast
 from anyio.abc import TaskGroup
 
 from autoBMAD.epic_automation.agents.base_agent import BaseAgent
+from autoBMAD.epic_automation.change_tracker import story_change_tracker
 
 # Import LogManager for runtime use
 from autoBMAD.epic_automation.log_manager import LogManager
+from autoBMAD.epic_automation.story_document import StoryDocument
+from autoBMAD.epic_automation.workspace_snapshot import WorkspaceSnapshot
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +32,7 @@ class DevAgent(BaseAgent):
         task_group: Optional[TaskGroup] = None,
         use_claude: bool = True,
         log_manager: Optional[LogManager] = None,
+        watch_dirs: Optional[list[str]] = None,
     ):
         """
         Initialize Dev agent.
@@ -36,9 +41,12 @@ class DevAgent(BaseAgent):
             task_group: TaskGroup实例
             use_claude: If True, use Claude Code CLI for real implementation
             log_manager: Optional LogManager instance for logging
+            watch_dirs: Directories whose changes are recorded for QA
+                (default: current directory)
         """
         super().__init__("DevAgent", task_group, log_manager)
         self.use_claude = use_claude
+        self.watch_dirs = watch_dirs or [os.getcwd()]
         self._claude_available = (
             self._check_claude_available() if use_claude else False
         )
@@ -122,15 +130,20 @@ class DevAgent(BaseAgent):
             # 读取故事内容
             story_file = Path(story_path)
             if story_file.exists():
-                story_content = story_file.read_text(encoding="utf-8")
-                requirements = await self._extract_requirements(story_content)
+                requirements = await self._extract_requirements(
+                    StoryDocument.load(story_file)
+                )
 
-                # 执行开发任务
+                # 执行开发任务，并记录本次改动的文件供 QA 使用
+                before = await asyncio.to_thread(WorkspaceSnapshot.take, self.watch_dirs)
                 development_success = await self._execute_development_tasks(
                     requirements, story_path
                 )
+                after = await asyncio.to_thread(WorkspaceSnapshot.take, self.watch_dirs)
+                changes = story_change_tracker.record_dev_changes(story_path, before, after)
                 self._log_execution(
-                    f"Development tasks executed (result={development_success})"
+                    f"Development tasks executed (result={development_success}). "
+                    f"{changes.describe()}"
                 )
             else:
                 self._log_execution(f"Story file not found: {story_path}", "warning")
@@ -183,112 +196,31 @@ class DevAgent(BaseAgent):
             )
             return True
 
-    async def _extract_requirements(self, story_content: str) -> dict[str, Any]:
-        """提取需求 - 保持现有实现"""
+    async def _extract_requirements(
+        self, story_content: str | StoryDocument
+    ) -> dict[str, Any]:
+        """提取需求 - 基于 StoryDocument 单次解析"""
         try:
-            # Basic requirement extraction from markdown
+            document = (
+                story_content
+                if isinstance(story_content, StoryDocument)
+                else StoryDocument.from_content(story_content)
+            )
             requirements: dict[str, Any] = {
-                "title": "",
-                "acceptance_criteria": [],
-                "tasks": [],
-                "subtasks": [],
+                "title": document.title,
+                "acceptance_criteria": list(document.acceptance_criteria),
+                "tasks": [line for line in document.tasks if line.startswith("- [ ]")],
+                "subtasks": list(document.subtasks),
                 "dev_notes": {},
                 "testing": {},
             }
 
-            # Extract title
-            title_match = re.search(r"^# .+:(.+)$", story_content, re.MULTILINE)
-            if title_match:
-                requirements["title"] = title_match.group(1).strip()
-            else:
-                # Try alternative pattern
-                title_match = re.search(
-                    r"^# Story \d+:\s*(.+)$", story_content, re.MULTILINE
-                )
-                if title_match:
-                    requirements["title"] = title_match.group(1).strip()
-
-            # Extract acceptance criteria
-            ac_section = re.search(
-                r"## Acceptance Criteria\n(.*?)(?=\n##|\Z)", story_content, re.DOTALL
-            )
-            if ac_section:
-                ac_lines = ac_section.group(1).strip().split("\n")
-                for line in ac_lines:
-                    if line.strip() and re.match(r"^\d+\.", line.strip()):
-                        acceptance_criteria = cast(
-                            list[str], requirements["acceptance_criteria"]
-                        )
-                        acceptance_criteria.append(line.strip())
-            else:
-                # Try alternative pattern with checkboxes
-                ac_section = re.search(
-                    r"## Acceptance Criteria\s*\n(.*?)(?=\n---|\n##|$)",
-                    story_content,
-                    re.DOTALL,
-                )
-                if ac_section:
-                    ac_lines = ac_section.group(1).strip().split("\n")
-                    for line in ac_lines:
-                        if line.strip().startswith("-"):
-                            acceptance_criteria = cast(
-                                list[str], requirements["acceptance_criteria"]
-                            )
-                            acceptance_criteria.append(line.strip())
-
-            # Extract tasks
-            tasks_section = re.search(
-                r"## Tasks / Subtasks\n(.*?)(?=\n##|\Z)", story_content, re.DOTALL
-            )
-            if tasks_section:
-                task_lines = tasks_section.group(1).strip().split("\n")
-                for line in task_lines:
-                    if line.strip().startswith("- [ ]"):
-                        tasks = cast(list[str], requirements["tasks"])
-                        tasks.append(line.strip())
-            else:
-                # Try alternative pattern
-                tasks_section = re.search(
-                    r"## Tasks / Subtasks\s*\n(.*?)(?=\n---|\n##|$)",
-                    story_content,
-                    re.DOTALL,
-                )
-                if tasks_section:
-                    task_lines = tasks_section.group(1).strip().split("\n")
-                    for line in task_lines:
-                        if line.strip().startswith("-"):
-                            tasks = cast(list[str], requirements["tasks"])
-                            tasks.append(line.strip())
-
-            # Extract subtasks (nested)
-            subtask_pattern = r"^\s*-\s*\[x\]\s*(.+)"
-            for line in story_content.split("\n"):
-                if re.match(subtask_pattern, line):
-                    subtasks = cast(list[str], requirements["subtasks"])
-                    subtasks.append(line.strip())
-
-            # Extract dev notes
-            dev_notes_section = re.search(
-                r"## Dev Notes\s*\n(.*?)(?=\n---|\n##|$)", story_content, re.DOTALL
-            )
-            if dev_notes_section:
-                dev_notes = cast(dict[str, str], requirements["dev_notes"])
-                dev_notes["content"] = dev_notes_section.group(1).strip()
-
-            # Extract testing info
-            testing_section = re.search(
-                r"## Testing\s*\n(.*?)(?=\n---|\n##|$)", story_content, re.DOTALL
-            )
-            if testing_section:
-                testing = cast(dict[str, str], requirements["testing"])
-                testing["content"] = testing_section.group(1).strip()
-
-            # Extract Dev Agent Record
-            dev_agent_section = re.search(
-                r"## Dev Agent Record\s*\n(.*?)(?=\n---|\n##|$)", story_content, re.DOTALL
-            )
-            if dev_agent_section:
-                requirements["dev_agent_record"] = dev_agent_section.group(1).strip()
+            if document.section("Dev Notes") is not None:
+                requirements["dev_notes"]["content"] = document.dev_notes
+            if document.section("Testing") is not None:
+                requirements["testing"]["content"] = document.testing
+            if document.section("Dev Agent Record") is not None:
+                requirements["dev_agent_record"] = document.dev_agent_record
 
             # Log with explicit type casting to help type checker
             acceptance_criteria_len = len(
@@ -5,11 +5,13 @@ Pytest目录遍历分批执行器 - 动态扫描版本
 
 from __future__ import annotations
 import logging
-import subprocess
+import re
 from pathlib import Path
 from typing import Any
 from dataclasses import dataclass
 
+from autoBMAD.epic_automation.process_runner import run_command
+
 logger = logging.getLogger(__name__)
 
 
@@ -212,29 +214,31 @@ class PytestBatchExecutor:
         self.logger.info(f"Running: {' '.join(cmd)}")
         self.logger.info(f"Timeout: {batch.timeout}s")
 
-        import asyncio
-
         try:
-            # 执行命令
-            loop = asyncio.get_event_loop()
-
-            process = await asyncio.wait_for(
-                loop.run_in_executor(
-                    None,
-                    lambda: subprocess.run(
-                        cmd,
-                        capture_output=True,
-                        text=True,
-                        timeout=batch.timeout
-                    )
-                ),
-                timeout=batch.timeout + 10
-            )
+            # 执行命令（不经过 shell；超时时终止整个进程树，包括 xdist worker）
+            process = await run_command(cmd, timeout=batch.timeout)
+
+            if process.timed_out:
+                self.logger.error(f"✗ Batch '{batch.name}' TIMEOUT after {batch.timeout}s")
+                return {
+                    "batch_name": batch.name,
+                    "success": False,
+                    "error": f"Timeout after {batch.timeout}s",
+                    "duration": process.duration,
+                    "cpu_seconds": process.cpu_seconds,
+                    "peak_rss_bytes": process.peak_rss_bytes,
+                }
+            if process.error is not None:
+                self.logger.error(f"✗ Batch '{batch.name}' ERROR: {process.error}")
+                return {
+                    "batch_name": batch.name,
+                    "success": False,
+                    "error": process.error
+                }
 
             success = process.returncode == 0
 
             # 解析输出
-            import re
             stdout = process.stdout
 
             tests_passed = 0
@@ -252,7 +256,10 @@ class PytestBatchExecutor:
                 "tests_failed": tests_failed,
                 "returncode": process.returncode,
                 "stdout": stdout,
-                "stderr": process.stderr
+                "stderr": process.stderr,
+                "duration": process.duration,
+                "cpu_seconds": process.cpu_seconds,
+                "peak_rss_bytes": process.peak_rss_bytes,
             }
 
             if success:
@@ -262,13 +269,6 @@ class PytestBatchExecutor:
 
             return result
 
-        except asyncio.TimeoutError:
-            self.logger.error(f"✗ Batch '{batch.name}' TIMEOUT after {batch.timeout}s")
-            return {
-                "batch_name": batch.name,
-                "success": False,
-                "error": f"Timeout after {batch.timeout}s"
-            }
         except Exception as e:
             self.logger.error(f"✗ Batch '{batch.name}' ERROR: {e}")
             return {
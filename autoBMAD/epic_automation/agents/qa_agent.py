@@ -5,12 +5,25 @@ QA Agent - Quality Assurance Agent
 
 from __future__ import annotations
 
+import asyncio
 import logging
+import os
+from pathlib import Path
 from typing import Any, Optional
 
 from anyio.abc import TaskGroup
 
 from autoBMAD.epic_automation.agents.base_agent import BaseAgent
+from autoBMAD.epic_automation.agents.state_agent import (
+    CORE_STATUS_IN_PROGRESS,
+    CORE_STATUS_READY_FOR_DONE,
+    parse_status_from_file,
+)
+from autoBMAD.epic_automation.agents.status_update_agent import (
+    rewrite_status_section,
+    write_text_atomic,
+)
+from autoBMAD.epic_automation.change_tracker import review_digest, story_change_tracker
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +38,7 @@ class QAAgent(BaseAgent):
         task_group: Optional[TaskGroup] = None,
         use_claude: bool = True,
         log_manager: Optional[Any] = None,
+        watch_dirs: Optional[list[str]] = None,
     ):
         """
         初始化QA代理
@@ -33,9 +47,11 @@ class QAAgent(BaseAgent):
             task_group: TaskGroup实例
             use_claude: 是否使用 Claude 进行真实 QA 审查
             log_manager: 日志管理器
+            watch_dirs: 实现代码所在目录（判断上次审查后是否有改动，默认当前目录）
         """
         super().__init__("QAAgent", task_group, log_manager)
         self.use_claude = use_claude
+        self.watch_dirs = watch_dirs or [os.getcwd()]
 
         # 集成SDKExecutor
         self.sdk_executor = None
@@ -94,6 +110,21 @@ class QAAgent(BaseAgent):
         try:
             self._log_execution("Epic Driver has determined this story needs QA review")
 
+            # 0. 故事和代码自上次审查以来均未变化时，直接沿用上次结论
+            digest = await asyncio.to_thread(review_digest, story_path, self.watch_dirs)
+            verdict = story_change_tracker.reusable_verdict(story_path, digest)
+            if verdict and await asyncio.to_thread(self._apply_verdict, story_path, verdict):
+                self._log_execution(
+                    f"No changes since the last QA verdict, reusing it: Status -> {verdict}"
+                )
+                return {
+                    "passed": True,
+                    "completed": True,
+                    "needs_fix": False,
+                    "reused_verdict": verdict,
+                    "message": "QA verdict reused (no changes since last review)",
+                }
+
             # 1. 构造 QA 提示词（BMAD 风格）
             base_prompt = (
                 "@.bmad-core\\agents\\qa.md "
@@ -104,6 +135,10 @@ class QAAgent(BaseAgent):
                 'from "Ready for Review" to "Ready for Done"; '
                 'otherwise change it to "In Progress".'
             )
+            dev_changes = story_change_tracker.last_dev_changes(story_path)
+            if dev_changes is not None:
+                base_prompt += f" {dev_changes.describe()}"
+                self._log_execution(dev_changes.describe())
 
             # 2. 通过 BaseAgent._execute_sdk_call 统一调用 SDK
             sdk_result = await self._execute_sdk_call(
@@ -117,6 +152,9 @@ class QAAgent(BaseAgent):
             if sdk_result and hasattr(sdk_result, 'is_success'):
                 self._log_execution(f"SDK call result: {sdk_result.is_success()}")
 
+            # 记录本次结论及其审查的内容，供之后无改动的复审沿用
+            await asyncio.to_thread(self._record_verdict, story_path)
+
             self._log_execution(
                 "QA execution completed, "
                 "Epic Driver will re-parse status to determine next step"
@@ -143,6 +181,32 @@ class QAAgent(BaseAgent):
                 "message": f"QA execution completed with exception: {str(e)}",
             }
 
+    def _record_verdict(self, story_path: str) -> None:
+        """记录 QA 写入的结论（仅 Ready for Done / In Progress）"""
+        try:
+            status = parse_status_from_file(story_path)
+        except OSError:
+            return
+        if status in (CORE_STATUS_READY_FOR_DONE, CORE_STATUS_IN_PROGRESS):
+            story_change_tracker.record_verdict(
+                story_path, status, review_digest(story_path, self.watch_dirs)
+            )
+
+    def _apply_verdict(self, story_path: str, verdict: str) -> bool:
+        """把沿用的结论写入故事 Status，无法识别布局时返回 False"""
+        try:
+            path = Path(story_path)
+            with open(path, encoding="utf-8", newline="") as f:
+                content = f.read()
+            new_content = rewrite_status_section(content, verdict)
+            if new_content is None:
+                return False
+            write_text_atomic(path, new_content)
+            return True
+        except OSError as e:
+            self._log_execution(f"Failed to apply reused verdict: {e}", "warning")
+            return False
+
     async def execute_qa_phase(
         self,
         story_path: str,
@@ -4,11 +4,11 @@ Quality Agents - 重构后的质量检查 Agents
 """
 from __future__ import annotations
 
-import asyncio
 import json
 import logging
-import subprocess
+import os
 from abc import ABC
+from collections.abc import Sequence
 from pathlib import Path
 from typing import Any, TypedDict, NotRequired, Literal, cast
 
@@ -16,6 +16,13 @@ from anyio.abc import TaskGroup
 
 from autoBMAD.epic_automation.agents.base_agent import BaseAgent
 from autoBMAD.epic_automation.core.sdk_result import SDKResult
+from autoBMAD.epic_automation.process_runner import (
+    DEFAULT_MAX_OUTPUT_BYTES,
+    LineCallback,
+    json_lines,
+    run_command,
+)
+from autoBMAD.epic_automation.pyright_session import PyrightSessionError, pyright_sessions
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +36,10 @@ class SubprocessResult(TypedDict):
     success: bool
     error: NotRequired[str]
     command: NotRequired[str]
+    duration: NotRequired[float]
+    cpu_seconds: NotRequired[float | None]
+    peak_rss_bytes: NotRequired[int | None]
+    truncated: NotRequired[bool]
 
 
 class RuffIssue(TypedDict):
@@ -104,53 +115,45 @@ class BaseQualityAgent(BaseAgent, ABC):
         super().__init__(name, task_group)
         self._log_execution(f"{name} initialized")
 
-    async def _run_subprocess(self, command: str, timeout: int = 300) -> SubprocessResult:
+    @staticmethod
+    def _targets(source_dir: str, files: list[str] | None = None) -> list[str]:
         """
-        运行子进程命令
+        命令行检查目标：指定 files 时为其中存在的文件，否则为 source_dir
 
         Args:
-            command: 要执行的命令
+            source_dir: 源代码目录
+            files: 仅检查这些文件（回归检查）
+        """
+        if files is None:
+            return [source_dir]
+        return [f for f in files if os.path.isfile(f)]
+
+    async def _run_subprocess(
+        self,
+        args: Sequence[str],
+        timeout: int = 300,
+        on_stdout_line: LineCallback | None = None,
+        max_output_bytes: int = DEFAULT_MAX_OUTPUT_BYTES,
+    ) -> SubprocessResult:
+        """
+        运行子进程命令（不经过 shell；超时时终止整个进程树）
+
+        Args:
+            args: 命令及参数
             timeout: 超时时间（秒）
+            on_stdout_line: 逐行接收 stdout（此时结果中 stdout 为空）
+            max_output_bytes: 每个输出流最多保留的字节数
 
         Returns:
-            SubprocessResult: 执行结果
+            SubprocessResult: 执行结果（含耗时、CPU 时间和峰值内存）
         """
+        command = " ".join(args)
         try:
-            # 在线程池中运行子进程，避免 cancel scope 传播
-            loop = asyncio.get_event_loop()
-            process = await asyncio.wait_for(
-                loop.run_in_executor(
-                    None,
-                    lambda: subprocess.run(
-                        command,
-                        shell=True,
-                        capture_output=True,
-                        text=True,
-                        encoding='utf-8',
-                        errors='ignore',
-                        timeout=timeout
-                    )
-                ),
-                timeout=timeout + 10  # 额外增加10秒的超时保护
-            )
-
-            return SubprocessResult(
-                status="completed",
-                returncode=process.returncode,
-                stdout=process.stdout,
-                stderr=process.stderr,
-                success=process.returncode == 0
-            )
-        except TimeoutError:
-            self.logger.error(f"Command timed out after {timeout} seconds: {command}")
-            return SubprocessResult(
-                status="failed",
-                returncode=-1,
-                stdout="",
-                stderr=f"Timeout after {timeout} seconds",
-                success=False,
-                error=f"Timeout after {timeout} seconds",
-                command=command
+            result = await run_command(
+                args,
+                timeout=timeout,
+                on_stdout_line=on_stdout_line,
+                max_output_bytes=max_output_bytes,
             )
         except Exception as e:
             self.logger.error(f"Command failed: {e}")
@@ -164,6 +167,27 @@ class BaseQualityAgent(BaseAgent, ABC):
                 command=command
             )
 
+        subprocess_result = SubprocessResult(
+            status="completed",
+            returncode=result.returncode,
+            stdout=result.stdout,
+            stderr=result.stderr,
+            success=result.success,
+            duration=result.duration,
+            cpu_seconds=result.cpu_seconds,
+            peak_rss_bytes=result.peak_rss_bytes,
+            truncated=result.truncated,
+        )
+        if result.error is not None:
+            if result.timed_out:
+                self.logger.error(f"Command timed out after {timeout} seconds: {command}")
+            subprocess_result["status"] = "failed"
+            subprocess_result["error"] = result.error
+            subprocess_result["command"] = command
+            if not result.stderr:
+                subprocess_result["stderr"] = result.error
+        return subprocess_result
+
 
 class RuffAgent(BaseQualityAgent):
     """Ruff 代码风格检查 Agent（改造版 - 支持SDK自动修复）"""
@@ -175,6 +199,7 @@ class RuffAgent(BaseQualityAgent):
         self,
         source_dir: str,
         project_root: str | None = None,
+        files: list[str] | None = None,
         **kwargs: object
     ) -> RuffResult:
         """
@@ -183,44 +208,56 @@ class RuffAgent(BaseQualityAgent):
         Args:
             source_dir: 源代码目录
             project_root: 项目根目录
+            files: 仅检查这些文件（回归检查）；None 检查整个 source_dir
 
         Returns:
             RuffResult: 检查结果
         """
-        self.logger.info("Running Ruff checks with auto-fix")
+        if files is not None and not self._targets(source_dir, files):
+            return RuffResult(
+                status="completed",
+                errors=0,
+                warnings=0,
+                files_checked=0,
+                issues=[],
+                message="No files to check"
+            )
+
+        if files is None:
+            self.logger.info("Running Ruff checks with auto-fix")
+        else:
+            self.logger.info(f"Running Ruff checks with auto-fix on {len(files)} file(s)")
 
         try:
-            # 构建 Ruff 命令（增加 --fix）
-            command = f"ruff check --fix --output-format=json {source_dir}"
+            # 构建 Ruff 命令（增加 --fix；json-lines 输出逐行解析）
+            command = [
+                "ruff", "check", "--fix", "--output-format=json-lines",
+                *self._targets(source_dir, files),
+            ]
 
-            result = await self._run_subprocess(command)
+            issues_list: list[dict[str, object]] = []
+            result = await self._run_subprocess(
+                command,
+                on_stdout_line=json_lines(
+                    lambda issue: issues_list.append(cast(dict[str, object], issue))
+                ),
+            )
 
-            if result["status"] == "completed":
-                # 解析 JSON 输出
-                try:
-                    issues_list: list[dict[str, object]] = json.loads(result["stdout"]) if result["stdout"] else []
-                    error_count = len([i for i in issues_list if i.get("severity") == "error"])
-                    warning_count = len([i for i in issues_list if i.get("severity") == "warning"])
-                    filenames = {i.get("filename", "") for i in issues_list}
-                    files_count = len(filenames)
+            # ruff 退出码：0 无问题，1 有问题，其他为运行错误
+            if result["status"] == "completed" and result["returncode"] in (0, 1):
+                error_count = len([i for i in issues_list if i.get("severity") == "error"])
+                warning_count = len([i for i in issues_list if i.get("severity") == "warning"])
+                filenames = {i.get("filename", "") for i in issues_list}
+                files_count = len(filenames)
 
-                    return RuffResult(
-                        status="completed",
-                        errors=error_count,
-                        warnings=warning_count,
-                        files_checked=files_count,
-                        issues=issues_list,
-                        message=f"Found {len(issues_list)} issues (after auto-fix)"
-                    )
-                except json.JSONDecodeError:
-                    return RuffResult(
-                        status="completed",
-                        errors=0,
-                        warnings=0,
-                        files_checked=0,
-                        issues=[],
-                        message="Check completed (no JSON output)"
-                    )
+                return RuffResult(
+                    status="completed",
+                    errors=error_count,
+                    warnings=warning_count,
+                    files_checked=files_count,
+                    issues=issues_list,
+                    message=f"Found {len(issues_list)} issues (after auto-fix)"
+                )
             else:
                 return RuffResult(
                     status="failed",
@@ -338,8 +375,7 @@ class RuffAgent(BaseQualityAgent):
         self.logger.info("Running ruff format")
 
         try:
-            command = f"ruff format {source_dir}"
-            result = await self._run_subprocess(command)
+            result = await self._run_subprocess(["ruff", "format", source_dir])
 
             formatted = result["returncode"] == 0
 
@@ -358,29 +394,77 @@ class RuffAgent(BaseQualityAgent):
             }
 
 
+# basedpyright 输出单个 JSON 对象，无法逐行解析，因此放宽捕获上限
+BASEDPYRIGHT_MAX_OUTPUT_BYTES = 128 * 1024 * 1024
+
+
 class BasedPyrightAgent(BaseQualityAgent):
     """BasedPyright 类型检查 Agent（改造版 - 支持SDK自动修复）"""
 
-    def __init__(self, task_group: TaskGroup | None = None):
+    def __init__(self, task_group: TaskGroup | None = None, warm: bool = False):
+        """
+        Args:
+            task_group: TaskGroup实例
+            warm: 指定 files 时使用常驻 basedpyright-langserver 会话检查
+                （每个源代码目录一个进程，只重新检查变更的文件）
+        """
         super().__init__("BasedPyright", task_group)
+        self.warm = warm
 
-    async def execute(self, source_dir: str, **kwargs: object) -> BasedPyrightResult:
+    async def execute(
+        self,
+        source_dir: str,
+        files: list[str] | None = None,
+        **kwargs: object
+    ) -> BasedPyrightResult:
         """
         执行 BasedPyright 检查
 
         Args:
             source_dir: 源代码目录
+            files: 仅检查这些文件（回归检查）；None 检查整个 source_dir。
+                warm 模式下由常驻语言服务器检查
 
         Returns:
             BasedPyrightResult: 检查结果
         """
-        self.logger.info("Running BasedPyright checks")
+        if files is not None and not self._targets(source_dir, files):
+            return BasedPyrightResult(
+                status="completed",
+                errors=0,
+                warnings=0,
+                files_checked=0,
+                issues=[],
+                message="No files to check"
+            )
+
+        if files is not None and self.warm:
+            warm_result = await self._execute_warm(source_dir, files)
+            if warm_result is not None:
+                return warm_result
+
+        if files is None:
+            self.logger.info("Running BasedPyright checks")
+        else:
+            self.logger.info(f"Running BasedPyright checks on {len(files)} file(s)")
 
         try:
             # 构建 BasedPyright 命令
-            command = f"basedpyright --outputjson {source_dir}"
+            command = ["basedpyright", "--outputjson", *self._targets(source_dir, files)]
 
-            result = await self._run_subprocess(command)
+            result = await self._run_subprocess(command, max_output_bytes=BASEDPYRIGHT_MAX_OUTPUT_BYTES)
+
+            if result.get("truncated"):
+                # 截断的 JSON 无法解析，不能当作“无错误”
+                return BasedPyrightResult(
+                    status="failed",
+                    errors=0,
+                    warnings=0,
+                    files_checked=0,
+                    issues=[],
+                    message="BasedPyright output exceeded the capture limit",
+                    error="BasedPyright output exceeded the capture limit"
+                )
 
             if result["status"] == "completed":
                 # 解析 JSON 输出
@@ -431,6 +515,36 @@ class BasedPyrightAgent(BaseQualityAgent):
                 error=f"BasedPyright check failed: {str(e)}"
             )
 
+    async def _execute_warm(self, source_dir: str, files: list[str]) -> BasedPyrightResult | None:
+        """
+        通过常驻语言服务器检查指定文件
+
+        Returns:
+            BasedPyrightResult；会话不可用或失败时返回 None（回退到 CLI 全量检查）
+        """
+        session = await pyright_sessions.get(source_dir)
+        if session is None:
+            return None
+
+        self.logger.info(f"Running BasedPyright checks on {len(files)} file(s) (warm session)")
+        try:
+            issues_list = cast(list[BasedPyrightIssue], await session.check(files))
+        except (PyrightSessionError, OSError) as e:
+            self.logger.warning(f"BasedPyright warm session failed, falling back to CLI: {e}")
+            await pyright_sessions.discard(source_dir)
+            return None
+
+        error_count = len([i for i in issues_list if i.get("severity") == "error"])
+        warning_count = len([i for i in issues_list if i.get("severity") == "warning"])
+        return BasedPyrightResult(
+            status="completed",
+            errors=error_count,
+            warnings=warning_count,
+            files_checked=len(files),
+            issues=issues_list,
+            message=f"Found {len(issues_list)} type issues"
+        )
+
     def parse_errors_by_file(
         self,
         issues: list[dict[str, object]]
@@ -654,7 +768,10 @@ class PytestAgent(BaseQualityAgent):
         tmp_json.close()
 
         try:
-            cmd = f'pytest {test_file} -v --tb=short --json-report --json-report-file={tmp_json_path}'
+            cmd = [
+                "pytest", test_file, "-v", "--tb=short",
+                "--json-report", f"--json-report-file={tmp_json_path}",
+            ]
 
             # 2. 执行（复用 BaseQualityAgent._run_subprocess）
             result = await self._run_subprocess(cmd, timeout=timeout)
@@ -1171,3 +1288,88 @@ Constraints:
 修复上述所有类型检查错误，添加必要的类型注解。输出完整修复后的文件内容。
 </user>
 """
+
+# Ruff + BasedPyright 合并修复 Prompt 模板（一次 SDK 调用修复同一文件的两类错误）
+COMBINED_FIX_PROMPT = """
+<system>
+You are a senior Python code quality expert specializing in Ruff code style fixes and BasedPyright type checking fixes.
+
+**Skill Activation**: Use skill "/claude-plan" for complex analysis and execution.
+
+Objective:
+- Based on the given file path, Ruff errors and type errors, deeply inspect and analyze the root causes of all reported issues.
+- After thorough analysis and deep thinking, provide a complete and detailed fix solution.
+- Execute the fix immediately to ensure the code passes both Ruff and BasedPyright checks.
+- Keep business logic unchanged.
+
+Constraints:
+- Only modify necessary code to resolve the reported issues.
+- Make sure a fix for one tool does not introduce errors for the other.
+- Use standard typing module type annotations and follow PEP 8 specifications.
+- Do not perform unrelated refactoring or optimization.
+
+输出格式示例：
+## Summary of Changes
+- 修复点 1：移除未使用的导入
+- 修复点 2：添加函数返回类型注解
+
+## Fixed File
+### File: {file_path}
+```python
+# 完整修复后的文件内容
+```
+
+<QUALITY_FIX_COMPLETE>
+</system>
+
+<user>
+## File Information
+- **File path**: {file_path}
+
+## File Content (Current)
+```python
+{file_content}
+```
+
+## Ruff Errors
+{ruff_errors_summary}
+
+## BasedPyright Type Errors
+{type_errors_summary}
+
+## Expected Result
+修复上述所有 Ruff 错误和类型检查错误，使代码同时通过 Ruff 和 BasedPyright 检查。输出完整修复后的文件内容。
+</user>
+"""
+
+
+def build_combined_fix_prompt(
+    ruff_agent: RuffAgent,
+    basedpyright_agent: BasedPyrightAgent,
+    file_path: str,
+    file_content: str,
+    ruff_errors: list[dict[str, object]],
+    type_errors: list[dict[str, object]],
+) -> str:
+    """
+    构造同时覆盖 Ruff 与 BasedPyright 错误的修复 Prompt
+
+    Args:
+        ruff_agent: 用于格式化 Ruff 错误的 Agent
+        basedpyright_agent: 用于格式化类型错误的 Agent
+        file_path: 文件路径
+        file_content: 文件内容
+        ruff_errors: 该文件的 Ruff 错误
+        type_errors: 该文件的 BasedPyright 错误
+
+    Returns:
+        完整的修复 Prompt
+    """
+    return COMBINED_FIX_PROMPT.format(
+        file_path=file_path,
+        file_content=file_content,
+        ruff_errors_summary=ruff_agent._format_errors_summary(ruff_errors) if ruff_errors else "None",
+        type_errors_summary=(
+            basedpyright_agent._format_errors_summary(type_errors) if type_errors else "None"
+        ),
+    )
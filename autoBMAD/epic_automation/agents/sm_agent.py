@@ -5,13 +5,15 @@ SM Agent - Story Master Agent
 """
 
 import logging
-import re
+import os
 from pathlib import Path
 from typing import Any, Optional
 
 from anyio.abc import TaskGroup
 
 from autoBMAD.epic_automation.agents.base_agent import BaseAgent
+from autoBMAD.epic_automation.epic_index import EpicIndex, normalize_story_number
+from autoBMAD.epic_automation.story_document import StoryDocument
 
 logger = logging.getLogger(__name__)
 
@@ -110,30 +112,67 @@ class SMAgent(BaseAgent):
             self._log_execution(f"Execution failed: {e}", "error")
             return False
 
-    async def create_stories_from_epic(self, epic_path: str) -> bool:
+    async def create_stories_from_epic(
+        self, epic_path: str, story_ids: list[str] | None = None
+    ) -> bool:
         """
         从Epic创建故事 - 公共接口
 
         Args:
             epic_path: Epic文件路径
+            story_ids: 只（重新）生成这些故事；None 表示Epic中的全部故事
 
         Returns:
             True if successful, False otherwise
         """
-        return await self._create_stories_from_epic(epic_path)
+        return await self._create_stories_from_epic(epic_path, story_ids)
+
+    async def regenerate_stories(self, epic_path: str, story_ids: list[str]) -> dict[str, Path]:
+        """
+        重新生成指定故事
+
+        Args:
+            epic_path: Epic文件路径
+            story_ids: 要重新生成的故事
 
-    async def _create_stories_from_epic(self, epic_path: str) -> bool:
+        Returns:
+            成功重新生成的故事：规范化故事编号（normalize_story_number）-> 故事文件；
+            失败的故事不在其中，其文件保持不变
+        """
+        created = await self._generate_stories(epic_path, story_ids)
+        return {
+            normalize_story_number(story_id.split(":")[0].strip()): story_file
+            for story_id, story_file in (created or {}).items()
+        }
+
+    async def _create_stories_from_epic(
+        self, epic_path: str, only_story_ids: list[str] | None = None
+    ) -> bool:
         """
         从Epic创建故事 - 集成SDK调用
 
+        Returns:
+            至少一个故事创建成功时为 True
+        """
+        return bool(await self._generate_stories(epic_path, only_story_ids))
+
+    async def _generate_stories(
+        self, epic_path: str, only_story_ids: list[str] | None = None
+    ) -> dict[str, Path] | None:
+        """
+        从Epic生成故事文件
+
         流程：
-        1. 读取Epic并提取故事ID列表
+        1. 读取Epic并提取故事ID列表（可按 only_story_ids 过滤）
         2. 遍历每个故事ID：
-           a. 创建空白故事模板文件
-           b. 调用SDK填充内容
+           a. 在草稿文件中创建空白故事模板
+           b. 调用SDK填充草稿
            c. 确认SDK完成并清理
-           d. 验证文件内容
-        3. 返回整体结果
+           d. 验证草稿内容，通过后替换故事文件（失败时原故事文件不变）
+        3. 返回成功的故事
+
+        Returns:
+            成功创建的故事ID -> 故事文件；无法读取Epic或没有故事时为 None
         """
         try:
             self._log_execution(f"Creating stories from Epic: {epic_path}")
@@ -144,9 +183,18 @@ class SMAgent(BaseAgent):
 
             # 提取故事ID
             story_ids = self._extract_story_ids_from_epic(epic_content)
+            if only_story_ids is not None:
+                wanted = {
+                    normalize_story_number(story_id.split(":")[0].strip())
+                    for story_id in only_story_ids
+                }
+                story_ids = [
+                    story_id for story_id in story_ids
+                    if normalize_story_number(story_id.split(":")[0].strip()) in wanted
+                ]
             if not story_ids:
                 self._log_execution("No story IDs found", "error")
-                return False
+                return None
 
             self._log_execution(f"Found {len(story_ids)} stories: {story_ids}")
 
@@ -165,51 +213,63 @@ class SMAgent(BaseAgent):
                 self._log_execution("SDKCancellationManager not available", "warning")
 
             # 遍历每个故事ID，逐个处理
-            success_count = 0
+            created_stories: dict[str, Path] = {}
             failed_stories = []
 
             for idx, story_id in enumerate(story_ids, 1):
                 self._log_execution(f"[{idx}/{len(story_ids)}] Processing story {story_id}...")
 
-                # Step 1: 创建空白故事模板文件
+                # Step 1: 在草稿文件中创建空白故事模板（已有故事文件在验证通过前不动）
                 story_file = stories_dir / f"{story_id}.md"
-                if not self._create_blank_story_template(story_file, story_id, epic_content):
+                draft_file = stories_dir / f"{story_id}.md.draft"
+                if not self._create_blank_story_template(draft_file, story_id, epic_content):
                     self._log_execution(f"Failed to create template for {story_id}", "warning")
                     failed_stories.append(story_id)
                     continue
 
-                # Step 2 & 3 & 4 & 5: SDK调用 + 确认ResultMessage + SDK取消 + 确认取消完成
-                sdk_success = await self._fill_story_with_sdk(
-                    story_file, story_id, epic_path, epic_content, manager
-                )
-
-                if not sdk_success:
-                    self._log_execution(f"SDK filling failed for {story_id}", "warning")
-                    failed_stories.append(story_id)
-                    continue
+                try:
+                    # Step 2 & 3 & 4 & 5: SDK调用 + 确认ResultMessage + SDK取消 + 确认取消完成
+                    sdk_success = await self._fill_story_with_sdk(
+                        draft_file, story_id, epic_path, epic_content, manager
+                    )
 
-                # Step 6: 验证故事文件内容
-                if self._verify_single_story_file(story_file, story_id):
-                    success_count += 1
+                    if not sdk_success:
+                        self._log_execution(f"SDK filling failed for {story_id}", "warning")
+                        failed_stories.append(story_id)
+                        continue
+
+                    # Step 6: 验证草稿内容，通过后替换故事文件
+                    if not self._verify_single_story_file(draft_file, story_id):
+                        self._log_execution(
+                            f"[FAIL] Story {story_id} verification failed", "warning"
+                        )
+                        failed_stories.append(story_id)
+                        continue
+                    try:
+                        os.replace(draft_file, story_file)
+                    except OSError as e:
+                        self._log_execution(f"Failed to replace {story_file}: {e}", "error")
+                        failed_stories.append(story_id)
+                        continue
+                    created_stories[story_id] = story_file
                     self._log_execution(f"[OK] Story {story_id} completed successfully")
-                else:
-                    self._log_execution(f"[FAIL] Story {story_id} verification failed", "warning")
-                    failed_stories.append(story_id)
+                finally:
+                    draft_file.unlink(missing_ok=True)
 
             # 汇总结果
             self._log_execution(
-                f"Story creation completed: {success_count}/{len(story_ids)} succeeded"
+                f"Story creation completed: {len(created_stories)}/{len(story_ids)} succeeded"
             )
 
             if failed_stories:
                 self._log_execution(f"Failed stories: {failed_stories}", "warning")
 
-            # 🎯 容错机制：只要有一个成功就返回True
-            return success_count > 0
+            # 🎯 容错机制：返回成功的故事，由调用者决定如何处理失败的故事
+            return created_stories
 
         except Exception as e:
             self._log_execution(f"Failed to create stories: {e}", "error")
-            return False
+            return None
 
     async def _process_story_content(
         self, story_content: str, story_path: str
@@ -248,30 +308,7 @@ class SMAgent(BaseAgent):
         Returns:
             List of story IDs (e.g., ["1.1", "1.2", ...])
         """
-        story_ids: list[str] = []
-
-        # Pattern 1: "### Story X.Y: Title"
-        pattern1 = r"### Story\s+(\d+(?:\.\d+)?)\s*:\s*(.+?)(?:\n|\$)"
-        matches1 = re.findall(pattern1, content, re.MULTILINE)
-        for story_num, _title in matches1:
-            story_ids.append(story_num)
-            logger.debug(f"Found story section: {story_num}")
-
-        # Pattern 2: "**Story ID**: 001"
-        pattern2 = r"\*\*Story ID\*\*\s*:\s*(\d+(?:\.\d+)?)"
-        matches2 = re.findall(pattern2, content, re.MULTILINE)
-        for story_num in matches2:
-            if story_num not in story_ids:
-                story_ids.append(story_num)
-                logger.debug(f"Found story ID: {story_num}")
-
-        # Remove duplicates while preserving order
-        seen: set[str] = set()
-        unique_story_ids: list[str] = []
-        for story_id in story_ids:
-            if story_id not in seen:
-                seen.add(story_id)
-                unique_story_ids.append(story_id)
+        unique_story_ids = EpicIndex.from_content(content).story_numbers()
 
         logger.debug(
             f"Extracted {len(unique_story_ids)} unique story IDs: {unique_story_ids}"
@@ -463,27 +500,12 @@ class SMAgent(BaseAgent):
                 "raw_content": story_content,
             }
 
-            # Extract title (first h1 heading)
-            title_match = re.search(r"^#\s+(.+)$", story_content, re.MULTILINE)
-            if title_match:
-                metadata["title"] = title_match.group(1).strip()
-
-            # Extract status
-            status_match = re.search(
-                r"\*\*Status\*\*:\s*(.+)$", story_content, re.MULTILINE
-            )
-            if status_match:
-                metadata["status"] = status_match.group(1).strip()
-
-            # Extract acceptance criteria
-            ac_pattern = r"- \[ \]\s+(.+)$"
-            ac_matches = re.findall(ac_pattern, story_content, re.MULTILINE)
-            metadata["acceptance_criteria"] = ac_matches
-
-            # Extract tasks
-            task_pattern = r"- \[ \] Task \d+:\s+(.+)$"
-            task_matches = re.findall(task_pattern, story_content, re.MULTILINE)
-            metadata["tasks"] = task_matches
+            # Single pass over the document
+            document = StoryDocument.from_content(story_content)
+            metadata["title"] = document.title_line or None
+            metadata["status"] = document.status
+            metadata["acceptance_criteria"] = list(document.acceptance_criteria)
+            metadata["tasks"] = list(document.task_titles)
 
             logger.info(
                 f"Parsed story metadata: {len(metadata['acceptance_criteria'])} AC, {len(metadata['tasks'])} tasks"
@@ -557,9 +579,10 @@ class SMAgent(BaseAgent):
         """
         try:
             # 从Epic中提取故事标题
-            pattern = rf"### Story\s+{re.escape(story_id)}\s*:\s*(.+?)(?:\n|$)"
-            match = re.search(pattern, epic_content, re.MULTILINE)
-            story_title = match.group(1).strip() if match else "Story Title Placeholder"
+            story_title = (
+                EpicIndex.from_content(epic_content).title(story_id)
+                or "Story Title Placeholder"
+            )
 
             # 创建空白模板内容
             template_content = f"""# Story {story_id}: {story_title}
@@ -626,19 +649,9 @@ class SMAgent(BaseAgent):
             if not epic_content:
                 return f"Story {story_id} section not found in Epic"
 
-            # 查找故事标题模式："### Story X.Y: Title"
-            pattern = rf"### Story\s+{re.escape(story_id)}\s*:\s*(.+?)(?:\n### Story|\n---|\\n##|\Z)"
-            match = re.search(pattern, epic_content, re.MULTILINE | re.DOTALL)
-
-            if not match:
-                # 尝试更宽松的匹配
-                pattern = rf"### Story\s+{re.escape(story_id)}\s*:\s*(.+?)(?:\n###|\Z)"
-                match = re.search(pattern, epic_content, re.MULTILINE | re.DOTALL)
-
-            if match:
-                return match.group(0).strip()
-            else:
-                return f"Story {story_id} section not found in Epic"
+            # 故事章节：标题行到下一个故事标题、"---" 或同级标题为止
+            section = EpicIndex.from_content(epic_content).section(story_id)
+            return section or f"Story {story_id} section not found in Epic"
 
         except Exception as e:
             self._log_execution(f"Failed to extract story section: {e}", "error")
@@ -803,8 +816,8 @@ Please complete the story file now."""
                 self._log_execution(f"Story file does not exist: {story_file}", "error")
                 return False
 
-            with open(story_file, encoding="utf-8") as f:
-                content = f.read()
+            document = StoryDocument.load(story_file)
+            content = document.content
 
             # 基本验证
             if len(content) < 100:
@@ -813,21 +826,22 @@ Please complete the story file now."""
                 )
                 return False
 
-            # 验证关键章节
+            # 验证关键章节（标题 + 二级章节）
             required_sections = [
-                "# Story",
-                "## Status",
-                "## Story",
-                "## Acceptance Criteria",
-                "## Tasks / Subtasks",
-                "## Dev Notes",
-                "## Testing",
+                "Status",
+                "Story",
+                "Acceptance Criteria",
+                "Tasks / Subtasks",
+                "Dev Notes",
+                "Testing",
             ]
 
-            missing_sections = []
+            missing_sections: list[str] = []
+            if not document.title_line.startswith("Story"):
+                missing_sections.append("# Story")
             for section in required_sections:
-                if section not in content:
-                    missing_sections.append(section)
+                if not document.has_section(section):
+                    missing_sections.append(f"## {section}")
 
             if missing_sections:
                 self._log_execution(
@@ -836,7 +850,7 @@ Please complete the story file now."""
                 return False
 
             # 验证状态已更新（不再是Draft）
-            if "**Status**: Draft" in content:
+            if document.status == "Draft":
                 self._log_execution(
                     f"Story status still Draft (SDK may not have updated): {story_file}", "warning"
                 )
@@ -879,25 +893,4 @@ Please complete the story file now."""
         Returns:
             Dictionary of section names to content
         """
-        sections = {}
-        current_section: Optional[str] = None
-        current_content: list[str] = []
-
-        for line in story_content.split('\n'):
-            if line.strip().startswith('## '):
-                # Save previous section
-                if current_section is not None:
-                    sections[current_section] = '\n'.join(current_content).strip()
-
-                # Start new section
-                current_section = line.strip()[3:].strip()
-                current_content = []
-            else:
-                if current_section is not None:
-                    current_content.append(line)
-
-        # Save last section
-        if current_section is not None:
-            sections[current_section] = '\n'.join(current_content).strip()
-
-        return sections
+        return dict(StoryDocument.from_content(story_content).sections)
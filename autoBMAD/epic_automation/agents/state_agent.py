@@ -12,6 +12,7 @@ from dataclasses import dataclass, field
 from enum import Enum
 
 from .base_agent import BaseAgent
+from autoBMAD.epic_automation.file_identity_cache import FileIdentityCache
 
 logger = logging.getLogger(__name__)
 
@@ -129,6 +130,133 @@ class StoryData:
     raw_content: str = ""
 
 
+# =============================================================================
+# 故事状态缓存
+# =============================================================================
+
+
+class StoryStatusCache(FileIdentityCache[str]):
+    """
+    进程级故事状态缓存
+
+    以 (路径, st_mtime_ns, st_size, inode) 为键：文件未变化时直接返回缓存的
+    状态，变化后才重新读取和解析。标识比较、racy 窗口和 LRU 淘汰由
+    FileIdentityCache 实现，kind 区分不同解析器的结果。
+    """
+
+
+# 全局共享的故事状态缓存
+story_status_cache = StoryStatusCache()
+
+
+# =============================================================================
+# 状态匹配（仅文档头部）
+# =============================================================================
+
+# Status 区块必定位于文档前 10 行
+STATUS_HEADER_LINES = 10
+
+# 状态模式（优先级从高到低）
+# 注意：Done 类状态优先，避免被历史 Review 状态覆盖
+STATUS_PRIORITY_PATTERNS: tuple[tuple[str, str], ...] = (
+    # 终态优先（Done 系列）
+    (CORE_STATUS_READY_FOR_DONE, r'ready\s+for\s+done'),
+    (CORE_STATUS_DONE, r'\bcomplete(?:d)?\b'),
+    (CORE_STATUS_DONE, r'\bdone\b'),
+    # 中间态
+    (CORE_STATUS_READY_FOR_REVIEW, r'ready\s+for\s+review'),
+    (CORE_STATUS_IN_PROGRESS, r'in\s+progress'),
+    (CORE_STATUS_IN_PROGRESS, r'\bactive\b'),
+    (CORE_STATUS_READY_FOR_DEVELOPMENT, r'ready\s+for\s+development'),
+    # 初始态和异常态
+    (CORE_STATUS_DRAFT, r'\bdraft\b'),
+    (CORE_STATUS_FAILED, r'\bfailed\b'),
+    (CORE_STATUS_FAILED, r'\berror\b'),
+)
+
+# 上表合并为一个预编译表达式，每个模式一个命名组 p<序号>（序号越小优先级越高）。
+# 共同前缀 "ready for" 和单词边界已提取出来，前置的字符集前瞻让扫描可以
+# 快速跳过不可能开始匹配的位置；与上表的等价性由 benchmark_status_parser.py 校验。
+_STATUS_MATCHER = re.compile(
+    r'(?=[rcdafei])(?:'
+    r'ready\s+for\s+(?:(?P<p0>done)|(?P<p3>review)|(?P<p6>development))'
+    r'|\b(?:(?P<p1>completed?)|(?P<p2>done)|(?P<p5>active)|(?P<p7>draft)'
+    r'|(?P<p8>failed)|(?P<p9>error))\b'
+    r'|(?P<p4>in\s+progress)'
+    r')',
+    re.IGNORECASE,
+)
+
+
+def _first_lines(content: str, count: int) -> str:
+    """返回前 count 行（等价于 '\\n'.join(content.split('\\n')[:count])，但不复制其余内容）"""
+    end = -1
+    for _ in range(count):
+        end = content.find('\n', end + 1)
+        if end == -1:
+            return content
+    return content[:end]
+
+
+def match_status_by_priority(text: str) -> Optional[str]:
+    """
+    单次扫描返回优先级最高的匹配状态
+
+    与逐个模式 re.search 的结果一致：各模式匹配的都是完整短语，较低
+    优先级的匹配不会覆盖较高优先级模式的匹配位置；命中最高优先级后提前结束。
+
+    Args:
+        text: 待匹配文本（通常为文档前 10 行）
+
+    Returns:
+        核心状态值，无匹配返回 None
+    """
+    best: Optional[int] = None
+    for match in _STATUS_MATCHER.finditer(text):
+        index = int(match.lastgroup[1:])  # type: ignore[index]
+        if best is None or index < best:
+            best = index
+            if best == 0:
+                break
+    return STATUS_PRIORITY_PATTERNS[best][0] if best is not None else None
+
+
+def read_story_header(story_path: str | Path, max_lines: int = STATUS_HEADER_LINES) -> str:
+    """
+    只读取文档前 max_lines 行（通常只需读入第一个缓冲块）
+
+    文本模式读取，换行处理与 read() 后 split('\\n') 一致。
+
+    Args:
+        story_path: 故事文件路径
+        max_lines: 读取行数
+
+    Returns:
+        前 max_lines 行内容
+    """
+    lines: list[str] = []
+    with open(story_path, encoding='utf-8') as f:
+        for _ in range(max_lines):
+            line = f.readline()
+            if not line:
+                break
+            lines.append(line)
+    return ''.join(lines)
+
+
+def parse_status_from_file(story_path: str | Path) -> str:
+    """
+    只读取文件头部解析核心状态（与 SimpleStoryParser 正则解析结果一致）
+
+    Args:
+        story_path: 故事文件路径
+
+    Returns:
+        核心状态值，无匹配时返回 Draft
+    """
+    return match_status_by_priority(read_story_header(story_path)) or CORE_STATUS_DRAFT
+
+
 class SimpleStoryParser:
     """
     统一故事/Epic解析器 - AI优先，正则回退
@@ -170,7 +298,7 @@ class SimpleStoryParser:
         logger.info(f"Starting status parsing for: '{content_preview}...'")
 
         # 新增：记录文档行数
-        total_lines = len(content.split('\n'))
+        total_lines = content.count('\n') + 1
         logger.debug(f"Document has {total_lines} lines total, will parse first 10 lines")
 
         # 如果没有提供SDK包装器，使用正则表达式回退
@@ -194,6 +322,7 @@ class SimpleStoryParser:
         1. 只解析文档前 10 行（Status 区块必定在此范围内）
         2. 宽松匹配状态关键词，支持括号、emoji 等装饰内容
         3. 优先级调整：Done 类状态优先于 Review/Development
+        4. 所有模式合并为一个预编译的交替表达式，一次扫描得出最高优先级状态
 
         Args:
             content: 故事文档内容
@@ -202,55 +331,14 @@ class SimpleStoryParser:
             标准状态字符串
         """
         # 提取前 10 行作为解析范围
-        lines = content.split('\n')[:10]
-        status_section = '\n'.join(lines)
-
-        logger.debug(f"Parsing status from first {len(lines)} lines (max 10)")
-
-        # 定义状态模式（优先级从高到低）
-        # 注意：Done 类状态优先，避免被历史 Review 状态覆盖
-        status_patterns = {
-            # 终态优先（Done 系列）
-            CORE_STATUS_READY_FOR_DONE: [
-                r'(?i)ready\s+for\s+done',
-            ],
-            CORE_STATUS_DONE: [
-                r'(?i)\bcomplete(?:d)?\b',
-                r'(?i)\bdone\b',
-            ],
-
-            # 中间态
-            CORE_STATUS_READY_FOR_REVIEW: [
-                r'(?i)ready\s+for\s+review',
-            ],
-            CORE_STATUS_IN_PROGRESS: [
-                r'(?i)in\s+progress',
-                r'(?i)\bactive\b',
-            ],
-            CORE_STATUS_READY_FOR_DEVELOPMENT: [
-                r'(?i)ready\s+for\s+development',
-            ],
-
-            # 初始态和异常态
-            CORE_STATUS_DRAFT: [
-                r'(?i)\bdraft\b',
-            ],
-            CORE_STATUS_FAILED: [
-                r'(?i)\bfailed\b',
-                r'(?i)\berror\b',
-            ],
-        }
-
-        # 按优先级顺序匹配
-        for status, patterns in status_patterns.items():
-            for pattern in patterns:
-                match = re.search(pattern, status_section)
-                if match:
-                    logger.debug(
-                        f"Status matched: {status} "
-                        f"(pattern: {pattern}, search range: lines 1-10)"
-                    )
-                    return status
+        status_section = _first_lines(content, STATUS_HEADER_LINES)
+
+        logger.debug(f"Parsing status from first {STATUS_HEADER_LINES} lines")
+
+        status = match_status_by_priority(status_section)
+        if status is not None:
+            logger.debug(f"Status matched: {status} (search range: lines 1-{STATUS_HEADER_LINES})")
+            return status
 
         # 无匹配时返回默认值
         logger.debug("No status pattern matched in first 10 lines, returning: Draft")
@@ -305,13 +393,26 @@ class StateAgent(BaseAgent):
                 # 传入的是 Path 对象
                 content = story_path.read_text(encoding='utf-8')
             else:
-                # 传入的是字符串路径，尝试读取文件
+                # 传入的是字符串路径，文件未变化时直接使用缓存
+                identity = story_status_cache.file_identity(story_path)
+                cached = story_status_cache.get(story_path, "core", identity)
+                if cached is not None:
+                    return cached
                 try:
                     with open(story_path, 'r', encoding='utf-8') as f:
                         content = f.read()
                 except (FileNotFoundError, OSError):
                     # 如果不是文件路径，尝试作为内容处理
                     content = story_path
+                    identity = None
+
+                status = await self.status_parser.parse_status(content)
+                if status:
+                    story_status_cache.put(story_path, "core", identity, status)
+                    self.logger.debug(f"Parsed status: {status}")
+                    return status
+                self.logger.warning("Status parser returned None")
+                return None
 
             status = await self.status_parser.parse_status(content)
             if status:
@@ -1,6 +1,8 @@
 """状态更新Agent
 
-通过SDK调用更新故事文档状态，替代StateManager直接修改文档的方式。
+更新故事文档状态，替代StateManager直接修改文档的方式。
+优先在本地原子改写 Status 段落（临时文件 + os.replace），
+无法识别文档布局时回退到SDK调用。
 
 遵循方案3：单一真源原则
 - 只从数据库 processing_status 字段读取状态
@@ -8,11 +10,17 @@
 - 不使用其他数据源（历史记录、Markdown当前状态等）
 """
 
+import asyncio
 import logging
+import os
+import re
+import tempfile
+import time
 from datetime import datetime
 from pathlib import Path
 from typing import Any, TypedDict, List, Tuple, Dict
 
+import anyio
 from anyio.abc import TaskGroup
 from .base_agent import BaseAgent
 from .sdk_helper import execute_sdk_call
@@ -20,18 +28,170 @@ from .sdk_helper import execute_sdk_call
 logger = logging.getLogger(__name__)
 
 
+class StoryUpdateResult(TypedDict):
+    """单个故事的更新结果"""
+    story_path: str
+    target_status: str
+    success: bool
+    error: str | None
+    latency_seconds: float
+
+
 class BatchUpdateResults(TypedDict):
     """批量更新结果类型"""
     success_count: int
     error_count: int
     errors: List[str]
+    results: List[StoryUpdateResult]
+    elapsed_seconds: float
+
+
+# 批量更新的默认并发上限
+DEFAULT_MAX_CONCURRENCY = 8
+
+
+# "## Status" / "### Status" 标题
+_STATUS_HEADING_RE = re.compile(r"^(#{1,6})[ \t]*Status[ \t]*:?[ \t]*$", re.IGNORECASE | re.MULTILINE)
+# 任意 Markdown 标题
+_HEADING_RE = re.compile(r"^(#{1,6})\s", re.MULTILINE)
+# 行内状态字段："**Status**: X"、"**Status:** X"、"Status: X"（允许列表符号前缀）
+_STATUS_FIELD_RE = re.compile(
+    r"^(?P<prefix>[ \t]*(?:[-*][ \t]+)?)(?P<label>\*\*Status\*\*:|\*\*Status:\*\*|Status:)[ \t]*(?P<value>.*?)[ \t]*$",
+    re.MULTILINE,
+)
+# 行内状态字段只在文档头部查找（与状态解析范围一致）
+_STATUS_FIELD_HEADER_LINES = 10
+# 围栏代码块的起止行（``` 或 ~~~，最多缩进 3 个空格）
+_FENCE_RE = re.compile(r"^[ ]{0,3}(`{3,}|~{3,})", re.MULTILINE)
+
+
+def _fenced_ranges(text: str) -> list[tuple[int, int]]:
+    """围栏代码块的 (起始, 结束) 偏移；未闭合的代码块延续到文末"""
+    ranges: list[tuple[int, int]] = []
+    opening: re.Match[str] | None = None
+    for match in _FENCE_RE.finditer(text):
+        fence = match.group(1)
+        if opening is None:
+            opening = match
+        elif fence[0] == opening.group(1)[0] and len(fence) >= len(opening.group(1)):
+            ranges.append((opening.start(), match.end()))
+            opening = None
+    if opening is not None:
+        ranges.append((opening.start(), len(text)))
+    return ranges
+
+
+def _in_ranges(position: int, ranges: list[tuple[int, int]]) -> bool:
+    return any(start <= position < end for start, end in ranges)
+
+
+def rewrite_status_section(content: str, core_status: str, updated_at: str | None = None) -> str | None:
+    """
+    在文档内容中改写状态，返回新内容
+
+    支持的布局：
+    1. "## Status" / "### Status" 段落：标题到下一个标题之间的内容替换为标准 Status
+       段落（保留标题级别；"### Status History" 等子标题及其内容保留）
+    2. 无 Status 标题时，文档头部的 "**Status**: X" 或 "Status: X" 字段：只替换值
+
+    围栏代码块中的标题和字段不参与匹配。
+
+    Args:
+        content: 故事文档内容
+        core_status: 目标核心状态
+        updated_at: Last Updated 时间戳（默认当前时间）
+
+    Returns:
+        改写后的内容；无法识别布局时返回 None
+    """
+    newline = "\r\n" if "\r\n" in content else "\n"
+    text = content.replace("\r\n", "\n") if newline == "\r\n" else content
+    updated_at = updated_at or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    fenced = _fenced_ranges(text)
+    heading = next(
+        (m for m in _STATUS_HEADING_RE.finditer(text) if not _in_ranges(m.start(), fenced)),
+        None,
+    )
+    if heading:
+        body_start = heading.end()
+        # 只替换到下一个标题为止，子标题（如 Status History）及之后的内容保留
+        body_end = next(
+            (
+                m.start()
+                for m in _HEADING_RE.finditer(text, body_start)
+                if not _in_ranges(m.start(), fenced)
+            ),
+            len(text),
+        )
+        section = (
+            f"{heading.group(1)} Status\n\n"
+            f"**Status**: {core_status}\n\n"
+            f"**Last Updated**: {updated_at}\n"
+        )
+        if body_end < len(text):
+            section += "\n"
+        new_text = text[:heading.start()] + section + text[body_end:]
+    else:
+        header_end = -1
+        for _ in range(_STATUS_FIELD_HEADER_LINES):
+            header_end = text.find("\n", header_end + 1)
+            if header_end == -1:
+                header_end = len(text)
+                break
+        field = next(
+            (
+                m for m in _STATUS_FIELD_RE.finditer(text, 0, header_end)
+                if not _in_ranges(m.start(), fenced)
+            ),
+            None,
+        )
+        if field is None:
+            return None
+        new_text = (
+            text[:field.start("value")]
+            + core_status
+            + text[field.end("value"):]
+        )
+
+    return new_text.replace("\n", newline) if newline == "\r\n" else new_text
+
+
+def write_text_atomic(path: Path, content: str, encoding: str = "utf-8") -> None:
+    """
+    原子写入文本文件：写入同目录临时文件，fsync 后 os.replace 覆盖
+
+    读者要么看到旧文件，要么看到完整的新文件；原文件权限保持不变。
+
+    Args:
+        path: 目标文件
+        content: 文件内容
+        encoding: 编码
+    """
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding=encoding, newline="") as tmp:
+            tmp.write(content)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        try:
+            os.chmod(tmp_name, path.stat().st_mode & 0o7777)
+        except OSError:
+            pass
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
 
 
 class StatusUpdateAgent(BaseAgent):
-    """专门负责通过SDK更新故事状态的Agent
+    """专门负责更新故事状态的Agent
 
     职责：
-    - 当需要更新故事状态时，通过SDK执行
+    - 当需要更新故事状态时，本地原子改写 Status 段落，必要时回退到SDK
     - 封装状态映射逻辑（数据库processing_status → 核心状态 → Markdown状态）
     - 确保文档修改的统一性和可追溯性
 
@@ -58,14 +218,26 @@ class StatusUpdateAgent(BaseAgent):
         'Done': 'completed',  # 别名支持
     }
 
-    def __init__(self, task_group: TaskGroup | None = None, name: str = "StatusUpdateAgent"):
+    def __init__(
+        self,
+        task_group: TaskGroup | None = None,
+        name: str = "StatusUpdateAgent",
+        use_sdk_fallback: bool = True,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    ):
         """初始化状态更新Agent
 
         Args:
-            task_group: 异步任务组，用于并发执行
+            task_group: 异步任务组（保留兼容；批量更新使用内部任务组）
             name: Agent名称
+            use_sdk_fallback: 本地无法识别文档布局时是否回退到SDK调用
+            max_concurrency: 批量更新时同时处理的故事数上限
         """
         super().__init__(config_or_name=name, task_group=task_group)
+        self.use_sdk_fallback = use_sdk_fallback
+        self.max_concurrency = max(1, max_concurrency)
+        # SDK 回退调用串行执行，避免并发 SDK 会话之间的取消作用域冲突
+        self._sdk_lock = anyio.Lock()
 
     def _map_to_core_status(self, processing_status: str) -> str:
         """
@@ -106,6 +278,59 @@ class StatusUpdateAgent(BaseAgent):
 **Last Updated**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 """
 
+    def update_story_status_locally(self, story_path: str, target_status: str) -> bool | None:
+        """
+        在本地改写故事文档的 Status 段落（原子替换文件）
+
+        Args:
+            story_path: 故事文件路径
+            target_status: 目标状态（核心状态值）
+
+        Returns:
+            True 写入成功（或状态已是目标值）；False 文件不存在或写入失败；
+            None 无法识别文档布局，需要回退到SDK
+        """
+        story_file = Path(story_path)
+        if not story_file.exists():
+            logger.warning(f"Story file does not exist: {story_path}")
+            return False
+
+        try:
+            with open(story_file, encoding="utf-8", newline="") as f:
+                content = f.read()
+            new_content = rewrite_status_section(content, target_status)
+            if new_content is None:
+                logger.info(f"No known Status layout in {story_path}, local update skipped")
+                return None
+            write_text_atomic(story_file, new_content)
+            logger.info(f"Updated {story_path} status to {target_status} (local)")
+            return True
+        except Exception as e:
+            logger.error(f"Local status update failed for {story_path}: {e}", exc_info=True)
+            return False
+
+    async def update_story_status(self, story_path: str, target_status: str) -> bool:
+        """
+        更新单个故事状态：本地改写优先，无法识别布局时回退到SDK
+
+        Args:
+            story_path: 故事文件路径
+            target_status: 目标状态（核心状态值）
+
+        Returns:
+            True if successful, False otherwise
+        """
+        local_result = await asyncio.to_thread(
+            self.update_story_status_locally, story_path, target_status
+        )
+        if local_result is not None:
+            return local_result
+        if not self.use_sdk_fallback:
+            logger.warning(f"Cannot update {story_path}: unknown layout and SDK fallback disabled")
+            return False
+        async with self._sdk_lock:
+            return await self.update_story_status_via_sdk(story_path, target_status)
+
     async def update_story_status_via_sdk(
         self,
         story_path: str,
@@ -173,55 +398,73 @@ Requirements:
 
     async def batch_update_statuses(
         self,
-        status_mappings: List[Tuple[str, str]]
+        status_mappings: List[Tuple[str, str]],
+        max_concurrency: int | None = None,
     ) -> BatchUpdateResults:
         """
-        批量更新故事状态
+        批量更新故事状态（有界并发）
+
+        使用内部 anyio 任务组，最多同时处理 max_concurrency 个故事；
+        单个故事失败不会取消其他故事。
 
         Args:
             status_mappings: [(story_path, target_status), ...]
+            max_concurrency: 并发上限（默认使用实例配置）
 
         Returns:
             统计结果字典，包含：
             - success_count: 成功数量
             - error_count: 失败数量
             - errors: 错误列表
+            - results: 每个故事的结果与耗时（与输入顺序一致）
+            - elapsed_seconds: 总耗时
         """
+        limit = max(1, max_concurrency or self.max_concurrency)
+        story_results: List[StoryUpdateResult | None] = [None] * len(status_mappings)
+        semaphore = anyio.Semaphore(limit)
+        started = time.perf_counter()
+
+        logger.info(
+            f"Starting batch update of {len(status_mappings)} stories "
+            f"(concurrency: {limit})"
+        )
+
+        async def _run(index: int, story_path: str, target_status: str) -> None:
+            async with semaphore:
+                story_results[index] = await self._update_single_story(
+                    story_path, target_status
+                )
+
+        async with anyio.create_task_group() as tg:
+            for index, (story_path, target_status) in enumerate(status_mappings):
+                tg.start_soon(_run, index, story_path, target_status)
+
         results: BatchUpdateResults = {
             "success_count": 0,
             "error_count": 0,
-            "errors": []
+            "errors": [],
+            "results": [r for r in story_results if r is not None],
+            "elapsed_seconds": time.perf_counter() - started,
         }
-
-        logger.info(f"Starting batch update of {len(status_mappings)} stories")
-
-        # 并发执行更新任务
-        if self.task_group:
-            # 如果提供了task_group，使用它进行并发控制
-            tasks: List[Any] = []
-            for story_path, target_status in status_mappings:
-                task = self.task_group.create_task(  # type: ignore[attr-defined, reportAttributeAccessIssue]
-                    self._update_single_story(story_path, target_status, results)
+        for story_result in results["results"]:
+            if story_result["success"]:
+                results["success_count"] += 1
+            else:
+                results["error_count"] += 1
+                results["errors"].append(
+                    story_result["error"] or f"Failed to update {story_result['story_path']}"
                 )
-                tasks.append(task)
-
-            # 等待所有任务完成
-            for task in tasks:
-                try:
-                    await task
-                except Exception as e:
-                    logger.error(f"Task failed: {str(e)}")
-                    results["error_count"] += 1
-                    results["errors"].append(f"Task error: {str(e)}")
-        else:
-            # 否则顺序执行
-            for story_path, target_status in status_mappings:
-                await self._update_single_story(story_path, target_status, results)
 
+        slowest = max(results["results"], key=lambda r: r["latency_seconds"], default=None)
         logger.info(
-            f"Batch update completed: "
+            f"Batch update completed in {results['elapsed_seconds']:.3f}s: "
             f"{results['success_count']} succeeded, "
             f"{results['error_count']} failed"
+            + (
+                f" (slowest: {slowest['story_path']} {slowest['latency_seconds']:.3f}s)"
+                if slowest
+                else ""
+            )
         )
 
         return results
@@ -230,31 +473,36 @@ Requirements:
         self,
         story_path: str,
         target_status: str,
-        results: BatchUpdateResults
-    ) -> None:
+    ) -> StoryUpdateResult:
         """更新单个故事状态的内部方法
 
         Args:
             story_path: 故事文件路径
             target_status: 目标状态
-            results: 结果统计字典（通过引用修改）
+
+        Returns:
+            该故事的结果与耗时
         """
+        started = time.perf_counter()
+        error: str | None = None
+        success = False
         try:
-            success = await self.update_story_status_via_sdk(
-                story_path, target_status
-            )
-
-            if success:
-                results["success_count"] += 1
-            else:
-                results["error_count"] += 1
-                results["errors"].append(f"Failed to update {story_path}")
-
+            success = await self.update_story_status(story_path, target_status)
+            if not success:
+                error = f"Failed to update {story_path}"
         except Exception as e:
-            results["error_count"] += 1
-            error_msg = f"Error updating {story_path}: {str(e)}"
-            results["errors"].append(error_msg)
-            logger.error(error_msg, exc_info=True)
+            error = f"Error updating {story_path}: {str(e)}"
+            logger.error(error, exc_info=True)
+
+        latency = time.perf_counter() - started
+        logger.debug(f"[StatusUpdate] {story_path}: success={success} in {latency:.3f}s")
+        return {
+            "story_path": story_path,
+            "target_status": target_status,
+            "success": success,
+            "error": error,
+            "latency_seconds": latency,
+        }
 
     def validate_processing_statuses(
         self,
@@ -308,7 +556,7 @@ Requirements:
         1. 从数据库查询最新处理状态（processing_status）
         2. 通过映射表转换为核心状态
         3. 生成 Markdown Status 文本
-        4. 调用 SDK 更新 Story 文档
+        4. 本地改写 Story 文档的 Status 段落（无法识别布局时调用 SDK）
 
         Args:
             state_manager: StateManager实例，用于获取数据库状态
@@ -365,8 +613,8 @@ Requirements:
                     # Step 2: 映射处理状态 → 核心状态
                     core_status = self._map_to_core_status(processing_status)
 
-                    # Step 3: 生成 Markdown 文本（通过 SDK 提示词）
-                    # Note: 实际文本生成在 update_story_status_via_sdk 中完成
+                    # Step 3: 生成 Markdown 文本
+                    # Note: 实际文本生成在 rewrite_status_section / SDK 提示词中完成
 
                     # 记录映射日志
                     logger.info(
@@ -394,7 +642,9 @@ Requirements:
                 return BatchUpdateResults(
                     success_count=0,
                     error_count=0,
-                    errors=[]
+                    errors=[],
+                    results=[],
+                    elapsed_seconds=0.0
                 )
 
         except Exception as e:
@@ -402,7 +652,9 @@ Requirements:
             return BatchUpdateResults(
                 success_count=0,
                 error_count=1,
-                errors=[f"Database sync failed: {str(e)}"]
+                errors=[f"Database sync failed: {str(e)}"],
+                results=[],
+                elapsed_seconds=0.0
             )
 
     async def execute(self, *args: Any, **kwargs: Any) -> Any:
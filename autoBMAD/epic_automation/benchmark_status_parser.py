@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+状态解析微基准
+
+对比旧实现（整篇读取 + split + 逐个 re.search）与新实现
+（只读文件头部 + 单个预编译交替表达式），并先验证两者结果完全一致。
+
+用法:
+    python benchmark_status_parser.py [--iterations N] [--body-lines N] [--samples N]
+"""
+import argparse
+import random
+import re
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+# 添加项目路径
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from autoBMAD.epic_automation.agents.state_agent import (  # noqa: E402
+    CORE_STATUS_DONE,
+    CORE_STATUS_DRAFT,
+    CORE_STATUS_FAILED,
+    CORE_STATUS_IN_PROGRESS,
+    CORE_STATUS_READY_FOR_DEVELOPMENT,
+    CORE_STATUS_READY_FOR_DONE,
+    CORE_STATUS_READY_FOR_REVIEW,
+    SimpleStoryParser,
+    parse_status_from_file,
+)
+
+
+def legacy_parse_status(content: str) -> str:
+    """旧版 SimpleStoryParser._parse_status_with_regex 的逐字副本（去掉日志）"""
+    lines = content.split('\n')[:10]
+    status_section = '\n'.join(lines)
+    status_patterns = {
+        CORE_STATUS_READY_FOR_DONE: [r'(?i)ready\s+for\s+done'],
+        CORE_STATUS_DONE: [r'(?i)\bcomplete(?:d)?\b', r'(?i)\bdone\b'],
+        CORE_STATUS_READY_FOR_REVIEW: [r'(?i)ready\s+for\s+review'],
+        CORE_STATUS_IN_PROGRESS: [r'(?i)in\s+progress', r'(?i)\bactive\b'],
+        CORE_STATUS_READY_FOR_DEVELOPMENT: [r'(?i)ready\s+for\s+development'],
+        CORE_STATUS_DRAFT: [r'(?i)\bdraft\b'],
+        CORE_STATUS_FAILED: [r'(?i)\bfailed\b', r'(?i)\berror\b'],
+    }
+    for status, patterns in status_patterns.items():
+        for pattern in patterns:
+            if re.search(pattern, status_section):
+                return status
+    return CORE_STATUS_DRAFT
+
+
+def legacy_parse_file(path: Path) -> str:
+    with open(path, encoding='utf-8') as f:
+        return legacy_parse_status(f.read())
+
+
+WORDS = [
+    "ready", "for", "done", "review", "development", "in", "progress",
+    "complete", "completed", "active", "inactive", "draft", "failed", "error",
+    "errors", "Done", "READY", "Status:", "**Status**:", "(", ")", "✅", "-",
+    "main", "undone", "drafts", "progressive", "re", "story", "the",
+    "\n", "\n", "\r\n", "  ", "\t",
+]
+
+
+def random_header(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 40)))
+
+
+def check_equivalence(samples: int, seed: int = 0) -> None:
+    """随机生成文档，验证新旧实现结果一致"""
+    rng = random.Random(seed)
+    parser = SimpleStoryParser()
+    for _ in range(samples):
+        content = random_header(rng)
+        expected = legacy_parse_status(content)
+        actual = parser._parse_status_with_regex(content)
+        if actual != expected:
+            raise SystemExit(f"Mismatch for {content!r}: legacy={expected}, new={actual}")
+    print(f"[OK] {samples} random documents parsed identically")
+
+
+def build_story(body_lines: int) -> str:
+    header = (
+        "# Story 1.1: Example\n\n"
+        "## Status\n"
+        "**Status**: Ready for Review\n\n"
+        "## Story\n"
+    )
+    body = "\n".join(
+        f"- Task {i}: implement feature, review errors, mark done when complete"
+        for i in range(body_lines)
+    )
+    return header + body + "\n"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Story status parser microbenchmark")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--body-lines", type=int, default=2000)
+    parser.add_argument("--samples", type=int, default=20000)
+    args = parser.parse_args()
+
+    check_equivalence(args.samples)
+
+    content = build_story(args.body_lines)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "story.md"
+        path.write_text(content, encoding="utf-8")
+        assert legacy_parse_file(path) == parse_status_from_file(path)
+
+        status_parser = SimpleStoryParser()
+        cases = {
+            "legacy (content)": lambda: legacy_parse_status(content),
+            "new (content)": lambda: status_parser._parse_status_with_regex(content),
+            "legacy (file)": lambda: legacy_parse_file(path),
+            "new (file header)": lambda: parse_status_from_file(path),
+        }
+        print(
+            f"Story size: {len(content.encode('utf-8'))} bytes, "
+            f"{content.count(chr(10))} lines, {args.iterations} iterations"
+        )
+        for name, func in cases.items():
+            seconds = min(timeit.repeat(func, number=args.iterations, repeat=3))
+            print(f"  {name:<20} {seconds / args.iterations * 1e6:10.1f} us/call")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""Module for tracking what the Dev phase changed and what QA last decided.
+
+Agents are created per Dev-QA phase, so the tracker is process-wide: the Dev
+agent records which files its session changed, and the QA agent records its
+verdict together with the state it reviewed. A later review of an unchanged
+story and workspace can then reuse that verdict instead of starting another
+SDK session.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from autoBMAD.epic_automation.story_document import StoryDocument
+from autoBMAD.epic_automation.workspace_snapshot import WorkspaceSnapshot
+
+# Story sections that Dev/QA rewrite as bookkeeping; not part of what QA reviews
+_BOOKKEEPING_SECTIONS = frozenset({"Status"})
+
+# Number of changed files listed in a QA prompt
+MAX_LISTED_FILES = 20
+
+
+@dataclass
+class DevChangeSummary:
+    """Files changed by one Dev phase.
+
+    Attributes:
+        story_path: Story that was developed.
+        changed_files: Absolute paths added, removed or modified.
+        finished_at: Time the Dev phase finished.
+    """
+
+    story_path: str
+    changed_files: list[str] = field(default_factory=list)
+    finished_at: float = field(default_factory=time.time)
+
+    def describe(self, max_files: int = MAX_LISTED_FILES) -> str:
+        """One-line summary for prompts and logs."""
+        if not self.changed_files:
+            return "The last development phase changed no files."
+        cwd = os.getcwd()
+        listed = [os.path.relpath(path, cwd) for path in self.changed_files[:max_files]]
+        more = len(self.changed_files) - len(listed)
+        suffix = f" (and {more} more)" if more > 0 else ""
+        return (
+            f"The last development phase changed {len(self.changed_files)} file(s): "
+            f"{', '.join(listed)}{suffix}."
+        )
+
+
+@dataclass
+class QAVerdict:
+    """Status QA set and the state it reviewed.
+
+    Attributes:
+        status: Core status written by QA ("Ready for Done" or "In Progress").
+        review_digest: Digest of the story content and workspace at review time.
+    """
+
+    status: str
+    review_digest: str
+
+
+def review_digest(story_path: str | Path, watch_dirs: Iterable[str | Path]) -> str:
+    """Digest of what QA reviews: the story (minus its Status) and the workspace.
+
+    Args:
+        story_path: Story file.
+        watch_dirs: Directories holding the implementation.
+
+    Returns:
+        SHA-256 hex digest.
+    """
+    h = hashlib.sha256()
+    try:
+        document = StoryDocument.load(story_path)
+    except OSError:
+        h.update(b"<missing story>")
+    else:
+        h.update(document.title_line.encode())
+        for name, body in document.sections.items():
+            if name not in _BOOKKEEPING_SECTIONS:
+                h.update(f"\0{name}\0{body}".encode())
+    story = os.path.abspath(story_path)
+    files = WorkspaceSnapshot.take(watch_dirs).files
+    workspace = WorkspaceSnapshot({path: sig for path, sig in files.items() if path != story})
+    h.update(workspace.digest.encode("ascii"))
+    return h.hexdigest()
+
+
+class StoryChangeTracker:
+    """Process-wide record of Dev changes and QA verdicts per story."""
+
+    def __init__(self) -> None:
+        self._dev_changes: dict[str, DevChangeSummary] = {}
+        self._verdicts: dict[str, QAVerdict] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(story_path: str | Path) -> str:
+        return os.path.abspath(story_path)
+
+    def record_dev_changes(
+        self,
+        story_path: str | Path,
+        before: WorkspaceSnapshot,
+        after: WorkspaceSnapshot,
+    ) -> DevChangeSummary:
+        """Record the files changed between two snapshots around a Dev phase.
+
+        The story file itself is not counted.
+
+        Returns:
+            The recorded summary.
+        """
+        story = self._key(story_path)
+        changed = [path for path in before.changed_files(after) if path != story]
+        summary = DevChangeSummary(story_path=str(story_path), changed_files=changed)
+        with self._lock:
+            self._dev_changes[story] = summary
+        return summary
+
+    def last_dev_changes(self, story_path: str | Path) -> DevChangeSummary | None:
+        """The most recent Dev change summary for a story."""
+        with self._lock:
+            return self._dev_changes.get(self._key(story_path))
+
+    def record_verdict(self, story_path: str | Path, status: str, digest: str) -> None:
+        """Record the status QA set and the digest of what it reviewed."""
+        with self._lock:
+            self._verdicts[self._key(story_path)] = QAVerdict(status, digest)
+
+    def reusable_verdict(self, story_path: str | Path, digest: str) -> str | None:
+        """The last QA verdict if nothing QA reviews has changed since.
+
+        Args:
+            story_path: Story file.
+            digest: Current review digest.
+
+        Returns:
+            The verdict status, or None if QA has to review again.
+        """
+        with self._lock:
+            verdict = self._verdicts.get(self._key(story_path))
+        if verdict is not None and verdict.review_digest == digest:
+            return verdict.status
+        return None
+
+    def forget(self, story_path: str | Path | None = None) -> None:
+        """Drop what is recorded for a story (or all stories)."""
+        with self._lock:
+            if story_path is None:
+                self._dev_changes.clear()
+                self._verdicts.clear()
+            else:
+                key = self._key(story_path)
+                self._dev_changes.pop(key, None)
+                self._verdicts.pop(key, None)
+
+
+# Process-wide tracker shared by Dev and QA agents
+story_change_tracker = StoryChangeTracker()
@@ -0,0 +1,426 @@
+"""
+合并质量检查控制器 - CombinedQualityController
+
+Ruff → BasedPyright 检查 → 按文件合并错误 → 每个文件一次 SDK 修复
+（同时覆盖两类错误）→ 合并回归检查
+
+与依次运行两个 QualityCheckController 相比：
+1. 两个工具在同一个检查 ↔ 修复循环中运行，不再各自跑完整的多轮循环
+2. 同一文件的 lint 与类型错误在一次 SDK 调用中修复，SDK 调用约减半
+
+ruff check 带 --fix 会改写文件，而写入不是原子的；因此 BasedPyright 总在
+Ruff 结束后运行，类型诊断（及其行号）对应的是自动修复后的内容。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from typing import Any
+
+from autoBMAD.epic_automation.agents.quality_agents import (
+    BasedPyrightAgent,
+    RuffAgent,
+    build_combined_fix_prompt,
+)
+from autoBMAD.epic_automation.controllers.quality_check_controller import (
+    QualityCheckController,
+)
+from autoBMAD.epic_automation.fix_pool import (
+    DEFAULT_FILE_FIX_ATTEMPTS,
+    DEFAULT_FIX_WORKERS,
+    FixBudget,
+    run_fix_pool,
+)
+from autoBMAD.epic_automation.fix_priority import FixPrioritizer
+from autoBMAD.epic_automation.import_graph import file_key
+
+ErrorMap = dict[str, list[dict[str, object]]]
+
+
+class CombinedQualityController:
+    """
+    Ruff + BasedPyright 合并检查控制器
+
+    每个工具的状态和结果仍由各自的 QualityCheckController 维护，
+    run() 返回的两个结果与单独运行时的结构相同。
+    """
+
+    def __init__(
+        self,
+        ruff_agent: RuffAgent,
+        basedpyright_agent: BasedPyrightAgent,
+        source_dir: str,
+        max_cycles: int = 3,
+        sdk_call_delay: int = 10,
+        sdk_timeout: int = 600,
+        max_fix_workers: int = DEFAULT_FIX_WORKERS,
+        final_full_check: bool = True,
+        max_fix_calls: int | None = None,
+        fix_time_budget: float | None = None,
+        max_file_attempts: int = DEFAULT_FILE_FIX_ATTEMPTS,
+    ):
+        """
+        初始化合并质量检查控制器
+
+        Args:
+            ruff_agent: Ruff Agent 实例
+            basedpyright_agent: BasedPyright Agent 实例
+            source_dir: 源代码目录
+            max_cycles: 最大修复循环次数
+            sdk_call_delay: 同一修复 worker 两次 SDK 调用间延时（秒）
+            sdk_timeout: SDK超时时间（秒）
+            max_fix_workers: 并行修复的最大文件数（1 为逐个修复）
+            final_full_check: 作用域回归检查通过或轮次用尽后，再全量检查一次
+            max_fix_calls: 每轮最多 SDK 修复调用数（含单文件重试；按影响排序取前 N 个
+                文件），None 为不限
+            fix_time_budget: 每轮修复阶段的墙钟预算（秒），超时后不再开始新的修复或重试
+            max_file_attempts: 每轮每个文件最多 SDK 修复次数；每次修复后立即用两个
+                工具复检该文件，仍有错误则用新诊断重试（1 为修复一次、不复检）；
+                重试计入 max_fix_calls
+        """
+        self.ruff = QualityCheckController(
+            tool="ruff",
+            agent=ruff_agent,
+            source_dir=source_dir,
+            max_cycles=max_cycles,
+            sdk_call_delay=sdk_call_delay,
+            sdk_timeout=sdk_timeout,
+            max_fix_workers=max_fix_workers,
+            final_full_check=final_full_check,
+            max_fix_calls=max_fix_calls,
+            fix_time_budget=fix_time_budget,
+            max_file_attempts=max_file_attempts,
+        )
+        self.basedpyright = QualityCheckController(
+            tool="basedpyright",
+            agent=basedpyright_agent,
+            source_dir=source_dir,
+            max_cycles=max_cycles,
+            sdk_call_delay=sdk_call_delay,
+            sdk_timeout=sdk_timeout,
+            max_fix_workers=max_fix_workers,
+            final_full_check=final_full_check,
+            max_fix_calls=max_fix_calls,
+            fix_time_budget=fix_time_budget,
+            max_file_attempts=max_file_attempts,
+        )
+        self.ruff_agent: RuffAgent = ruff_agent
+        self.basedpyright_agent: BasedPyrightAgent = basedpyright_agent
+        self.source_dir: str = source_dir
+        self.max_cycles: int = max_cycles
+        self.sdk_call_delay: int = sdk_call_delay
+        self.sdk_timeout: int = sdk_timeout
+        self.max_fix_workers: int = max_fix_workers
+        self.final_full_check: bool = final_full_check
+        self.max_fix_calls: int | None = max_fix_calls
+        self.fix_time_budget: float | None = fix_time_budget
+        self.max_file_attempts: int = max(1, max_file_attempts)
+        self.current_cycle: int = 0
+        # 按合并后的文件排序（两类错误一起计分）
+        self.prioritizer: FixPrioritizer = FixPrioritizer(
+            source_dir, self.ruff._import_roots(), max_calls=max_fix_calls
+        )
+
+        self.logger: logging.Logger = logging.getLogger(f"{__name__}.combined_controller")
+
+    async def run(self) -> dict[str, dict[str, Any]]:
+        """
+        主入口：检查 ↔ 合并 SDK 修复循环
+
+        Returns:
+            {"ruff": <QualityCheckController 结果>, "basedpyright": <同上>}
+        """
+        # 1. 首轮全量检查
+        self.current_cycle = 0
+        ruff_errors, type_errors = await self._run_check_phase()
+        self.ruff.initial_error_files = list(ruff_errors)
+        self.basedpyright.initial_error_files = list(type_errors)
+        if self._check_failed():
+            return self._build_results(ruff_errors, type_errors)
+
+        self.logger.info(
+            f"Initial checks: ruff {len(ruff_errors)} files, "
+            f"basedpyright {len(type_errors)} files with errors"
+        )
+
+        # 2. 两者都无错误则直接成功
+        if not ruff_errors and not type_errors:
+            return {
+                "ruff": self.ruff._build_success_result(),
+                "basedpyright": self.basedpyright._build_success_result(),
+            }
+
+        # 3. 合并修复循环
+        while (ruff_errors or type_errors) and self.current_cycle < self.max_cycles:
+            combined = {
+                file_path: [*file_ruff_errors, *file_type_errors]
+                for file_path, file_ruff_errors, file_type_errors
+                in self._merge(ruff_errors, type_errors).values()
+            }
+            plan = await self.prioritizer.plan(combined)
+            if not plan:
+                self.logger.warning(
+                    f"Remaining {len(combined)} file(s) did not change after repeated fixes - stopping"
+                )
+                if self.final_full_check and self.current_cycle > 0:
+                    ruff_errors, type_errors = await self._run_check_phase()
+                break
+
+            self.logger.info(
+                f"Combined cycle {self.current_cycle}/{self.max_cycles}: "
+                f"fixing {len(plan)} of {len(combined)} files"
+            )
+            attempted = await self._run_sdk_fix_phase(ruff_errors, type_errors, plan)
+            self.prioritizer.record_attempts(attempted, combined)
+            ruff_errors, type_errors = await self._run_check_phase(
+                attempted, previous=(ruff_errors, type_errors)
+            )
+            self.current_cycle += 1
+            if self._check_failed():
+                break
+
+            # 作用域检查通过或轮次用尽后全量验证；发现新错误且还有轮次则继续修复
+            if self.final_full_check and (
+                not (ruff_errors or type_errors) or self.current_cycle >= self.max_cycles
+            ):
+                self.logger.info("Final full verification check")
+                ruff_errors, type_errors = await self._run_check_phase()
+
+        # 4. 构造各工具的最终结果（保持单工具结果结构）
+        return self._build_results(ruff_errors, type_errors)
+
+    def _check_failed(self) -> bool:
+        """最近一次检查中是否有工具未能执行"""
+        return bool(self.ruff.check_error or self.basedpyright.check_error)
+
+    def _build_results(
+        self, ruff_errors: ErrorMap, type_errors: ErrorMap
+    ) -> dict[str, dict[str, Any]]:
+        """构造各工具的最终结果（保持单工具结果结构）"""
+        results: dict[str, dict[str, Any]] = {}
+        dropped_keys = {file_key(file_path) for file_path in self.prioritizer.dropped}
+        for controller, errors in ((self.ruff, ruff_errors), (self.basedpyright, type_errors)):
+            controller.current_cycle = self.current_cycle
+            controller.dropped_files = [
+                file_path for file_path in errors if file_key(file_path) in dropped_keys
+            ]
+            if not controller.initial_error_files and not errors and not controller.check_error:
+                results[controller.tool] = controller._build_success_result()
+                continue
+            controller.final_error_files = list(errors)
+            controller.final_detailed_errors = errors
+            results[controller.tool] = controller._build_final_result()
+        return results
+
+    async def _run_check_phase(
+        self,
+        files: list[str] | None = None,
+        previous: tuple[ErrorMap, ErrorMap] | None = None,
+    ) -> tuple[ErrorMap, ErrorMap]:
+        """
+        依次运行 Ruff 与 BasedPyright 检查（Ruff 的自动修复完成后才开始类型检查）
+
+        Args:
+            files: 本轮修复的文件（各工具按自己的回归范围检查）；None 为全量检查
+            previous: 上一轮的 (Ruff, 类型) 错误；回归范围外的文件保留这些错误
+        """
+        if files is None:
+            ruff_scope = type_scope = None
+        else:
+            ruff_scope = await self.ruff._regression_scope(files)
+            type_scope = await self.basedpyright._regression_scope(files)
+        ruff_errors = await self.ruff._run_check_phase(ruff_scope)
+        type_errors = await self.basedpyright._run_check_phase(type_scope)
+        if previous is not None and ruff_scope is not None and type_scope is not None:
+            ruff_errors = QualityCheckController.carry_over(previous[0], ruff_scope, ruff_errors)
+            type_errors = QualityCheckController.carry_over(previous[1], type_scope, type_errors)
+        return ruff_errors, type_errors
+
+    @staticmethod
+    def _file_key(file_path: str) -> str:
+        # Ruff 与 BasedPyright 输出的路径写法可能不同
+        return os.path.normcase(os.path.abspath(file_path))
+
+    def _merge(
+        self,
+        ruff_errors: ErrorMap,
+        type_errors: ErrorMap,
+    ) -> dict[str, tuple[str, list[dict[str, object]], list[dict[str, object]]]]:
+        """
+        按文件合并两类错误
+
+        Returns:
+            {文件键: (文件路径, Ruff 错误, 类型错误)}
+        """
+        merged: dict[str, tuple[str, list[dict[str, object]], list[dict[str, object]]]] = {}
+        for file_path, errors in ruff_errors.items():
+            merged[self._file_key(file_path)] = (file_path, errors, [])
+        for file_path, errors in type_errors.items():
+            key = self._file_key(file_path)
+            if key in merged:
+                merged[key] = (merged[key][0], merged[key][1], errors)
+            else:
+                merged[key] = (file_path, [], errors)
+        return merged
+
+    async def _run_sdk_fix_phase(
+        self,
+        ruff_errors: ErrorMap,
+        type_errors: ErrorMap,
+        plan: list[str] | None = None,
+    ) -> list[str]:
+        """
+        每个文件一次 SDK 调用，同时修复 Ruff 与类型错误
+
+        最多 max_fix_workers 个文件并行修复（文件锁 + 按 import 分组），
+        按 plan 的顺序开始，超过 fix_time_budget 后不再开始新的修复。
+
+        Args:
+            ruff_errors: Ruff 按文件分组的错误
+            type_errors: BasedPyright 按文件分组的错误
+            plan: 本轮要修复的文件（合并后的路径，按优先级排序）；None 为全部文件
+
+        Returns:
+            实际开始修复的文件
+        """
+        merged = self._merge(ruff_errors, type_errors)
+        by_path = {entry[0]: entry for entry in merged.values()}
+        files = list(by_path) if plan is None else plan
+        positions = {file_path: idx for idx, file_path in enumerate(files, 1)}
+        # 本轮所有文件（含重试）共享调用数与时间预算
+        budget = FixBudget(self.max_fix_calls, self.fix_time_budget)
+        total_files = len(files)
+
+        async def fix_file(file_path: str) -> None:
+            _, file_ruff_errors, file_type_errors = by_path[file_path]
+            await self._fix_file(
+                budget,
+                file_path,
+                file_ruff_errors,
+                file_type_errors,
+                positions[file_path],
+                total_files,
+            )
+
+        return await run_fix_pool(
+            files,
+            fix_file,
+            max_workers=self.max_fix_workers,
+            call_delay=self.sdk_call_delay,
+            import_roots=self.ruff._import_roots(),
+            time_budget=self.fix_time_budget,
+        )
+
+    async def _fix_file(
+        self,
+        budget: FixBudget,
+        file_path: str,
+        file_ruff_errors: list[dict[str, object]],
+        file_type_errors: list[dict[str, object]],
+        idx: int,
+        total_files: int,
+    ) -> None:
+        """
+        合并修复单个文件并立即复检
+
+        每次 SDK 修复后依次用 Ruff 与 BasedPyright 只检查该文件；仍有错误时
+        用新的诊断立即重试，最多 max_file_attempts 次。最后一次修复不复检。
+        每次修复都从本轮的 budget 中占用一次调用。
+        """
+        for attempt in range(1, self.max_file_attempts + 1):
+            if attempt > 1 and self.sdk_call_delay > 0:
+                await asyncio.sleep(self.sdk_call_delay)
+            if not budget.take(file_path, attempt):
+                return
+            if not await self._fix_file_once(
+                file_path, file_ruff_errors, file_type_errors, idx, total_files, attempt
+            ):
+                return
+            if attempt == self.max_file_attempts:
+                return
+
+            # Ruff 可能改写文件，类型检查须在其后
+            ruff_left = await self.ruff._check_file(file_path)
+            if ruff_left is None:
+                return
+            type_left = await self.basedpyright._check_file(file_path)
+            if type_left is None:
+                return
+            if not ruff_left and not type_left:
+                self.logger.info(f"{file_path}: verified clean after {attempt} fix attempt(s)")
+                return
+            self.logger.info(
+                f"{file_path}: {len(ruff_left)} ruff, {len(type_left)} type error(s) "
+                f"left after attempt {attempt}, retrying"
+            )
+            file_ruff_errors, file_type_errors = ruff_left, type_left
+
+    async def _fix_file_once(
+        self,
+        file_path: str,
+        file_ruff_errors: list[dict[str, object]],
+        file_type_errors: list[dict[str, object]],
+        idx: int,
+        total_files: int,
+        attempt: int = 1,
+    ) -> bool:
+        """对单个文件执行一次合并 SDK 修复，失败时返回 False"""
+        self.logger.info(
+            f"[{idx}/{total_files}] Fixing {file_path} "
+            f"({len(file_ruff_errors)} ruff, {len(file_type_errors)} type errors) "
+            f"- Cycle {self.current_cycle}, attempt {attempt}"
+        )
+        # 修复失败记录到对应工具的结果中
+        owners = [
+            controller
+            for controller, errors in (
+                (self.ruff, file_ruff_errors),
+                (self.basedpyright, file_type_errors),
+            )
+            if errors
+        ]
+
+        try:
+            try:
+                with open(file_path, encoding="utf-8") as f:
+                    file_content = f.read()
+            except Exception as e:
+                self.logger.error(f"Failed to read {file_path}: {e}")
+                self._record_fix_error(owners, file_path, f"File read error: {str(e)}")
+                return False
+
+            prompt = build_combined_fix_prompt(
+                self.ruff_agent,
+                self.basedpyright_agent,
+                file_path=file_path,
+                file_content=file_content,
+                ruff_errors=file_ruff_errors,
+                type_errors=file_type_errors,
+            )
+
+            # 复用单工具控制器的 SDK 调用（超时、结果处理一致）
+            sdk_result = await owners[0]._execute_sdk_fix(prompt=prompt, file_path=file_path)
+            if not sdk_result.get("success"):
+                self._record_fix_error(owners, file_path, sdk_result.get("error"))
+                return False
+            return True
+
+        except Exception as e:
+            self.logger.error(f"SDK fix failed for {file_path}: {e}", exc_info=True)
+            self._record_fix_error(owners, file_path, str(e))
+            return False
+
+    def _record_fix_error(
+        self,
+        owners: list[QualityCheckController],
+        file_path: str,
+        error: object,
+    ) -> None:
+        for controller in owners:
+            controller.sdk_fix_errors.append({
+                "file": file_path,
+                "error": error,
+                "cycle": self.current_cycle,
+            })
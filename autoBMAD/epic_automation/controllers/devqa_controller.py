@@ -14,6 +14,7 @@ from autoBMAD.epic_automation.agents.state_agent import StateAgent
 from autoBMAD.epic_automation.agents.dev_agent import DevAgent
 from autoBMAD.epic_automation.agents.qa_agent import QAAgent
 from autoBMAD.epic_automation.state_manager import StateManager
+from autoBMAD.epic_automation.story_watcher import wait_for_status_change
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +28,8 @@ class DevQaController(StateDrivenController):
         use_claude: bool = True,
         log_manager: Any = None,
         state_manager: StateManager | None = None,
-        epic_path: str | None = None
+        epic_path: str | None = None,
+        watch_dirs: list[str] | None = None,
     ):
         """
         初始化 DevQa 控制器
@@ -38,13 +40,20 @@ class DevQaController(StateDrivenController):
             log_manager: 日志管理器
             state_manager: 状态管理器实例（可选）
             epic_path: Epic文件路径（用于数据库状态追踪）
+            watch_dirs: 源码/测试目录（记录 Dev 改动、判断 QA 结论能否沿用）
         """
         super().__init__(task_group)
         self.state_agent = StateAgent(task_group=task_group)
-        self.dev_agent = DevAgent(task_group=task_group, use_claude=use_claude, log_manager=log_manager)
-        self.qa_agent = QAAgent(task_group=task_group, use_claude=use_claude, log_manager=log_manager)
+        self.dev_agent = DevAgent(
+            task_group=task_group, use_claude=use_claude, log_manager=log_manager, watch_dirs=watch_dirs
+        )
+        self.qa_agent = QAAgent(
+            task_group=task_group, use_claude=use_claude, log_manager=log_manager, watch_dirs=watch_dirs
+        )
         self.state_manager = state_manager or StateManager()
         self.max_rounds = 3
+        # Dev/QA 结束后等待代理写入状态的最长时间（秒）
+        self.status_change_timeout = 1.0
         self._story_path: str | None = None
         self._epic_path: str | None = epic_path  # ← 保存epic_path
         self._log_execution("DevQaController initialized")
@@ -126,7 +135,8 @@ class DevQaController(StateDrivenController):
         基于 StateAgent 解析的核心状态值做出 Dev-QA 决策
         
         循环模式：State → Dev/QA → State
-        每次循环开始和结束都通过 StateAgent 获取最新核心状态
+        每轮开始时通过 StateAgent 获取核心状态；Dev/QA 结束后监视故事文件，
+        状态一变化立即继续决策，未变化则交回状态机
 
         Args:
             current_state: 上一次的状态（仅用于日志）
@@ -152,87 +162,122 @@ class DevQaController(StateDrivenController):
                 return "Error"
 
             self._log_execution(f"[State Result] Core status: {current_status}")
+            return await self._decide(current_status)
 
-            # 🎯 状态决策逻辑：基于核心状态值，不依赖数据库
-            if current_status in ["Done", "Ready for Done"]:
-                self._log_execution(f"Story reached terminal state: {current_status}")
-                return current_status
+        except Exception as e:
+            self._log_execution(f"Decision error: {e}", "error")
+            return "Error"
 
-            elif current_status == "Failed":
-                # 允许重新开发失败的故事
-                self._log_execution("[Decision] Failed → Dev phase")
-                story_path = self._story_path
+    async def _decide(self, current_status: str) -> str:
+        """
+        根据核心状态值执行 Dev/QA 阶段
 
-                async def call_dev_agent():
-                    return await self.dev_agent.execute(story_path)
+        Args:
+            current_status: 当前核心状态值
 
-                dev_result = await self._execute_within_taskgroup(call_dev_agent)
+        Returns:
+            str: 下一个状态
+        """
+        assert self._story_path is not None
+        # 🎯 状态决策逻辑：基于核心状态值，不依赖数据库
+        if current_status in ["Done", "Ready for Done"]:
+            self._log_execution(f"Story reached terminal state: {current_status}")
+            return current_status
 
-                # 方案2：Dev完成后更新处理状态
-                await self._update_processing_status_after_dev(story_path, dev_result)
+        elif current_status == "Failed":
+            # 允许重新开发失败的故事
+            self._log_execution("[Decision] Failed → Dev phase")
+            story_path = self._story_path
 
-                # 🎯 Dev 完成后，再次查询状态
-                self._log_execution("[Post-Dev] Querying StateAgent for updated status")
-                return await self._make_decision("AfterDev")
+            async def call_dev_agent():
+                return await self.dev_agent.execute(story_path)
 
-            elif current_status in ["Draft", "Ready for Development"]:
-                # 需要开发
-                self._log_execution(f"[Decision] {current_status} → Dev phase")
-                story_path = self._story_path
+            dev_result = await self._execute_within_taskgroup(call_dev_agent)
 
-                async def call_dev_agent():
-                    return await self.dev_agent.execute(story_path)
+            # 方案2：Dev完成后更新处理状态
+            await self._update_processing_status_after_dev(story_path, dev_result)
 
-                dev_result = await self._execute_within_taskgroup(call_dev_agent)
+            # 🎯 Dev 完成后，等待状态变化（文件写入即返回）
+            return await self._decide_after_phase(current_status, "Post-Dev")
 
-                # 方案2：Dev完成后更新处理状态
-                await self._update_processing_status_after_dev(story_path, dev_result)
+        elif current_status in ["Draft", "Ready for Development"]:
+            # 需要开发
+            self._log_execution(f"[Decision] {current_status} → Dev phase")
+            story_path = self._story_path
 
-                # 🎯 Dev 完成后，再次查询状态
-                self._log_execution("[Post-Dev] Querying StateAgent for updated status")
-                return await self._make_decision("AfterDev")
+            async def call_dev_agent():
+                return await self.dev_agent.execute(story_path)
 
-            elif current_status == "In Progress":
-                # 继续开发
-                self._log_execution("[Decision] In Progress → Continue Dev phase")
-                story_path = self._story_path
+            dev_result = await self._execute_within_taskgroup(call_dev_agent)
 
-                async def call_dev_agent():
-                    return await self.dev_agent.execute(story_path)
+            # 方案2：Dev完成后更新处理状态
+            await self._update_processing_status_after_dev(story_path, dev_result)
 
-                dev_result = await self._execute_within_taskgroup(call_dev_agent)
+            # 🎯 Dev 完成后，等待状态变化（文件写入即返回）
+            return await self._decide_after_phase(current_status, "Post-Dev")
 
-                # 方案2：Dev完成后更新处理状态
-                await self._update_processing_status_after_dev(story_path, dev_result)
+        elif current_status == "In Progress":
+            # 继续开发
+            self._log_execution("[Decision] In Progress → Continue Dev phase")
+            story_path = self._story_path
 
-                # 🎯 Dev 完成后，再次查询状态
-                self._log_execution("[Post-Dev] Querying StateAgent for updated status")
-                return await self._make_decision("AfterDev")
+            async def call_dev_agent():
+                return await self.dev_agent.execute(story_path)
 
-            elif current_status == "Ready for Review":
-                # 需要 QA
-                self._log_execution("[Decision] Ready for Review → QA phase")
-                story_path = self._story_path
+            dev_result = await self._execute_within_taskgroup(call_dev_agent)
 
-                async def call_qa_agent():
-                    return await self.qa_agent.execute(story_path)
+            # 方案2：Dev完成后更新处理状态
+            await self._update_processing_status_after_dev(story_path, dev_result)
 
-                qa_result = await self._execute_within_taskgroup(call_qa_agent)
+            # 🎯 Dev 完成后，等待状态变化（文件写入即返回）
+            return await self._decide_after_phase(current_status, "Post-Dev")
 
-                # 方案2：QA完成后更新处理状态
-                await self._update_processing_status_after_qa(story_path, qa_result)
+        elif current_status == "Ready for Review":
+            # 需要 QA
+            self._log_execution("[Decision] Ready for Review → QA phase")
+            story_path = self._story_path
 
-                # 🎯 QA 完成后，再次查询状态
-                self._log_execution("[Post-QA] Querying StateAgent for updated status")
-                return await self._make_decision("AfterQA")
+            async def call_qa_agent():
+                return await self.qa_agent.execute(story_path)
 
-            else:
-                self._log_execution(f"Unknown status: {current_status}", "warning")
-                return current_status
+            qa_result = await self._execute_within_taskgroup(call_qa_agent)
 
-        except Exception as e:
-            self._log_execution(f"Decision error: {e}", "error")
-            return "Error"
+            # 方案2：QA完成后更新处理状态
+            await self._update_processing_status_after_qa(story_path, qa_result)
+
+            # 🎯 QA 完成后，等待状态变化（文件写入即返回）
+            return await self._decide_after_phase(current_status, "Post-QA")
+
+        else:
+            self._log_execution(f"Unknown status: {current_status}", "warning")
+            return current_status
+
+    async def _decide_after_phase(self, previous_status: str, phase: str) -> str:
+        """
+        Dev/QA 阶段结束后等待状态变化并继续决策
+
+        状态未变化时不再重复执行同一阶段，而是交回状态机（受 max_rounds 限制）。
+
+        Args:
+            previous_status: 阶段开始前的核心状态值
+            phase: 阶段标签（仅用于日志）
+
+        Returns:
+            str: 下一个状态
+        """
+        assert self._story_path is not None
+        new_status = await wait_for_status_change(
+            self._story_path,
+            timeout=self.status_change_timeout,
+            previous_status=previous_status,
+            parse_status=self.state_agent.parse_status,
+        )
+        if new_status is None:
+            self._log_execution(f"[{phase}] No status change made (still {previous_status})", "warning")
+            return previous_status
+
+        self._log_execution(f"[{phase}] Status changed: {previous_status} → {new_status}")
+        return await self._decide(new_status)
 
     def _is_termination_state(self, state: str) -> bool:
         """判断是否为 Dev-QA 的终止状态"""
@@ -11,10 +11,13 @@ from __future__ import annotations
 
 import json
 import logging
+import os
 import time
 from pathlib import Path
 from typing import Any, List, cast
 
+from ..fix_pool import DEFAULT_FIX_WORKERS, run_fix_pool
+
 logger = logging.getLogger(__name__)
 
 
@@ -34,6 +37,7 @@ class PytestController:
         test_dir: str,
         max_cycles: int = 3,
         summary_json_path: str | None = None,
+        max_fix_workers: int = DEFAULT_FIX_WORKERS,
     ):
         """
         初始化 PytestController
@@ -43,11 +47,13 @@ class PytestController:
             test_dir: 测试目录
             max_cycles: 最大修复循环次数
             summary_json_path: 汇总 JSON 文件路径
+            max_fix_workers: 并行修复的最大测试文件数（1 为逐个修复）
         """
         self.source_dir = source_dir
         self.test_dir = test_dir
         self.max_cycles = max_cycles
         self.summary_json_path = summary_json_path or "pytest_summary.json"
+        self.max_fix_workers = max_fix_workers
 
         # 状态
         self.current_cycle: int = 0
@@ -218,7 +224,10 @@ class PytestController:
         round_index: int,
     ) -> None:
         """
-        针对失败文件，依次触发 SDK 修复调用
+        针对失败文件，并行触发 SDK 修复调用
+
+        最多 max_fix_workers 个文件并行修复；修复期间持有测试文件的文件锁。
+        导入同一源码模块的测试文件（修复时可能都要改该模块）由同一 worker 依次修复。
 
         核心流程（每个文件）：
         1. 构造 Prompt（文件内容 + 失败信息）
@@ -226,7 +235,6 @@ class PytestController:
         3. 收到 ResultMessage（完成信号）
         4. 触发取消 SDK 调用
         5. 等待取消确认成功
-        6. 处理下一个文件
 
         Args:
             failed_files: 需要修复的测试文件列表
@@ -234,37 +242,50 @@ class PytestController:
         """
         logger.info(f"SDK Fix Phase {round_index}: Processing {len(failed_files)} file(s)")
 
-        for test_file in failed_files:
-            try:
-                logger.info(f"Processing SDK fix for: {test_file}")
-
-                # 调用 pytest agent 的 SDK 修复接口
-                result = await self.pytest_agent.run_sdk_fix_for_file(
-                    test_file=test_file,
-                    source_dir=self.source_dir,
-                    summary_json_path=self.summary_json_path,
-                    round_index=round_index,
-                )
+        async def fix_file(test_file: str) -> None:
+            await self._fix_test_file(test_file, round_index)
 
-                if not result.get("success"):
-                    # 记录 SDK 调用层面的错误
-                    error_info = {
-                        "test_file": test_file,
-                        "error": result.get("error", "Unknown SDK error"),
-                        "round_index": round_index,
-                    }
-                    self.sdk_fix_errors.append(error_info)
-                    logger.warning(f"SDK fix failed for {test_file}: {error_info['error']}")
+        source_dir = os.path.abspath(self.source_dir)
+        await run_fix_pool(
+            failed_files,
+            fix_file,
+            max_workers=self.max_fix_workers,
+            import_roots=[source_dir, os.path.dirname(source_dir), self.test_dir],
+            shared_imports=True,
+        )
 
-            except Exception as e:
-                # 捕获意外异常，不中断后续文件的修复
+    async def _fix_test_file(self, test_file: str, round_index: int) -> None:
+        """对单个测试文件执行 SDK 修复，失败记录到 sdk_fix_errors"""
+        try:
+            logger.info(f"Processing SDK fix for: {test_file}")
+
+            # 调用 pytest agent 的 SDK 修复接口
+            result = await self.pytest_agent.run_sdk_fix_for_file(
+                test_file=test_file,
+                source_dir=self.source_dir,
+                summary_json_path=self.summary_json_path,
+                round_index=round_index,
+            )
+
+            if not result.get("success"):
+                # 记录 SDK 调用层面的错误
                 error_info = {
                     "test_file": test_file,
-                    "error": f"SDK phase exception: {str(e)}",
+                    "error": result.get("error", "Unknown SDK error"),
                     "round_index": round_index,
                 }
                 self.sdk_fix_errors.append(error_info)
-                logger.error(f"SDK fix exception for {test_file}: {e}", exc_info=True)
+                logger.warning(f"SDK fix failed for {test_file}: {error_info['error']}")
+
+        except Exception as e:
+            # 捕获意外异常，不中断后续文件的修复
+            error_info = {
+                "test_file": test_file,
+                "error": f"SDK phase exception: {str(e)}",
+                "round_index": round_index,
+            }
+            self.sdk_fix_errors.append(error_info)
+            logger.error(f"SDK fix exception for {test_file}: {e}", exc_info=True)
 
     def _discover_test_files(self) -> List[str]:
         """递归枚举 test_dir 下所有测试文件，按字典序排序"""
@@ -17,9 +17,20 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import os
 from typing import Any
 
 from autoBMAD.epic_automation.agents.quality_agents import BaseQualityAgent
+from autoBMAD.epic_automation.fix_pool import (
+    DEFAULT_FILE_FIX_ATTEMPTS,
+    DEFAULT_FIX_WORKERS,
+    FixBudget,
+    run_fix_pool,
+)
+from autoBMAD.epic_automation.fix_priority import FixPrioritizer
+from autoBMAD.epic_automation.import_graph import file_key, find_importers
+
+ErrorMap = dict[str, list[dict[str, object]]]
 
 
 class QualityCheckController:
@@ -41,6 +52,11 @@ class QualityCheckController:
         max_cycles: int = 3,
         sdk_call_delay: int = 10,
         sdk_timeout: int = 600,
+        max_fix_workers: int = DEFAULT_FIX_WORKERS,
+        final_full_check: bool = True,
+        max_fix_calls: int | None = None,
+        fix_time_budget: float | None = None,
+        max_file_attempts: int = DEFAULT_FILE_FIX_ATTEMPTS,
     ):
         """
         初始化质量检查控制器
@@ -50,8 +66,16 @@ class QualityCheckController:
             agent: 对应的 Agent 实例
             source_dir: 源代码目录
             max_cycles: 最大循环次数
-            sdk_call_delay: SDK调用间延时（秒）
+            sdk_call_delay: 同一修复 worker 两次 SDK 调用间延时（秒）
             sdk_timeout: SDK超时时间（秒）
+            max_fix_workers: 并行修复的最大文件数（1 为逐个修复）
+            final_full_check: 作用域回归检查通过或轮次用尽后，再全量检查一次
+            max_fix_calls: 每轮最多 SDK 修复调用数（含单文件重试；按影响排序取前 N 个
+                文件），None 为不限
+            fix_time_budget: 每轮修复阶段的墙钟预算（秒），超时后不再开始新的修复或重试
+            max_file_attempts: 每轮每个文件最多 SDK 修复次数；每次修复后立即单独
+                复检该文件，仍有错误则用新诊断重试（1 为修复一次、不复检）；
+                重试计入 max_fix_calls
         """
         # 添加类型注解
         self.tool: str = tool
@@ -60,6 +84,11 @@ class QualityCheckController:
         self.max_cycles: int = max_cycles
         self.sdk_call_delay: int = sdk_call_delay
         self.sdk_timeout: int = sdk_timeout
+        self.max_fix_workers: int = max_fix_workers
+        self.final_full_check: bool = final_full_check
+        self.max_fix_calls: int | None = max_fix_calls
+        self.fix_time_budget: float | None = fix_time_budget
+        self.max_file_attempts: int = max(1, max_file_attempts)
 
         # 状态
         self.current_cycle: int = 0
@@ -68,6 +97,12 @@ class QualityCheckController:
         self.final_error_files: list[str] = []
         self.final_detailed_errors: dict[str, list[dict[str, object]]] = {}
         self.sdk_fix_errors: list[dict[str, object]] = []
+        self.dropped_files: list[str] = []
+        # 最近一次检查未能执行时的错误（此时检查结果不可信）
+        self.check_error: str | None = None
+        self.prioritizer: FixPrioritizer = FixPrioritizer(
+            source_dir, self._import_roots(), max_calls=max_fix_calls
+        )
 
         self.logger: logging.Logger = logging.getLogger(f"{__name__}.{tool}_controller")
 
@@ -84,12 +119,15 @@ class QualityCheckController:
                 "final_error_files": List[str],
                 "sdk_fix_attempted": bool,
                 "sdk_fix_errors": List[dict],
+                "check_failed": bool,  # 检查本身未能执行（结果为 failed）
             }
         """
         # 1. 首轮全量检查
         self.current_cycle = 0
         error_files = await self._run_check_phase()
         self.initial_error_files = list(error_files.keys())
+        if self.check_error:
+            return self._build_final_result()
 
         self.logger.info(
             f"{self.tool} initial check: "
@@ -102,29 +140,60 @@ class QualityCheckController:
 
         # 3. 进入修复循环（最多 3 轮）
         while error_files and self.current_cycle < self.max_cycles:
+            # 按影响排序并应用每轮预算；两次修复后诊断不变的文件不再修复
+            plan = await self.prioritizer.plan(error_files)
+            if not plan:
+                self.logger.warning(
+                    f"{self.tool}: remaining {len(error_files)} file(s) did not change "
+                    f"after repeated fixes - stopping"
+                )
+                if self.final_full_check and self.current_cycle > 0:
+                    error_files = await self._run_check_phase()
+                break
+
             self.logger.info(
                 f"{self.tool} cycle {self.current_cycle}/{self.max_cycles}: "
-                f"Fixing {len(error_files)} files"
+                f"Fixing {len(plan)} of {len(error_files)} files"
             )
 
             # SDK 修复阶段
-            await self._run_sdk_fix_phase(error_files)
+            attempted = await self._run_sdk_fix_phase(error_files, plan)
+            self.prioritizer.record_attempts(attempted, error_files)
 
-            # 回归检查阶段
-            error_files = await self._run_check_phase()
+            # 回归检查阶段（只检查本轮修复的文件及受影响的文件）
+            scope = await self._regression_scope(attempted)
+            error_files = self.carry_over(
+                error_files, scope, await self._run_check_phase(files=scope)
+            )
 
             self.current_cycle += 1
+            if self.check_error:
+                break
+
+            # 作用域检查通过或轮次用尽后全量验证；发现新错误且还有轮次则继续修复
+            if self.final_full_check and (
+                not error_files or self.current_cycle >= self.max_cycles
+            ):
+                self.logger.info(f"{self.tool} final full verification check")
+                error_files = await self._run_check_phase()
 
         # 4. 构造最终结果
+        self.dropped_files = [path for path in error_files if path in self.prioritizer.dropped]
         self.final_error_files = list(error_files.keys())
         # 存储最终详细错误信息
         self.final_detailed_errors = error_files
         return self._build_final_result()
 
-    async def _run_check_phase(self) -> dict[str, list[dict[str, object]]]:
+    async def _run_check_phase(
+        self,
+        files: list[str] | None = None,
+    ) -> dict[str, list[dict[str, object]]]:
         """
         执行质量检查，返回按文件分组的错误
 
+        Args:
+            files: 回归检查涉及的文件（Agent 支持时只检查这些文件）；None 为全量检查
+
         Returns:
             {
                 "src/module.py": [
@@ -135,16 +204,16 @@ class QualityCheckController:
             }
         """
         self.logger.info(f"Running {self.tool} check...")
+        self.check_error = None
 
         try:
             # 1. 调用 Agent 执行检查
-            result = await self.agent.execute(source_dir=self.source_dir)
+            result = await self.agent.execute(source_dir=self.source_dir, files=files)
 
             # 2. 检查执行失败
             if result["status"] != "completed":
-                self.logger.error(
-                    f"{self.tool} check failed: {result.get('error')}"
-                )
+                self.check_error = f"{self.tool} check failed: {result.get('error')}"
+                self.logger.error(self.check_error)
                 return {}
 
             # 3. 提取按文件分组的错误
@@ -164,15 +233,38 @@ class QualityCheckController:
             return errors_by_file
 
         except Exception as e:
-            self.logger.error(f"{self.tool} check exception: {e}", exc_info=True)
+            self.check_error = f"{self.tool} check exception: {e}"
+            self.logger.error(self.check_error, exc_info=True)
             return {}
 
+    @staticmethod
+    def carry_over(previous: ErrorMap, scope: list[str], checked: ErrorMap) -> ErrorMap:
+        """
+        合并回归检查结果：范围外（本轮未修复）文件保留上一轮的错误
+
+        Args:
+            previous: 上一轮的错误
+            scope: 本轮回归检查的文件
+            checked: 回归检查结果
+        """
+        scope_keys = {file_key(path) for path in scope}
+        merged = dict(checked)
+        for path, errors in previous.items():
+            if file_key(path) not in scope_keys:
+                merged.setdefault(path, errors)
+        return merged
+
     async def _run_sdk_fix_phase(
         self,
-        error_files: dict[str, list[dict[str, object]]]
-    ) -> None:
+        error_files: dict[str, list[dict[str, object]]],
+        plan: list[str] | None = None,
+    ) -> list[str]:
         """
-        针对每个错误文件，调用 SDK 修复
+        针对错误文件调用 SDK 修复
+
+        最多 max_fix_workers 个文件并行修复；每个文件修复期间持有文件锁，
+        相互 import 的文件由同一 worker 依次修复。文件按 plan 的顺序开始修复，
+        超过 fix_time_budget 后不再开始新的修复。
 
         核心流程（每个文件）：
         1. 读取文件内容
@@ -180,71 +272,176 @@ class QualityCheckController:
         3. 调用 SafeClaudeSDK
         4. 接收 ResultMessage
         5. 触发取消并等待确认
-        6. 延时 1 分钟后处理下一个文件
 
         Args:
             error_files: {"文件路径": [错误列表]}
+            plan: 本轮要修复的文件（按优先级排序）；None 为全部文件
+
+        Returns:
+            实际开始修复的文件
+        """
+        files = list(error_files) if plan is None else plan
+        positions = {file_path: idx for idx, file_path in enumerate(files, 1)}
+        # 本轮所有文件（含重试）共享调用数与时间预算
+        budget = FixBudget(self.max_fix_calls, self.fix_time_budget)
+        total_files: int = len(files)
+
+        async def fix_file(file_path: str) -> None:
+            await self._fix_file(
+                budget, file_path, error_files[file_path], positions[file_path], total_files
+            )
+
+        return await run_fix_pool(
+            files,
+            fix_file,
+            max_workers=self.max_fix_workers,
+            call_delay=self.sdk_call_delay,
+            import_roots=self._import_roots(),
+            time_budget=self.fix_time_budget,
+        )
+
+    async def _regression_scope(self, fixed_files: list[str]) -> list[str]:
+        """
+        回归检查的文件范围
+
+        Ruff 只检查修复过的文件；BasedPyright 的诊断会随被导入文件变化，
+        因此还包括导入了这些文件的模块。
         """
-        total_files: int = len(error_files)
+        if self.tool != "basedpyright":
+            return fixed_files
+        importers = await asyncio.to_thread(
+            find_importers, fixed_files, self.source_dir, self._import_roots()
+        )
+        return list(dict.fromkeys([*fixed_files, *importers]))
 
-        for idx, (file_path, errors) in enumerate(error_files.items(), 1):
+    def _import_roots(self) -> list[str]:
+        """解析绝对 import 的根目录：源代码目录及其父目录"""
+        source_dir = os.path.abspath(self.source_dir)
+        return [source_dir, os.path.dirname(source_dir)]
+
+    async def _fix_file(
+        self,
+        budget: FixBudget,
+        file_path: str,
+        errors: list[dict[str, object]],
+        idx: int,
+        total_files: int,
+    ) -> None:
+        """
+        修复单个文件并立即复检
+
+        每次 SDK 修复后只对该文件重新运行工具；仍有错误时用新的诊断立即重试，
+        最多 max_file_attempts 次。最后一次修复不复检（由回归检查覆盖）。
+        每次修复都从本轮的 budget 中占用一次调用。
+        """
+        for attempt in range(1, self.max_file_attempts + 1):
+            if attempt > 1 and self.sdk_call_delay > 0:
+                await asyncio.sleep(self.sdk_call_delay)
+            if not budget.take(file_path, attempt):
+                return
+            if not await self._fix_file_once(file_path, errors, idx, total_files, attempt):
+                return
+            if attempt == self.max_file_attempts:
+                return
+
+            remaining = await self._check_file(file_path)
+            if remaining is None:
+                return
+            if not remaining:
+                self.logger.info(f"{file_path}: verified clean after {attempt} fix attempt(s)")
+                return
             self.logger.info(
-                f"[{idx}/{total_files}] Fixing {file_path} "
-                f"({len(errors)} errors) - Cycle {self.current_cycle}"
+                f"{file_path}: {len(remaining)} error(s) left after attempt {attempt}, retrying"
             )
+            errors = remaining
 
-            try:
-                # 1. 读取文件内容
-                try:
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        file_content = f.read()
-                except Exception as e:
-                    self.logger.error(f"Failed to read {file_path}: {e}")
-                    self.sdk_fix_errors.append({
-                        "file": file_path,
-                        "error": f"File read error: {str(e)}",
-                        "cycle": self.current_cycle,
-                    })
-                    continue
-
-                # 2. 构造 Prompt
-                prompt = self.agent.build_fix_prompt(
-                    tool=self.tool,
-                    file_path=file_path,
-                    file_content=file_content,
-                    errors=errors,
-                )
+    async def _check_file(self, file_path: str) -> list[dict[str, object]] | None:
+        """
+        只对单个文件运行工具
 
-                # 3. 调用 SDK
-                sdk_result = await self._execute_sdk_fix(
-                    prompt=prompt,
-                    file_path=file_path,
-                )
+        Returns:
+            该文件的错误（无错误为空列表）；检查失败返回 None
+        """
+        try:
+            result = await self.agent.execute(source_dir=self.source_dir, files=[file_path])
+        except Exception as e:
+            self.logger.warning(f"{self.tool} check of {file_path} failed: {e}")
+            return None
+        if result["status"] != "completed":
+            self.logger.warning(f"{self.tool} check of {file_path} failed: {result.get('error')}")
+            return None
+
+        issues: list[object] = result.get("issues", [])
+        if not issues:
+            return []
+        key = file_key(file_path)
+        for path, file_errors in self.agent.parse_errors_by_file(issues).items():
+            if file_key(path) == key:
+                return file_errors
+        return []
+
+    async def _fix_file_once(
+        self,
+        file_path: str,
+        errors: list[dict[str, object]],
+        idx: int,
+        total_files: int,
+        attempt: int = 1,
+    ) -> bool:
+        """对单个文件执行一次 SDK 修复，失败记录到 sdk_fix_errors 并返回 False"""
+        self.logger.info(
+            f"[{idx}/{total_files}] Fixing {file_path} "
+            f"({len(errors)} errors) - Cycle {self.current_cycle}, attempt {attempt}"
+        )
 
-                if not sdk_result.get("success"):
-                    self.sdk_fix_errors.append({
-                        "file": file_path,
-                        "error": sdk_result.get("error"),
-                        "cycle": self.current_cycle,
-                    })
+        try:
+            # 1. 读取文件内容
+            try:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    file_content = f.read()
+            except Exception as e:
+                self.logger.error(f"Failed to read {file_path}: {e}")
+                self.sdk_fix_errors.append({
+                    "file": file_path,
+                    "error": f"File read error: {str(e)}",
+                    "cycle": self.current_cycle,
+                })
+                return False
+
+            # 2. 构造 Prompt
+            prompt = self.agent.build_fix_prompt(
+                tool=self.tool,
+                file_path=file_path,
+                file_content=file_content,
+                errors=errors,
+            )
 
-                # 4. 延时 10 s（除最后一个文件）
-                if idx < total_files:
-                    self.logger.debug(
-                        f"Waiting {self.sdk_call_delay}s before next SDK call..."
-                    )
-                    await asyncio.sleep(self.sdk_call_delay)
+            # 3. 调用 SDK
+            sdk_result = await self._execute_sdk_fix(
+                prompt=prompt,
+                file_path=file_path,
+            )
 
-            except Exception as e:
-                self.logger.error(
-                    f"SDK fix failed for {file_path}: {e}",
-                    exc_info=True
-                )
+            if not sdk_result.get("success"):
                 self.sdk_fix_errors.append({
                     "file": file_path,
-                    "error": str(e),
+                    "error": sdk_result.get("error"),
                     "cycle": self.current_cycle,
                 })
+                return False
+            return True
+
+        except Exception as e:
+            self.logger.error(
+                f"SDK fix failed for {file_path}: {e}",
+                exc_info=True
+            )
+            self.sdk_fix_errors.append({
+                "file": file_path,
+                "error": str(e),
+                "cycle": self.current_cycle,
+            })
+            return False
 
     async def _execute_sdk_fix(
         self,
@@ -308,8 +505,8 @@ class QualityCheckController:
         }
 
     def _build_final_result(self) -> dict[str, Any]:
-        """构造最终结果"""
-        success = len(self.final_error_files) == 0
+        """构造最终结果（检查未能执行时为 failed）"""
+        success = len(self.final_error_files) == 0 and not self.check_error
 
         # 构建详细错误信息
         detailed_errors = {}
@@ -340,5 +537,8 @@ class QualityCheckController:
             "final_error_files": self.final_error_files,
             "sdk_fix_attempted": True,
             "sdk_fix_errors": self.sdk_fix_errors,
+            "dropped_files": self.dropped_files,
             "detailed_errors": detailed_errors,
+            "check_failed": self.check_error is not None,
+            "check_error": self.check_error,
         }
@@ -0,0 +1,391 @@
+"""
+Database Maintenance for autoBMAD Epic Automation
+
+Online backup, retention and compaction for the progress.db SQLite database.
+
+- Backup uses the sqlite3 online backup API and copies the database in page
+  batches, so a live WAL database is captured consistently without blocking
+  writers for the whole copy.
+- Retention removes finished story records by age and caps the number of
+  records kept per epic. All values are bound as query parameters.
+- Compaction runs ``PRAGMA incremental_vacuum`` followed by
+  ``PRAGMA wal_checkpoint(TRUNCATE)``. ``run_scheduled`` only runs a task when
+  its interval has elapsed since the last recorded run.
+"""
+
+import json
+import logging
+import sqlite3
+import time
+from collections.abc import Callable, Iterator
+from contextlib import AbstractContextManager, contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "DatabaseMaintenance",
+    "RetentionPolicy",
+    "apply_retention",
+    "compact_database",
+    "online_backup",
+    "prune_backups",
+]
+
+# auto_vacuum 模式值（PRAGMA auto_vacuum 返回值）
+AUTO_VACUUM_INCREMENTAL = 2
+
+# 默认只清理已结束的故事记录
+DEFAULT_RETENTION_STATUSES: tuple[str, ...] = ("completed", "failed")
+
+MAINTENANCE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS maintenance_runs (
+        task TEXT PRIMARY KEY,
+        last_run_at REAL NOT NULL,
+        details TEXT
+    )
+"""
+
+
+@dataclass
+class RetentionPolicy:
+    """Retention rules for the stories table.
+
+    Attributes:
+        max_age_days: Delete matching records not updated for this many days.
+        keep_per_epic: Keep at most this many matching records per epic
+            (most recently updated first).
+        statuses: Only records in these statuses are eligible for deletion.
+    """
+
+    max_age_days: int | None = 30
+    keep_per_epic: int | None = None
+    statuses: tuple[str, ...] = field(default=DEFAULT_RETENTION_STATUSES)
+
+
+def _backup_path_for(db_path: Path) -> Path:
+    """Build a timestamped backup file path next to the database."""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return db_path.parent / f"{db_path.stem}_backup_{timestamp}{db_path.suffix}"
+
+
+def online_backup(
+    db_path: Path,
+    backup_path: Path | None = None,
+    pages_per_step: int = 256,
+    step_sleep: float = 0.0,
+) -> Path:
+    """
+    Copy a live database with the sqlite3 online backup API.
+
+    Args:
+        db_path: Source database file
+        backup_path: Destination file (default: timestamped file next to source)
+        pages_per_step: Pages copied per backup step; writers can proceed
+            between steps
+        step_sleep: Seconds to sleep between steps
+
+    Returns:
+        Path of the written backup file
+    """
+    target = backup_path or _backup_path_for(db_path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+
+    def _progress(status: int, remaining: int, total: int) -> None:
+        logger.debug(f"Backup progress: {total - remaining}/{total} pages")
+
+    source = sqlite3.connect(db_path)
+    try:
+        dest = sqlite3.connect(target)
+        try:
+            source.backup(
+                dest, pages=pages_per_step, progress=_progress, sleep=step_sleep
+            )
+        finally:
+            dest.close()
+    finally:
+        source.close()
+
+    logger.info(f"Database backup created: {target}")
+    return target
+
+
+def prune_backups(db_path: Path, keep: int) -> list[Path]:
+    """
+    Delete old backup files, keeping the newest ``keep`` ones.
+
+    Args:
+        db_path: Database file whose backups should be pruned
+        keep: Number of backups to keep
+
+    Returns:
+        List of deleted backup files
+    """
+    pattern = f"{db_path.stem}_backup_*{db_path.suffix}"
+    backups = sorted(db_path.parent.glob(pattern), key=lambda p: p.name, reverse=True)
+    removed: list[Path] = []
+    for old in backups[max(keep, 0):]:
+        try:
+            old.unlink()
+            removed.append(old)
+        except OSError as e:
+            logger.warning(f"Failed to remove old backup {old}: {e}")
+    if removed:
+        logger.info(f"Pruned {len(removed)} old backup(s)")
+    return removed
+
+
+def apply_retention(conn: sqlite3.Connection, policy: RetentionPolicy) -> dict[str, int]:
+    """
+    Delete story records according to a retention policy.
+
+    Args:
+        conn: Open database connection
+        policy: Retention rules
+
+    Returns:
+        Deleted record counts: {'by_age': n, 'per_epic': n, 'total': n}
+    """
+    stats = {"by_age": 0, "per_epic": 0, "total": 0}
+    if not policy.statuses:
+        return stats
+
+    cursor = conn.cursor()
+    status_placeholders = ",".join("?" * len(policy.statuses))
+
+    if policy.max_age_days is not None:
+        cursor.execute(
+            f"""
+            DELETE FROM stories
+            WHERE updated_at < datetime('now', ?)
+              AND status IN ({status_placeholders})
+            """,
+            (f"-{int(policy.max_age_days)} days", *policy.statuses),
+        )
+        stats["by_age"] = max(cursor.rowcount, 0)
+
+    if policy.keep_per_epic is not None:
+        cursor.execute(
+            f"""
+            DELETE FROM stories
+            WHERE id IN (
+                SELECT id FROM (
+                    SELECT id,
+                           ROW_NUMBER() OVER (
+                               PARTITION BY epic_path
+                               ORDER BY updated_at DESC, id DESC
+                           ) AS rank
+                    FROM stories
+                    WHERE status IN ({status_placeholders})
+                )
+                WHERE rank > ?
+            )
+            """,
+            (*policy.statuses, int(policy.keep_per_epic)),
+        )
+        stats["per_epic"] = max(cursor.rowcount, 0)
+
+    conn.commit()
+    stats["total"] = stats["by_age"] + stats["per_epic"]
+    logger.info(
+        f"Retention removed {stats['total']} record(s) "
+        f"(age: {stats['by_age']}, per-epic: {stats['per_epic']})"
+    )
+    return stats
+
+
+def compact_database(
+    conn: sqlite3.Connection, max_pages: int | None = None
+) -> dict[str, Any]:
+    """
+    Reclaim free pages and truncate the WAL file.
+
+    A database created before incremental auto-vacuum was enabled is switched
+    over once with a full VACUUM; afterwards only free pages are released.
+
+    Args:
+        conn: Open database connection (no transaction in progress)
+        max_pages: Maximum pages to release (default: all free pages)
+
+    Returns:
+        Compaction statistics
+    """
+    conn.commit()
+    cursor = conn.cursor()
+
+    converted = False
+    auto_vacuum = cursor.execute("PRAGMA auto_vacuum").fetchone()[0]
+    if auto_vacuum != AUTO_VACUUM_INCREMENTAL:
+        logger.info("Switching database to incremental auto-vacuum (one-time VACUUM)")
+        cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        cursor.execute("VACUUM")
+        converted = True
+
+    freelist_before = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+    if max_pages is None:
+        cursor.execute("PRAGMA incremental_vacuum").fetchall()
+    else:
+        cursor.execute(f"PRAGMA incremental_vacuum({int(max_pages)})").fetchall()
+    freelist_after = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+
+    busy, wal_pages, checkpointed = cursor.execute(
+        "PRAGMA wal_checkpoint(TRUNCATE)"
+    ).fetchone()
+    conn.commit()
+
+    stats: dict[str, Any] = {
+        "converted_to_incremental": converted,
+        "pages_released": freelist_before - freelist_after,
+        "free_pages_remaining": freelist_after,
+        "page_count": cursor.execute("PRAGMA page_count").fetchone()[0],
+        "wal_checkpoint_busy": bool(busy),
+        "wal_pages_checkpointed": checkpointed,
+    }
+    if busy:
+        logger.warning("WAL checkpoint could not complete: database is busy")
+    logger.info(
+        f"Compaction released {stats['pages_released']} page(s), "
+        f"{stats['page_count']} page(s) in use (WAL pages: {wal_pages})"
+    )
+    return stats
+
+
+class DatabaseMaintenance:
+    """Backup, retention and compaction for a progress.db file."""
+
+    def __init__(
+        self,
+        db_path: str | Path,
+        connection: Callable[[], AbstractContextManager[sqlite3.Connection]] | None = None,
+    ):
+        """
+        Initialize maintenance for a database file.
+
+        Args:
+            db_path: Path to the SQLite database file
+            connection: Provides the connection for retention, compaction and
+                run bookkeeping, e.g. a connection pool's thread_connection;
+                by default each task opens and closes its own connection
+        """
+        self.db_path: Path = Path(db_path)
+        self._connection_factory = connection
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        if self._connection_factory is not None:
+            with self._connection_factory() as conn:
+                conn.execute(MAINTENANCE_TABLE_SQL)
+                conn.commit()
+                yield conn
+            return
+        conn = sqlite3.connect(self.db_path, timeout=30.0)
+        try:
+            conn.execute(MAINTENANCE_TABLE_SQL)
+            conn.commit()
+            yield conn
+        finally:
+            conn.close()
+
+    def backup(
+        self,
+        backup_path: str | Path | None = None,
+        keep_backups: int | None = None,
+        pages_per_step: int = 256,
+    ) -> Path:
+        """
+        Create an online backup and optionally prune older backups.
+
+        Args:
+            backup_path: Destination file (default: timestamped file)
+            keep_backups: Keep only this many timestamped backups
+            pages_per_step: Pages copied per backup step
+
+        Returns:
+            Path of the written backup file
+        """
+        target = online_backup(
+            self.db_path,
+            Path(backup_path) if backup_path else None,
+            pages_per_step=pages_per_step,
+        )
+        if keep_backups is not None:
+            self.prune_backups(keep_backups)
+        return target
+
+    def prune_backups(self, keep: int) -> list[Path]:
+        """Delete old timestamped backups, keeping the newest ``keep``."""
+        return prune_backups(self.db_path, keep)
+
+    def apply_retention(self, policy: RetentionPolicy) -> dict[str, int]:
+        """Apply a retention policy to the stories table."""
+        with self._connection() as conn:
+            stats = apply_retention(conn, policy)
+            self._record_run(conn, "retention", stats)
+            return stats
+
+    def compact(self, max_pages: int | None = None) -> dict[str, Any]:
+        """Run incremental vacuum and truncate the WAL file."""
+        with self._connection() as conn:
+            stats = compact_database(conn, max_pages)
+            self._record_run(conn, "compact", stats)
+            return stats
+
+    def last_run(self, task: str) -> float | None:
+        """Return the timestamp of the last run of a maintenance task."""
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT last_run_at FROM maintenance_runs WHERE task = ?", (task,)
+            ).fetchone()
+            return row[0] if row else None
+
+    def is_due(self, task: str, interval_hours: float) -> bool:
+        """Check whether a task has not run within the given interval."""
+        last = self.last_run(task)
+        return last is None or time.time() - last >= interval_hours * 3600
+
+    def run_scheduled(
+        self,
+        interval_hours: float = 24.0,
+        retention: RetentionPolicy | None = None,
+        max_pages: int | None = None,
+    ) -> dict[str, Any]:
+        """
+        Run retention and compaction if their interval has elapsed.
+
+        Args:
+            interval_hours: Minimum hours between two runs of each task
+            retention: Retention policy; retention is skipped when None
+            max_pages: Maximum pages released per compaction
+
+        Returns:
+            Results per task; tasks that were not due are reported as skipped
+        """
+        results: dict[str, Any] = {}
+        if retention is not None:
+            if self.is_due("retention", interval_hours):
+                results["retention"] = self.apply_retention(retention)
+            else:
+                results["retention"] = {"skipped": True}
+        if self.is_due("compact", interval_hours):
+            results["compact"] = self.compact(max_pages)
+        else:
+            results["compact"] = {"skipped": True}
+        return results
+
+    def _record_run(
+        self, conn: sqlite3.Connection, task: str, details: dict[str, Any]
+    ) -> None:
+        conn.execute(
+            """
+            INSERT INTO maintenance_runs (task, last_run_at, details)
+            VALUES (?, ?, ?)
+            ON CONFLICT(task) DO UPDATE SET
+                last_run_at = excluded.last_run_at,
+                details = excluded.details
+            """,
+            (task, time.time(), json.dumps(details, default=str)),
+        )
+        conn.commit()
@@ -31,8 +31,36 @@ from autoBMAD.epic_automation.agents.state_agent import (
     CORE_STATUS_DONE,
     CORE_STATUS_READY_FOR_DONE,
     core_status_to_processing,
+    read_story_header,
+    story_status_cache,
 )
 
+# Import story document model and epic index
+from autoBMAD.epic_automation.epic_index import EpicIndex, normalize_story_number
+from autoBMAD.epic_automation.fix_pool import DEFAULT_FILE_FIX_ATTEMPTS, DEFAULT_FIX_WORKERS
+from autoBMAD.epic_automation.process_runner import run_command
+from autoBMAD.epic_automation.pyright_session import pyright_sessions
+from autoBMAD.epic_automation.quality_gate_cache import QualityGateCache
+from autoBMAD.epic_automation.quality_pipeline import (
+    DEFAULT_COMMAND_TIMEOUT,
+    PipelineConfig,
+    StageConfig,
+    StageOutcome,
+    run_pipeline,
+)
+from autoBMAD.epic_automation.quality_shards import (
+    ERRORS_DIR,
+    default_shard_workers,
+    discover_shards,
+    merge_shard_results,
+    shard_epic_id,
+    shard_file_stem,
+)
+from autoBMAD.epic_automation.state_manager import LeaseLostError
+from autoBMAD.epic_automation.story_document import StoryDocument
+from autoBMAD.epic_automation.story_watcher import wait_for_status_change
+from autoBMAD.epic_automation.workspace_snapshot import WorkspaceSnapshot, file_digest
+
 # Import ClaudeAgentOptions for proper SDK configuration
 try:
     from claude_agent_sdk import ClaudeAgentOptions
@@ -52,6 +80,17 @@ DEV_TIMEOUT = None  # 45分钟（开发阶段）
 QA_TIMEOUT = None  # 30分钟（QA审查阶段）
 SM_TIMEOUT = None  # 30分钟（SM阶段）
 
+# 阶段结束后等待代理写入故事状态的最长时间（秒）；状态一变化立即返回
+STATUS_CHANGE_TIMEOUT = 1.0
+
+# 认领故事失败（如数据库持续锁定）时的最大连续尝试次数，重试间隔指数退避（秒）
+CLAIM_ATTEMPTS = 5
+CLAIM_BACKOFF = 1.0
+
+# Fallback status line patterns: **Status**: **Value** and Status: Value
+_BOLD_STATUS_RE = re.compile(r"\*\*Status\*\*:\s*\*\*([^*]+)\*\*", re.IGNORECASE)
+_PLAIN_STATUS_RE = re.compile(r"Status:\s*(.+)", re.IGNORECASE)
+
 
 
 def _convert_core_to_processing_status(core_status: str, phase: str) -> str:  # type: ignore[reportUnusedFunction]
@@ -99,6 +138,19 @@ class QualityGateOrchestrator:
         test_dir: str,
         skip_quality: bool = False,
         skip_tests: bool = False,
+        combined_static_checks: bool = True,
+        fix_workers: int = DEFAULT_FIX_WORKERS,
+        warm_basedpyright: bool = True,
+        final_full_check: bool = True,
+        state_manager: Any = None,
+        use_gate_cache: bool = True,
+        fix_call_budget: int | None = None,
+        fix_time_budget: float | None = None,
+        file_fix_attempts: int = DEFAULT_FILE_FIX_ATTEMPTS,
+        pipeline: PipelineConfig | None = None,
+        max_cycles: int = 3,
+        pytest_summary_path: str | None = None,
+        errors_dir: str | None = None,
     ):
         """
         Initialize quality gate orchestrator.
@@ -108,18 +160,67 @@ class QualityGateOrchestrator:
             test_dir: Test directory
             skip_quality: Skip ruff and basedpyright quality checks
             skip_tests: Skip pytest execution
+            combined_static_checks: Run ruff and basedpyright in one check/fix
+                loop with one combined SDK fix per file (default True); False
+                runs the two gates one after the other
+            fix_workers: Maximum files fixed concurrently in each SDK fix phase
+            warm_basedpyright: Run basedpyright regression checks through a
+                long-running language server per source root (default True)
+            final_full_check: Regression checks only cover the fixed files (and,
+                for basedpyright, their importers); finish with one full check
+                of source_dir (default True)
+            state_manager: StateManager whose progress.db stores the gate cache
+            use_gate_cache: Skip gates whose inputs (files, tool config, tool
+                version) are unchanged since they last passed; needs
+                state_manager (default True)
+            fix_call_budget: Maximum Ruff/BasedPyright SDK fix calls per cycle,
+                per-file retries included; the files with the most
+                (severity-weighted, widely imported) errors go first
+                (default: no limit)
+            fix_time_budget: Seconds per fix phase after which no further
+                Ruff/BasedPyright fix or retry is started (default: no limit)
+            file_fix_attempts: Ruff/BasedPyright fix attempts per file and cycle;
+                each fix is verified right away by checking that file alone and
+                retried with the new diagnostics while fix_call_budget allows
+                (default: 3; 1 disables)
+            pipeline: Stages to run and their settings (cycles, SDK delay and
+                timeout, fix workers, stage timeout, dependencies); default:
+                static checks -> ruff format -> pytest, shaped by
+                combined_static_checks and max_cycles
+            max_cycles: Check/fix cycles per gate in the default pipeline
+            pytest_summary_path: Pytest summary JSON shared by the pytest fix
+                rounds (default: pytest_summary.json in the working directory)
+            errors_dir: Directory of the error summary JSON files (default:
+                autoBMAD/epic_automation/errors in the working directory)
         """
         self.source_dir = source_dir
         self.test_dir = test_dir
         self.skip_quality = skip_quality
         self.skip_tests = skip_tests
+        self.combined_static_checks = combined_static_checks
+        self.fix_workers = fix_workers
+        self.warm_basedpyright = warm_basedpyright
+        self.final_full_check = final_full_check
+        self.fix_call_budget = fix_call_budget
+        self.fix_time_budget = fix_time_budget
+        self.file_fix_attempts = file_fix_attempts
+        self.pytest_summary_path = pytest_summary_path
+        self.errors_dir = errors_dir
+        self.pipeline = pipeline or PipelineConfig.default(
+            combined_static_checks=combined_static_checks, max_cycles=max_cycles
+        )
         self.logger = logging.getLogger(f"{__name__}.quality_gates")
+        self.gate_cache = (
+            QualityGateCache(state_manager, source_dir, test_dir)
+            if state_manager is not None and use_gate_cache
+            else None
+        )
 
         # Initialize quality agents
         try:
             from autoBMAD.epic_automation.agents.quality_agents import RuffAgent, BasedPyrightAgent, PytestAgent
             self.ruff_agent = RuffAgent()
-            self.basedpyright_agent = BasedPyrightAgent()
+            self.basedpyright_agent = BasedPyrightAgent(warm=warm_basedpyright)
             self.pytest_agent = PytestAgent()
         except ImportError:
             # Quality agents not available - will be handled in execute methods
@@ -137,6 +238,7 @@ class QualityGateOrchestrator:
             "errors": [],  # List[str]
             "quality_warnings": [],  # 🆕 新增：质量超限警告
             "error_summary_json": None,  # 🆕 新增：错误汇总JSON文件路径
+            "stages": {},  # 流水线各阶段状态（status / duration）
             "start_time": None,
             "end_time": None,
             "total_duration": 0.0,
@@ -178,6 +280,44 @@ class QualityGateOrchestrator:
             if end:
                 phase_dict["end_time"] = time.time()
 
+    async def _gate_cached(self, gate: str, phase: str) -> bool:
+        """质量门输入自上次通过后未变化时返回 True（并标记为跳过）"""
+        if self.gate_cache is None:
+            return False
+        try:
+            fresh = await self.gate_cache.is_fresh(gate)
+        except Exception as e:
+            self.logger.warning(f"Gate cache lookup failed for {gate}: {e}")
+            return False
+        if fresh:
+            self.logger.info(f"✓ Skipping {gate}: inputs unchanged since it last passed")
+            self._update_progress(phase, "skipped")
+        return fresh
+
+    @staticmethod
+    def _cached_gate_result() -> dict[str, Any]:
+        """缓存命中时的质量门结果"""
+        return {
+            "success": True,
+            "skipped": True,
+            "cached": True,
+            "message": "Inputs unchanged since last pass",
+            "duration": 0.0,
+        }
+
+    async def _record_gate_pass(self, gate: str, result: dict[str, Any] | None) -> None:
+        """质量门无警告通过时记录当前指纹（超限、跳过、失败、检查未执行均不记录）"""
+        if self.gate_cache is None or not result:
+            return
+        if not result.get("success") or result.get("skipped") or result.get("warning"):
+            return
+        if (result.get("result") or {}).get("check_failed"):
+            return
+        try:
+            await self.gate_cache.record_pass(gate)
+        except Exception as e:
+            self.logger.warning(f"Failed to record gate cache entry for {gate}: {e}")
+
     def _calculate_duration(self, start_time: float, end_time: float) -> float:
         """Calculate duration in seconds."""
         return round(end_time - start_time, 2)
@@ -190,6 +330,10 @@ class QualityGateOrchestrator:
         1. cycles > max_cycles (严格大于)
         2. 残留文件非空（final_error_files 或 final_failed_files）
         """
+        # 检查本身未能执行：属于执行失败，不是超限
+        if result.get("check_failed"):
+            return False
+
         cycles = result.get("cycles", 0)
         max_cycles = result.get("max_cycles", 0)
 
@@ -214,12 +358,18 @@ class QualityGateOrchestrator:
 
         return has_remaining_errors
 
-    async def execute_ruff_agent(self, source_dir: str) -> dict[str, Any]:
-        """执行 Ruff 质量门（改造版：使用 QualityCheckController）"""
+    async def execute_ruff_agent(
+        self, source_dir: str, stage: StageConfig | None = None
+    ) -> dict[str, Any]:
+        """执行 Ruff 质量门（改造版：使用 QualityCheckController；参数来自流水线阶段配置）"""
+        stage = stage or StageConfig("ruff", "ruff")
         if self.skip_quality:
             self.logger.info("Skipping Ruff quality check (--skip-quality flag)")
             return {"success": True, "skipped": True, "message": "Skipped via CLI flag"}
 
+        if await self._gate_cached("ruff", "phase_1_ruff"):
+            return self._cached_gate_result()
+
         self.logger.info("=== Quality Gate 1/3: Ruff Check with SDK Fix ===")
         self._update_progress("phase_1_ruff", "in_progress", start=True)
         progress_dict = cast(dict[str, Any], self.results["progress"])
@@ -238,9 +388,14 @@ class QualityGateOrchestrator:
                 tool="ruff",
                 agent=ruff_agent,
                 source_dir=source_dir,
-                max_cycles=3,
-                sdk_call_delay=10,
-                sdk_timeout=600,
+                max_cycles=stage.max_cycles,
+                sdk_call_delay=stage.sdk_call_delay,
+                sdk_timeout=stage.sdk_timeout,
+                max_fix_workers=stage.fix_workers or self.fix_workers,
+                final_full_check=self.final_full_check,
+                max_fix_calls=self.fix_call_budget,
+                fix_time_budget=self.fix_time_budget,
+                max_file_attempts=self.file_fix_attempts,
             )
 
             start_time = time.time()
@@ -279,6 +434,8 @@ class QualityGateOrchestrator:
             else:
                 # 中途失败（非超限场景）：仍视为系统错误
                 error_msg = f"Ruff execution failed (cycles: {ruff_result['cycles']})"
+                if ruff_result.get("check_error"):
+                    error_msg += f": {ruff_result['check_error']}"
                 self.logger.error(error_msg)
                 self._update_progress("phase_1_ruff", "error", end=True)
                 errors_list = cast(list[str], self.results["errors"])
@@ -298,14 +455,20 @@ class QualityGateOrchestrator:
             errors_list.append(error_msg)
             return {"success": False, "error": error_msg, "duration": 0.0}
 
-    async def execute_basedpyright_agent(self, source_dir: str) -> dict[str, Any]:
-        """执行 BasedPyright 质量门（改造版：使用 QualityCheckController）"""
+    async def execute_basedpyright_agent(
+        self, source_dir: str, stage: StageConfig | None = None
+    ) -> dict[str, Any]:
+        """执行 BasedPyright 质量门（改造版：使用 QualityCheckController；参数来自流水线阶段配置）"""
+        stage = stage or StageConfig("basedpyright", "basedpyright")
         if self.skip_quality:
             self.logger.info(
                 "Skipping Basedpyright quality check (--skip-quality flag)"
             )
             return {"success": True, "skipped": True, "message": "Skipped via CLI flag"}
 
+        if await self._gate_cached("basedpyright", "phase_2_basedpyright"):
+            return self._cached_gate_result()
+
         self.logger.info("=== Quality Gate 2/3: BasedPyright Check with SDK Fix ===")
         self._update_progress("phase_2_basedpyright", "in_progress", start=True)
         progress_dict = cast(dict[str, Any], self.results["progress"])
@@ -317,16 +480,21 @@ class QualityGateOrchestrator:
             from .agents.quality_agents import BasedPyrightAgent
 
             # 创建 Agent 实例
-            basedpyright_agent = BasedPyrightAgent()
+            basedpyright_agent = BasedPyrightAgent(warm=self.warm_basedpyright)
 
             # 创建控制器
             controller = QualityCheckController(
                 tool="basedpyright",
                 agent=basedpyright_agent,
                 source_dir=source_dir,
-                max_cycles=3,
-                sdk_call_delay=10,
-                sdk_timeout=600,
+                max_cycles=stage.max_cycles,
+                sdk_call_delay=stage.sdk_call_delay,
+                sdk_timeout=stage.sdk_timeout,
+                max_fix_workers=stage.fix_workers or self.fix_workers,
+                final_full_check=self.final_full_check,
+                max_fix_calls=self.fix_call_budget,
+                fix_time_budget=self.fix_time_budget,
+                max_file_attempts=self.file_fix_attempts,
             )
 
             start_time = time.time()
@@ -365,6 +533,8 @@ class QualityGateOrchestrator:
             else:
                 # 中途失败（非超限场景）：仍视为系统错误
                 error_msg = f"BasedPyright execution failed (cycles: {basedpyright_result['cycles']})"
+                if basedpyright_result.get("check_error"):
+                    error_msg += f": {basedpyright_result['check_error']}"
                 self.logger.error(error_msg)
                 self._update_progress("phase_2_basedpyright", "error", end=True)
                 errors_list = cast(list[str], self.results["errors"])
@@ -384,9 +554,123 @@ class QualityGateOrchestrator:
             errors_list.append(error_msg)
             return {"success": False, "error": error_msg, "duration": 0.0}
 
+    async def execute_static_checks(
+        self, source_dir: str, stage: StageConfig | None = None
+    ) -> tuple[dict[str, Any], dict[str, Any]]:
+        """
+        在同一循环中执行 Ruff 与 BasedPyright 质量门（合并 SDK 修复）
+
+        Args:
+            source_dir: 源代码目录
+            stage: 流水线阶段配置（循环次数、SDK 延时与超时、修复并发）
+
+        Returns:
+            (ruff 结果, basedpyright 结果)，结构与 execute_ruff_agent /
+            execute_basedpyright_agent 的返回值相同
+        """
+        if self.skip_quality:
+            self.logger.info("Skipping Ruff and Basedpyright quality checks (--skip-quality flag)")
+            skipped = {"success": True, "skipped": True, "message": "Skipped via CLI flag"}
+            return dict(skipped), dict(skipped)
+
+        stage = stage or StageConfig("static_checks", "static_checks")
+
+        # 仅一个质量门命中缓存时，另一个按单工具质量门执行
+        ruff_cached = await self._gate_cached("ruff", "phase_1_ruff")
+        basedpyright_cached = await self._gate_cached("basedpyright", "phase_2_basedpyright")
+        if ruff_cached and basedpyright_cached:
+            return self._cached_gate_result(), self._cached_gate_result()
+        if ruff_cached:
+            return self._cached_gate_result(), await self.execute_basedpyright_agent(
+                source_dir, stage
+            )
+        if basedpyright_cached:
+            return await self.execute_ruff_agent(source_dir, stage), self._cached_gate_result()
+
+        self.logger.info("=== Quality Gates 1-2/3: Ruff + BasedPyright Check with Combined SDK Fix ===")
+        self._update_progress("phase_1_ruff", "in_progress", start=True)
+        self._update_progress("phase_2_basedpyright", "in_progress", start=True)
+        progress_dict = cast(dict[str, Any], self.results["progress"])
+        progress_dict["current_phase"] = "ruff+basedpyright"
+
+        start_time = time.time()
+        try:
+            from .agents.quality_agents import BasedPyrightAgent, RuffAgent
+            from .controllers.combined_quality_controller import (
+                CombinedQualityController,
+            )
+
+            controller = CombinedQualityController(
+                ruff_agent=RuffAgent(),
+                basedpyright_agent=BasedPyrightAgent(warm=self.warm_basedpyright),
+                source_dir=source_dir,
+                max_cycles=stage.max_cycles,
+                sdk_call_delay=stage.sdk_call_delay,
+                sdk_timeout=stage.sdk_timeout,
+                max_fix_workers=stage.fix_workers or self.fix_workers,
+                final_full_check=self.final_full_check,
+                max_fix_calls=self.fix_call_budget,
+                fix_time_budget=self.fix_time_budget,
+                max_file_attempts=self.file_fix_attempts,
+            )
+            results = await controller.run()
+        except Exception as e:
+            error_msg = f"Ruff/BasedPyright execution error: {str(e)}"
+            self.logger.error(error_msg, exc_info=True)
+            self._update_progress("phase_1_ruff", "error", end=True)
+            self._update_progress("phase_2_basedpyright", "error", end=True)
+            errors_list = cast(list[str], self.results["errors"])
+            errors_list.append(error_msg)
+            failed = {"success": False, "error": error_msg, "duration": 0.0}
+            return dict(failed), dict(failed)
+
+        duration = self._calculate_duration(start_time, time.time())
+        return (
+            self._static_check_gate_result("Ruff", "phase_1_ruff", results["ruff"], duration),
+            self._static_check_gate_result(
+                "BasedPyright", "phase_2_basedpyright", results["basedpyright"], duration
+            ),
+        )
+
+    def _static_check_gate_result(
+        self, label: str, phase: str, result: dict[str, Any], duration: float
+    ) -> dict[str, Any]:
+        """把 QualityCheckController 结果转换为质量门结果（与单工具质量门一致）"""
+        if self._is_max_cycles_exceeded_with_errors(result):
+            self.logger.warning(
+                f"⚠ {label} quality gate reached max cycles ({result['cycles']}) "
+                f"with {len(result['final_error_files'])} remaining error(s)"
+            )
+            self._update_progress(phase, "completed", end=True)
+            return {
+                "success": True,
+                "warning": "Max cycles exceeded with errors",
+                "duration": duration,
+                "result": result,
+            }
+
+        if result["status"] == "completed":
+            self.logger.info(
+                f"✓ {label} quality gate PASSED after {result['cycles']} cycle(s) in {duration}s"
+            )
+            self._update_progress(phase, "completed", end=True)
+            return {"success": True, "duration": duration, "result": result}
+
+        error_msg = f"{label} execution failed (cycles: {result['cycles']})"
+        if result.get("check_error"):
+            error_msg += f": {result['check_error']}"
+        self.logger.error(error_msg)
+        self._update_progress(phase, "error", end=True)
+        errors_list = cast(list[str], self.results["errors"])
+        errors_list.append(error_msg)
+        return {"success": False, "error": error_msg, "duration": duration, "result": result}
+
     async def execute_ruff_format(self, source_dir: str) -> dict[str, Any]:
         """执行 Ruff Format（新增）"""
 
+        if await self._gate_cached("ruff_format", "phase_final_format"):
+            return self._cached_gate_result()
+
         self.logger.info("=== Quality Gate Final: Ruff Format ===")
         self._update_progress("phase_final_format", "in_progress", start=True)
 
@@ -433,12 +717,18 @@ class QualityGateOrchestrator:
                 "duration": 0.0
             }
 
-    async def execute_pytest_agent(self, test_dir: str) -> dict[str, Any]:
-        """执行 Pytest 质量门（改造版：使用 PytestController）"""
+    async def execute_pytest_agent(
+        self, test_dir: str, stage: StageConfig | None = None
+    ) -> dict[str, Any]:
+        """执行 Pytest 质量门（改造版：使用 PytestController；循环次数与修复并发来自阶段配置）"""
+        stage = stage or StageConfig("pytest", "pytest")
         if self.skip_tests:
             self.logger.info("Skipping pytest execution (--skip-tests flag)")
             return {"success": True, "skipped": True, "message": "Skipped via CLI flag"}
 
+        if await self._gate_cached("pytest", "phase_3_pytest"):
+            return self._cached_gate_result()
+
         self.logger.info("=== Quality Gate 3/3: Pytest Execution with SDK Fix ===")
         self._update_progress("phase_3_pytest", "in_progress", start=True)
 
@@ -529,7 +819,9 @@ class QualityGateOrchestrator:
             controller = PytestController(
                 source_dir=self.source_dir,
                 test_dir=test_dir,
-                max_cycles=3,
+                max_cycles=stage.max_cycles,
+                max_fix_workers=stage.fix_workers or self.fix_workers,
+                summary_json_path=self.pytest_summary_path,
             )
 
             start_time = time.time()
@@ -587,16 +879,151 @@ class QualityGateOrchestrator:
             errors_list.append(error_msg)
             return {"success": False, "error": error_msg, "duration": 0.0}
 
+    async def execute_command_stage(self, stage: StageConfig) -> dict[str, Any]:
+        """
+        执行外部命令阶段（只检查，不做 SDK 修复）
+
+        命令参数中的 {source_dir} / {test_dir} 替换为对应目录；退出码 0 为通过。
+        blocking 阶段失败计入 errors（流水线失败），否则只记录警告。
+        """
+        phase = f"stage_{stage.name}"
+        progress_dict = cast(dict[str, Any], self.results["progress"])
+        progress_dict.setdefault(phase, {"status": "pending", "start_time": None, "end_time": None})
+        self.logger.info(f"=== Quality Gate: {stage.name} ({' '.join(stage.command or [])}) ===")
+        self._update_progress(phase, "in_progress", start=True)
+
+        args = [
+            arg.replace("{source_dir}", self.source_dir).replace("{test_dir}", self.test_dir)
+            for arg in stage.command or []
+        ]
+        result = await run_command(args, timeout=stage.timeout or DEFAULT_COMMAND_TIMEOUT)
+        details = {
+            "returncode": result.returncode,
+            "stdout": result.stdout[-4000:],
+            "stderr": result.stderr[-4000:],
+        }
+        if result.success:
+            self.logger.info(f"✓ {stage.name} PASSED in {round(result.duration, 2)}s")
+            self._update_progress(phase, "completed", end=True)
+            return {"success": True, "duration": round(result.duration, 2), "result": details}
+
+        error_msg = f"{stage.name} failed: {result.error or f'exit code {result.returncode}'}"
+        self._update_progress(phase, "failed", end=True)
+        if not stage.blocking:
+            self.logger.warning(f"✗ {error_msg} (non-blocking)")
+            return {
+                "success": True,
+                "warning": error_msg,
+                "duration": round(result.duration, 2),
+                "result": details,
+            }
+        self.logger.error(f"✗ {error_msg}")
+        errors_list = cast(list[str], self.results["errors"])
+        errors_list.append(error_msg)
+        return {
+            "success": False,
+            "error": error_msg,
+            "duration": round(result.duration, 2),
+            "result": details,
+        }
+
+    def _stage_enabled(self, stage: StageConfig) -> bool:
+        """--skip-quality 跳过静态检查与格式化阶段，--skip-tests 跳过 pytest 阶段"""
+        if stage.gate in ("static_checks", "ruff", "basedpyright", "ruff_format"):
+            return not self.skip_quality
+        if stage.gate == "pytest":
+            return not self.skip_tests
+        return True
+
+    async def _run_stage(self, stage: StageConfig) -> dict[str, Any]:
+        """运行流水线的一个阶段；内置质量门结果写入 self.results 中对应的位置"""
+        if stage.gate == "static_checks":
+            ruff_result, basedpyright_result = await self.execute_static_checks(
+                self.source_dir, stage
+            )
+            self.results["ruff"] = ruff_result
+            self.results["basedpyright"] = basedpyright_result
+            await self._record_gate_pass("ruff", ruff_result)
+            await self._record_gate_pass("basedpyright", basedpyright_result)
+            if not ruff_result["success"] or not basedpyright_result["success"]:
+                self.logger.warning("Ruff/BasedPyright check failed, but continuing...")
+            return {"success": ruff_result["success"] and basedpyright_result["success"]}
+
+        if stage.gate == "ruff":
+            ruff_result = await self.execute_ruff_agent(self.source_dir, stage)
+            self.results["ruff"] = ruff_result
+            await self._record_gate_pass("ruff", ruff_result)
+            # Ruff 失败不阻断，继续执行
+            if not ruff_result["success"]:
+                self.logger.warning("Ruff check failed, but continuing...")
+            return ruff_result
+
+        if stage.gate == "basedpyright":
+            basedpyright_result = await self.execute_basedpyright_agent(self.source_dir, stage)
+            self.results["basedpyright"] = basedpyright_result
+            await self._record_gate_pass("basedpyright", basedpyright_result)
+            # BasedPyright 失败不阻断，继续执行
+            if not basedpyright_result["success"]:
+                self.logger.warning("BasedPyright check failed, but continuing...")
+            return basedpyright_result
+
+        if stage.gate == "ruff_format":
+            format_result = await self.execute_ruff_format(self.source_dir)
+            self.results["ruff_format"] = format_result
+            await self._record_gate_pass("ruff_format", format_result)
+            return format_result
+
+        if stage.gate == "pytest":
+            pytest_result = await self.execute_pytest_agent(self.test_dir, stage)
+            self.results["pytest"] = pytest_result
+            await self._record_gate_pass("pytest", pytest_result)
+            if not pytest_result["success"]:
+                self.results["success"] = False
+                self.logger.warning("Quality gates completed with pytest failure")
+            return pytest_result
+
+        return await self.execute_command_stage(stage)
+
+    def _record_stage_outcomes(self, outcomes: dict[str, StageOutcome]) -> None:
+        """记录各阶段状态；超时或异常中断的阶段计入 errors"""
+        stages = cast(dict[str, Any], self.results["stages"])
+        phases = {
+            "static_checks": ["phase_1_ruff", "phase_2_basedpyright"],
+            "ruff": ["phase_1_ruff"],
+            "basedpyright": ["phase_2_basedpyright"],
+            "ruff_format": ["phase_final_format"],
+            "pytest": ["phase_3_pytest"],
+        }
+        gates = {stage.name: stage.gate for stage in self.pipeline.stages}
+        for name, outcome in outcomes.items():
+            stages[name] = {
+                "gate": gates[name],
+                "status": outcome.status,
+                "duration": outcome.duration,
+            }
+            if gates[name] == "command":
+                stages[name]["result"] = outcome.result
+            if outcome.status in ("timed_out", "error"):
+                errors_list = cast(list[str], self.results["errors"])
+                errors_list.append(str(outcome.result.get("error")))
+                for phase in phases.get(gates[name], [f"stage_{name}"]):
+                    self._update_progress(phase, "error", end=True)
+
     async def execute_quality_gates(self, epic_id: str) -> dict[str, Any]:
         """
         执行完整质量门控流水线（更新版）
 
-        流程：
+        按 self.pipeline 的阶段图执行：依赖已完成的阶段开始运行，会改写文件的内置质量门
+        依次运行，只有 command 阶段与其他阶段并行。默认流水线：
         1. Phase 1: Ruff Check（检查 → SDK修复 → 回归）
         2. Phase 2: BasedPyright Check（检查 → SDK修复 → 回归）
+           combined_static_checks 时 Phase 1/2 合并：Ruff → 类型检查 → 每文件一次合并修复 → 合并回归
         3. Phase 3: Ruff Format（最终格式化）
         4. Phase 4: Pytest（保持原有逻辑）
 
+        启用质量门缓存时，输入（文件内容、工具配置、工具版本）与上次通过时
+        相同的质量门直接跳过；每个质量门无警告通过后记录其检查后的指纹
+
         Args:
             epic_id: Epic identifier for tracking
 
@@ -609,40 +1036,8 @@ class QualityGateOrchestrator:
         progress_dict["current_phase"] = "starting"
 
         try:
-            # Phase 1: Ruff Check
-            if not self.skip_quality:
-                ruff_result = await self.execute_ruff_agent(self.source_dir)
-                self.results["ruff"] = ruff_result
-
-                # Ruff 失败不阻断，继续执行
-                if not ruff_result["success"]:
-                    self.logger.warning("Ruff check failed, but continuing...")
-
-            # Phase 2: BasedPyright Check
-            if not self.skip_quality:
-                basedpyright_result = await self.execute_basedpyright_agent(
-                    self.source_dir
-                )
-                self.results["basedpyright"] = basedpyright_result
-
-                # BasedPyright 失败不阻断，继续执行
-                if not basedpyright_result["success"]:
-                    self.logger.warning("BasedPyright check failed, but continuing...")
-
-            # Phase 3: Ruff Format（新增）
-            if not self.skip_quality:
-                format_result = await self.execute_ruff_format(self.source_dir)
-                self.results["ruff_format"] = format_result
-
-            # Phase 4: Pytest
-            if not self.skip_tests:
-                pytest_result = await self.execute_pytest_agent(self.test_dir)
-                self.results["pytest"] = pytest_result
-                if not pytest_result["success"]:
-                    self.results["success"] = False
-                    self.logger.warning("Quality gates completed with pytest failure")
-            else:
-                self.logger.info("Skipping pytest (--skip-tests flag set)")
+            outcomes = await run_pipeline(self.pipeline, self._run_stage, self._stage_enabled)
+            self._record_stage_outcomes(outcomes)
 
             # 🆕 收集超限工具信息
             quality_warnings = []
@@ -706,6 +1101,10 @@ class QualityGateOrchestrator:
             errors_list.append(error_msg)
             return self._finalize_results()
 
+        finally:
+            # 关闭常驻 basedpyright 语言服务器
+            await pyright_sessions.close_all()
+
     def _finalize_results(self) -> dict[str, Any]:
         """Finalize and return results."""
         self.results["end_time"] = time.time()
@@ -837,7 +1236,7 @@ class QualityGateOrchestrator:
                 tool_info["error_details"] = result["detailed_errors"]
 
         # 确保输出目录存在
-        errors_dir = Path("autoBMAD/epic_automation/errors")
+        errors_dir = Path(self.errors_dir or "autoBMAD/epic_automation/errors")
         errors_dir.mkdir(parents=True, exist_ok=True)
 
         # 生成文件名
@@ -863,6 +1262,14 @@ async def run_quality_gates_standalone(
     max_cycles: int = 3,
     verbose: bool = False,
     create_log_file: bool = False,
+    fix_workers: int = DEFAULT_FIX_WORKERS,
+    use_gate_cache: bool = True,
+    fix_call_budget: int | None = None,
+    fix_time_budget: float | None = None,
+    pipeline_config: str | None = None,
+    state_db_path: str = "progress.db",
+    pytest_summary_path: str | None = None,
+    errors_dir: str | None = None,
 ) -> dict[str, Any]:
     """
     独立执行质量门禁流水线
@@ -876,6 +1283,14 @@ async def run_quality_gates_standalone(
         max_cycles: 最大修复循环
         verbose: 详细日志
         create_log_file: 创建日志文件
+        fix_workers: 每个修复阶段并行修复的最大文件数
+        use_gate_cache: 跳过输入自上次通过后未变化的质量门（缓存存于 progress.db）
+        fix_call_budget: 静态检查每轮最多 SDK 修复调用数（含单文件重试，按影响排序），None 为不限
+        fix_time_budget: 静态检查每轮修复阶段的墙钟预算（秒），None 为不限
+        pipeline_config: 流水线配置文件（TOML/JSON）；None 为默认流水线（使用 max_cycles）
+        state_db_path: 质量门缓存所在的数据库（默认当前目录下的 progress.db）
+        pytest_summary_path: pytest 汇总 JSON 路径（默认当前目录下的 pytest_summary.json）
+        errors_dir: 错误汇总 JSON 目录（默认 autoBMAD/epic_automation/errors）
 
     Returns:
         质量门禁执行结果字典
@@ -897,16 +1312,35 @@ async def run_quality_gates_standalone(
                 "error": f"Source directory not found: {source_dir}"
             }
 
-        # 3. 创建编排器
+        # 3. 创建编排器（质量门缓存默认使用当前目录下的 progress.db）
+        state_manager = None
+        if use_gate_cache:
+            from autoBMAD.epic_automation.state_manager import StateManager
+
+            state_manager = StateManager(db_path=state_db_path)
+
         orchestrator = QualityGateOrchestrator(
             source_dir=str(source_path),
             test_dir=str(test_dir),
             skip_quality=skip_quality,
             skip_tests=skip_tests,
+            fix_workers=fix_workers,
+            state_manager=state_manager,
+            use_gate_cache=use_gate_cache,
+            fix_call_budget=fix_call_budget,
+            fix_time_budget=fix_time_budget,
+            pipeline=PipelineConfig.load(pipeline_config) if pipeline_config else None,
+            max_cycles=max_cycles,
+            pytest_summary_path=pytest_summary_path,
+            errors_dir=errors_dir,
         )
 
         # 4. 执行质量门禁
-        results = await orchestrator.execute_quality_gates(epic_id)
+        try:
+            results = await orchestrator.execute_quality_gates(epic_id)
+        finally:
+            if state_manager is not None:
+                await state_manager.close()
 
         return results
 
@@ -914,6 +1348,147 @@ async def run_quality_gates_standalone(
         cleanup_logging()
 
 
+def _run_shard_quality_gates(options: dict[str, Any], workdir: str) -> dict[str, Any]:
+    """
+    在子进程中执行单个分片的质量门禁（进程池入口，结果须可序列化）
+
+    工作目录切换到分片根目录，ruff/basedpyright/pytest 使用分片自己的配置；
+    options 中的路径均为绝对路径。
+    """
+    import json
+    import os
+
+    os.chdir(workdir)
+    results = asyncio.run(run_quality_gates_standalone(**options))
+    return json.loads(json.dumps(results, default=str))
+
+
+async def run_quality_gates_sharded(
+    workspace: str = ".",
+    shard_workers: int | None = None,
+    epic_id: str = "standalone-quality",
+    skip_quality: bool = False,
+    skip_tests: bool = False,
+    max_cycles: int = 3,
+    verbose: bool = False,
+    create_log_file: bool = False,
+    fix_workers: int = DEFAULT_FIX_WORKERS,
+    use_gate_cache: bool = True,
+    fix_call_budget: int | None = None,
+    fix_time_budget: float | None = None,
+    pipeline_config: str | None = None,
+) -> dict[str, Any]:
+    """
+    分片执行 monorepo 的质量门禁
+
+    在 workspace 下发现各包根目录（pyproject.toml/setup.py 或 __init__.py 边界），
+    每个分片在进程池中独立运行完整的检查-修复-测试流水线，最后合并结果和错误汇总 JSON。
+
+    Args:
+        workspace: monorepo 根目录
+        shard_workers: 同时运行的分片进程数；None 为 min(4, CPU 数, 分片数)
+        epic_id: 标识符（分片的标识符为 "<epic_id>-<分片名>"）
+        其余参数: 同 run_quality_gates_standalone，作用于每个分片
+
+    Returns:
+        合并后的结果字典（含每个分片结果的 "shards"）
+    """
+    import concurrent.futures
+    import multiprocessing
+
+    log_manager = LogManager(create_log_file=create_log_file)
+    init_logging(log_manager)
+
+    if verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+
+    try:
+        workspace_path = Path(workspace).resolve()
+        if not workspace_path.is_dir():
+            return {
+                "success": False,
+                "error": f"Workspace directory not found: {workspace}"
+            }
+
+        start_time = time.time()
+        shards = await asyncio.to_thread(discover_shards, workspace_path)
+        workers = shard_workers or default_shard_workers(len(shards))
+        logger.info(f"Running quality gates for {len(shards)} shard(s) in {workers} process(es)")
+
+        # 分片在各自根目录中运行，共享输出（缓存数据库、汇总文件）使用当前目录的绝对路径
+        state_db_path = str(Path("progress.db").resolve())
+        errors_dir = str(ERRORS_DIR.resolve())
+        pipeline_path = str(Path(pipeline_config).resolve()) if pipeline_config else None
+
+        # spawn：子进程不继承父进程的事件循环和线程
+        loop = asyncio.get_running_loop()
+        results: dict[str, dict[str, Any]] = {}
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            futures = {
+                shard.name: loop.run_in_executor(
+                    pool,
+                    _run_shard_quality_gates,
+                    {
+                        "source_dir": shard.source_dir,
+                        "test_dir": shard.test_dir,
+                        "epic_id": shard_epic_id(epic_id, shard),
+                        "skip_quality": skip_quality,
+                        "skip_tests": skip_tests,
+                        "max_cycles": max_cycles,
+                        "verbose": verbose,
+                        # 日志文件由父进程统一创建
+                        "create_log_file": False,
+                        "fix_workers": fix_workers,
+                        "use_gate_cache": use_gate_cache,
+                        "fix_call_budget": fix_call_budget,
+                        "fix_time_budget": fix_time_budget,
+                        "pipeline_config": pipeline_path,
+                        "state_db_path": state_db_path,
+                        # 每个分片独立的 pytest 汇总，避免分片间相互覆盖
+                        "pytest_summary_path": str(
+                            Path(f"pytest_summary_{shard_file_stem(epic_id, shard)}.json").resolve()
+                        ),
+                        "errors_dir": errors_dir,
+                    },
+                    shard.root,
+                )
+                for shard in shards
+            }
+            try:
+                outcomes = await asyncio.gather(*futures.values(), return_exceptions=True)
+            except asyncio.CancelledError:
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+
+        for name, outcome in zip(futures, outcomes, strict=True):
+            if isinstance(outcome, BaseException):
+                logger.error(f"Shard {name} crashed: {outcome}", exc_info=outcome)
+                results[name] = {"success": False, "errors": [f"Shard process error: {outcome}"]}
+            else:
+                results[name] = outcome
+            status = "passed" if results[name].get("success") else "FAILED"
+            logger.info(f"Shard {name}: {status}")
+
+        merged = merge_shard_results(epic_id, str(workspace_path), shards, results)
+        merged["total_duration"] = round(time.time() - start_time, 2)
+        if merged["success"]:
+            logger.info(
+                f"Quality gates COMPLETED for all {len(shards)} shard(s) "
+                f"in {merged['total_duration']}s"
+            )
+        else:
+            logger.info(
+                f"Quality gates FAILED with {len(merged['errors'])} error(s) "
+                f"across {len(shards)} shard(s)"
+            )
+        return merged
+
+    finally:
+        cleanup_logging()
+
+
 class EpicDriver:
     """Main orchestrator for complete BMAD workflow."""
 
@@ -951,6 +1526,14 @@ class EpicDriver:
         skip_quality: bool = False,
         skip_tests: bool = False,
         create_log_file: bool = False,
+        lease_ttl: float = 600.0,
+        incremental: bool = False,
+        max_no_progress_cycles: int = 2,
+        fix_workers: int = DEFAULT_FIX_WORKERS,
+        use_gate_cache: bool = True,
+        fix_call_budget: int | None = None,
+        fix_time_budget: float | None = None,
+        pipeline_config: str | None = None,
     ):
         """
         Initialize epic driver.
@@ -968,6 +1551,25 @@ class EpicDriver:
             skip_quality: Skip quality gates (ruff and basedpyright)
             skip_tests: Skip pytest execution
             create_log_file: Whether to create timestamped log files (default: False)
+            lease_ttl: Story lease lifetime in seconds when several drivers share
+                progress.db (renewed every lease_ttl/3 while a story is processed)
+            incremental: Only regenerate/re-develop stories whose epic section
+                changed since their last successful run (default: False)
+            max_no_progress_cycles: Stop a story after this many consecutive
+                Dev-QA cycles that changed neither the story file nor any file
+                under source_dir/test_dir (default: 2)
+            fix_workers: Maximum files fixed concurrently in each quality-gate
+                SDK fix phase (default: 4)
+            use_gate_cache: Skip quality gates whose inputs are unchanged since
+                they last passed (default: True)
+            fix_call_budget: Maximum Ruff/BasedPyright SDK fix calls per
+                quality-gate cycle, retries included, highest-impact files first
+                (default: no limit)
+            fix_time_budget: Seconds per quality-gate fix phase after which no
+                further fix is started (default: no limit)
+            pipeline_config: Quality-gate pipeline file (TOML or JSON) defining
+                the stages, their dependencies, cycles, SDK delay/timeout, fix
+                workers and timeouts (default: built-in pipeline)
         """
         self.epic_path = Path(epic_path).resolve()
         self.epic_id = str(self.epic_path)  # Use epic path as epic_id
@@ -982,6 +1584,16 @@ class EpicDriver:
         self.skip_quality = skip_quality
         self.skip_tests = skip_tests
         self.create_log_file = create_log_file
+        self.lease_ttl = lease_ttl
+        self.incremental = incremental
+        # 增量模式下章节已变化但无法重新生成的故事（本次不处理，运行记为失败）
+        self.unregenerated_stories: list[str] = []
+        self.max_no_progress_cycles = max_no_progress_cycles
+        self.fix_workers = fix_workers
+        self.use_gate_cache = use_gate_cache
+        self.fix_call_budget = fix_call_budget
+        self.fix_time_budget = fix_time_budget
+        self.pipeline_config = pipeline_config
 
         # Auto-resolve source_dir and test_dir to absolute paths
         source_path = Path(source_dir)
@@ -1013,8 +1625,10 @@ class EpicDriver:
 
             # Create agents (for potential direct access)
             self.sm_agent = SMAgent()
-            self.dev_agent = DevAgent(use_claude=use_claude)
-            self.qa_agent = QAAgent()
+            self.dev_agent = DevAgent(
+                use_claude=use_claude, watch_dirs=[self.source_dir, self.test_dir]
+            )
+            self.qa_agent = QAAgent(watch_dirs=[self.source_dir, self.test_dir])
             self.state_manager = StateManager()
             self.status_update_agent = StatusUpdateAgent()
 
@@ -1275,81 +1889,16 @@ class EpicDriver:
         ### Story 1: Title
         **Story ID**: 004.1
 
+        Stories are de-duplicated by normalized number ("004.1" == "4.1"),
+        preferring the titled heading over a bare Story ID declaration.
+
         Args:
             content: Epic document content
 
         Returns:
             List of story IDs (e.g., ["004.1", "004.1: Title", ...])
         """
-        story_ids: list[str] = []
-
-        # Pattern 1: "## Story X.Y: Title" or "### Story X.Y: Title"
-        pattern1 = r"#{2,3}\s*Story\s+(\d+(?:\.\d+)?)\s*:\s*(.+?)(?:\n|\$)"
-        matches1 = re.findall(pattern1, content, re.MULTILINE)
-        for story_num, title in matches1:
-            story_id = f"{story_num}: {title}"
-            story_ids.append(story_id)
-            logger.debug(f"Found story section: {story_id}")
-
-        # Pattern 2: "**Story ID**: 004.1"
-        pattern2 = r"\*\*Story ID\*\*\s*:\s*(\d+(?:\.\d+)?)"
-        matches2 = re.findall(pattern2, content, re.MULTILINE)
-        for story_num in matches2:
-            # Check if already added
-            story_id = f"{story_num}"
-            if story_id not in story_ids:
-                story_ids.append(story_id)
-                logger.debug(f"Found story ID: {story_id}")
-
-        # Remove duplicates while preserving order
-        # Handle both "1: Title" and "004.1" formats referring to the same story
-        # Strategy: For each story number, keep the ID with more information (with title)
-        seen_numbers: set[str] = set()
-        unique_story_ids: list[str] = []
-
-        for story_id in story_ids:
-            # Extract just the story number part
-            story_num = story_id.split(":")[0].strip()
-
-            # Normalize the number for comparison
-            # "004.1" → "4.1", "1" → "1" for comparison
-            # Handle both padded and non-padded formats
-            if "." in story_num:
-                # Dotted format like "004.1"
-                # Remove leading zeros from epic part only: "004.1" → "4.1"
-                parts = story_num.split(".")
-                epic_part = parts[0].lstrip("0") or "0"  # Handle "000" → "0"
-                story_part = parts[1]
-                normalized_num = f"{epic_part}.{story_part}"
-            else:
-                # Simple format like "1" or "5"
-                normalized_num = story_num.lstrip("0") or "0"
-
-            # If we haven't seen this story number, add it
-            if normalized_num not in seen_numbers:
-                seen_numbers.add(normalized_num)
-                unique_story_ids.append(story_id)
-            else:
-                # Duplicate found - prefer ID with title over pure number
-                # Check if current one has a title (contains ':')
-                has_title = ":" in story_id
-                if has_title:
-                    # Find and replace the existing pure number ID with this titled ID
-                    for i, existing_id in enumerate(unique_story_ids):
-                        existing_num = existing_id.split(":")[0].strip()
-                        existing_normalized = ""
-                        if "." in existing_num:
-                            parts = existing_num.split(".")
-                            epic_part = parts[0].lstrip("0") or "0"
-                            story_part = parts[1]
-                            existing_normalized = f"{epic_part}.{story_part}"
-                        else:
-                            existing_normalized = existing_num.lstrip("0") or "0"
-
-                        if existing_normalized == normalized_num:
-                            # Replace with titled version
-                            unique_story_ids[i] = story_id
-                            break
+        unique_story_ids = EpicIndex.from_content(content).display_ids()
 
         logger.debug(
             f"Extracted {len(unique_story_ids)} unique story IDs: {unique_story_ids}"
@@ -1606,7 +2155,8 @@ class EpicDriver:
                     tg,
                     use_claude=self.use_claude,
                     log_manager=self.log_manager,
-                    epic_path=self.epic_id  # ← 传递epic_path
+                    epic_path=self.epic_id,  # ← 传递epic_path
+                    watch_dirs=[self.source_dir, self.test_dir],
                 )
                 self.devqa_controller = devqa_controller
 
@@ -1743,6 +2293,11 @@ class EpicDriver:
             # 🎯 核心改动：循环由核心状态值驱动
             iteration = 1
             max_dev_qa_cycles = 10
+            # 上一阶段结束后由状态监视得到的状态，无需再次解析
+            known_status: str | None = None
+            # 无进展检测：故事文件与工作区均未变化的连续循环数
+            last_digest = await self._progress_digest(story_path)
+            no_progress_cycles = 0
 
             while iteration <= max_dev_qa_cycles:
                 logger.info(
@@ -1751,7 +2306,10 @@ class EpicDriver:
 
                 try:
                     # 1️⃣ 读取当前核心状态值
-                    current_status = await self._parse_story_status(story_path)
+                    if known_status is not None:
+                        current_status = known_status
+                    else:
+                        current_status = await self._parse_story_status(story_path)
                     logger.info(f"[Cycle {iteration}] Current status: {current_status}")
                     
                 except asyncio.CancelledError:
@@ -1808,10 +2366,53 @@ class EpicDriver:
                     logger.warning(f"[Cycle {iteration}] Unknown status '{current_status}', attempting Dev phase")
                     await self.execute_dev_phase(story_path, iteration)
 
-                # 3️⃣ 等待 SDK 清理 + 状态更新
-                await asyncio.sleep(1.0)
+                # 3️⃣ 等待代理写入状态：文件变化即返回，超时表示本阶段未改变状态
+                try:
+                    changed_status = await wait_for_status_change(
+                        story_path,
+                        timeout=STATUS_CHANGE_TIMEOUT,
+                        previous_status=current_status,
+                        parse_status=self._parse_story_status,
+                    )
+                    if changed_status is None:
+                        logger.info(
+                            f"[Cycle {iteration}] No status change made (still {current_status})"
+                        )
+                        known_status = current_status
+                    else:
+                        logger.info(f"[Cycle {iteration}] Status changed: {current_status} -> {changed_status}")
+                        known_status = changed_status
+                except asyncio.CancelledError:
+                    logger.debug(f"[Cycle {iteration}] CancelledError during status wait absorbed (non-fatal)")
+                    known_status = None
+
+                # 4️⃣ 无进展检测：连续 K 个循环既未改动故事也未改动代码时提前停止
+                digest = await self._progress_digest(story_path)
+                if digest == last_digest:
+                    no_progress_cycles += 1
+                    logger.warning(
+                        f"[Cycle {iteration}] No progress made "
+                        f"({no_progress_cycles}/{self.max_no_progress_cycles})"
+                    )
+                    if no_progress_cycles >= self.max_no_progress_cycles:
+                        logger.error(
+                            f"Story {story_id} made no progress in {no_progress_cycles} "
+                            f"consecutive cycles, stopping (status: {current_status})"
+                        )
+                        await self.state_manager.update_story_status(
+                            story_path=story_path,
+                            status="failed",
+                            phase="dev_qa",
+                            iteration=iteration,
+                            error=f"No progress in {no_progress_cycles} consecutive Dev-QA cycles",
+                            epic_path=self.epic_id,
+                        )
+                        return False
+                else:
+                    no_progress_cycles = 0
+                last_digest = digest
 
-                # 4️⃣ 增加迭代计数
+                # 5️⃣ 增加迭代计数
                 iteration += 1
 
             # 超过最大循环次数
@@ -1827,6 +2428,22 @@ class EpicDriver:
             )
             return False
 
+    async def _progress_digest(self, story_path: str) -> str:
+        """
+        Digest of the story file content plus the source/test tree state.
+
+        Args:
+            story_path: Path to the story markdown file
+
+        Returns:
+            Digest that changes whenever the story or any source/test file changes
+        """
+        def compute() -> str:
+            snapshot = WorkspaceSnapshot.take([self.source_dir, self.test_dir])
+            return f"{file_digest(story_path)}:{snapshot.digest}"
+
+        return await asyncio.to_thread(compute)
+
     async def _parse_story_status(self, story_path: str) -> str:
         """
         Parse the status field from a story markdown file using AI-powered parsing strategy.
@@ -1839,13 +2456,20 @@ class EpicDriver:
             Uses AI parsing with fallback to 'Draft' if all parsing fails
         """
         try:
-            with open(story_path, encoding="utf-8") as f:
-                content = f.read()
+            # Unchanged files (same mtime/size/inode) reuse the cached status
+            identity = story_status_cache.file_identity(story_path)
+            cached = story_status_cache.get(story_path, "core", identity)
+            if cached is not None:
+                return cached
+
+            # The status block always sits in the document header
+            content = read_story_header(story_path)
 
             # Use StatusParser for AI-powered parsing strategy
             if hasattr(self, "status_parser") and self.status_parser:
                 # Note: parse_status is now async in SimpleStatusParser
                 status = await self.status_parser.parse_status(content)
+                story_status_cache.put(story_path, "core", identity, status)
                 # Return the status directly (already normalized by StatusParser)
                 return status
             else:
@@ -1893,26 +2517,29 @@ class EpicDriver:
             Status string using original parsing logic
         """
         try:
+            identity = story_status_cache.file_identity(story_path)
+            cached = story_status_cache.get(story_path, "fallback", identity)
+            if cached is not None:
+                return cached
+
+            status = "ready_for_development"  # Default to ready_for_development instead of unknown
+            # Look for lines containing "Status:" and extract the value;
+            # the file is read lazily and closed at the first match
             with open(story_path, encoding="utf-8") as f:
-                lines = f.readlines()
-
-            # Look for lines containing "Status:" and extract the value
-            for _, line in enumerate(lines):
-                if "Status:" in line:
+                for line in f:
+                    if "Status:" not in line:
+                        continue
                     # Try to extract status from bold format: **Status**: Ready for Development
-                    match = re.search(
-                        r"\*\*Status\*\*:\s*\*\*([^*]+)\*\*", line, re.IGNORECASE
-                    )
-                    if match:
-                        status = match.group(1).strip().lower()
-                        return status
-                    # Try to extract from regular format: Status: Ready for Development
-                    match = re.search(r"Status:\s*(.+)", line, re.IGNORECASE)
+                    match = _BOLD_STATUS_RE.search(line)
+                    if match is None:
+                        # Try to extract from regular format: Status: Ready for Development
+                        match = _PLAIN_STATUS_RE.search(line)
                     if match:
                         status = match.group(1).strip().lower()
-                        return status
+                        break
 
-            return "ready_for_development"  # Default to ready_for_development instead of unknown
+            story_status_cache.put(story_path, "fallback", identity, status)
+            return status
         except Exception as e:
             logger.error(f"Fallback parsing failed: {e}")
             return "ready_for_development"
@@ -2068,7 +2695,9 @@ class EpicDriver:
                 logger.warning(f"Story file does not exist: {story_path}")
                 return False  # This is a real issue - file should exist
 
-            content = story_file.read_text(encoding="utf-8")
+            document = StoryDocument.load(story_file)
+            content = document.content
+            lowered = content.lower()
 
             # Essential checks - only fail on truly problematic content
             if len(content.strip()) < 50:  # Very short content
@@ -2080,11 +2709,11 @@ class EpicDriver:
             # Helper functions for checking essential story elements
             def has_markdown_headers(content: str) -> bool:
                 """Check if content has markdown headers."""
-                return "#" in content or content.strip().startswith("#")
+                return bool(document.headings) or "#" in content
 
             def mentions_status(content: str) -> bool:
                 """Check if content mentions status."""
-                return "status" in content.lower()
+                return document.status is not None or "status" in lowered
 
             def has_substantial_content(content: str) -> bool:
                 """Check if content has substantial text."""
@@ -2116,14 +2745,14 @@ class EpicDriver:
                     return False
 
             # Smart section detection - look for common story patterns
-            has_story_pattern = any(
-                pattern in content.lower()
-                for pattern in ["## story", "# story", "as a", "i want", "so that"]
+            has_story_pattern = document.has_section("Story") or any(
+                pattern in lowered
+                for pattern in ["# story", "as a", "i want", "so that"]
             )
 
-            has_acceptance_pattern = any(
-                pattern in content.lower()
-                for pattern in ["## acceptance", "# acceptance", "acceptance criteria"]
+            has_acceptance_pattern = document.has_section("Acceptance") or any(
+                pattern in lowered
+                for pattern in ["# acceptance", "acceptance criteria"]
             )
 
             if not has_story_pattern and not has_acceptance_pattern:
@@ -2200,6 +2829,133 @@ class EpicDriver:
                 f"Failed to handle graceful cancellation for {story_path}: {e}"
             )
 
+    def _compute_section_hash(self, story: "dict[str, Any]") -> str | None:
+        """
+        Hash the epic section of a story.
+
+        Args:
+            story: Story dictionary with id
+
+        Returns:
+            SHA-256 of the story section, or None if the epic has no section for it
+        """
+        try:
+            return EpicIndex.load(self.epic_path).section_hash(story["id"])
+        except OSError as e:
+            logger.warning(f"Cannot hash epic section for {story['id']}: {e}")
+            return None
+
+    async def _select_incremental_stories(
+        self, stories: list[dict[str, Any]]
+    ) -> list[dict[str, Any]]:
+        """
+        Select the stories an incremental run has to process.
+
+        - Section unchanged since the last successful run and story Done /
+          Ready for Done: skipped.
+        - Section changed: story document regenerated by the SM agent and
+          re-developed. A story that cannot be regenerated is left out (its
+          document is stale) and the run fails, so the next run retries it.
+        - No recorded hash: processed as usual.
+
+        Args:
+            stories: Stories from parse_epic(), with "section_hash" set
+
+        Returns:
+            Stories to run through the Dev-QA cycle
+        """
+        stored_hashes = await self.state_manager.get_section_hashes(self.epic_id)
+        selected: list[dict[str, Any]] = []
+        changed: list[dict[str, Any]] = []
+
+        for story in stories:
+            number = normalize_story_number(story["id"].split(":")[0].strip())
+            stored_hash = stored_hashes.get(number)
+            if stored_hash is None:
+                selected.append(story)
+            elif stored_hash != story.get("section_hash"):
+                changed.append(story)
+                selected.append(story)
+            elif await self._parse_story_status(story["path"]) in (
+                CORE_STATUS_DONE,
+                CORE_STATUS_READY_FOR_DONE,
+            ):
+                logger.info(f"[Incremental] {story['id']}: epic section unchanged, skipping")
+            else:
+                selected.append(story)
+
+        if changed:
+            logger.info(
+                f"[Incremental] Epic section changed for: {[story['id'] for story in changed]}"
+            )
+            failed = await self._regenerate_changed_stories(changed)
+            if failed:
+                failed_ids = {story["id"] for story in failed}
+                selected = [story for story in selected if story["id"] not in failed_ids]
+                self.unregenerated_stories = sorted(failed_ids)
+                logger.error(
+                    f"[Incremental] Skipping stories that could not be regenerated: "
+                    f"{self.unregenerated_stories}"
+                )
+
+        logger.info(
+            f"[Incremental] {len(selected)}/{len(stories)} stories selected for processing"
+        )
+        return selected
+
+    async def _regenerate_changed_stories(
+        self, stories: list[dict[str, Any]]
+    ) -> list[dict[str, Any]]:
+        """
+        Regenerate story documents whose epic section changed.
+
+        Args:
+            stories: Stories to regenerate (updated in place with new path/status)
+
+        Returns:
+            The stories that could not be regenerated
+        """
+        # SM 只在故事验证通过后替换其文件，失败的故事文件保持旧内容
+        regenerated = await self.sm_agent.regenerate_stories(
+            str(self.epic_path), [story["id"] for story in stories]
+        )
+        failed: list[dict[str, Any]] = []
+
+        for story in stories:
+            story_file = regenerated.get(
+                normalize_story_number(story["id"].split(":")[0].strip())
+            )
+            if story_file is not None:
+                story["path"] = self._convert_to_windows_path(str(story_file.resolve()))
+                story["name"] = story_file.name
+                story_status_cache.invalidate(story["path"])
+                story["status"] = self._parse_story_status_sync(story["path"])
+                logger.info(f"[Incremental] Regenerated {story['id']} (status: {story['status']})")
+                continue
+
+            # 故事文档仍是旧章节的内容，不能据此开发
+            logger.warning(f"[Incremental] Could not regenerate {story['id']}")
+            failed.append(story)
+
+        return failed
+
+    async def _record_section_hash(self, story: "dict[str, Any]") -> None:
+        """
+        Record the epic section hash of a successfully processed story.
+
+        Args:
+            story: Story dictionary with id, path and (optionally) section_hash
+        """
+        section_hash = story.get("section_hash") or self._compute_section_hash(story)
+        if section_hash is None:
+            return
+        await self.state_manager.record_section_hash(
+            epic_path=self.epic_id,
+            story_number=normalize_story_number(story["id"].split(":")[0].strip()),
+            section_hash=section_hash,
+            story_path=story["path"],
+        )
+
     async def execute_dev_qa_cycle(self, stories: list[dict[str, Any]]) -> bool:
         """
         Execute Dev-QA cycle for all stories.
@@ -2219,19 +2975,67 @@ class EpicDriver:
         await self._initialize_epic_processing(len(stories))
 
         success_count = 0
-        for story in stories:
+        stories_by_path = {story["path"]: story for story in stories}
+        processed_paths: set[str] = set()
+        claim_failures = 0
+
+        while True:
+            # 通过租约认领下一个故事，其他共享 progress.db 的进程不会重复处理
+            try:
+                claimed_path = await self.state_manager.claim_next_story(
+                    epic_path=self.epic_id,
+                    story_paths=list(stories_by_path),
+                    ttl=self.lease_ttl,
+                    exclude=processed_paths,
+                )
+            except Exception as e:
+                # 没有租约不处理故事：退避后重试
+                claim_failures += 1
+                if claim_failures >= CLAIM_ATTEMPTS:
+                    self.logger.error(
+                        f"Giving up after {claim_failures} failed story claim(s): {e}"
+                    )
+                    break
+                await asyncio.sleep(CLAIM_BACKOFF * 2 ** (claim_failures - 1))
+                continue
+            claim_failures = 0
+            if claimed_path is None:
+                break
+            processed_paths.add(claimed_path)
+            story = stories_by_path[claimed_path]
+
             if self.verbose:
                 self.logger.debug(f"Processing story: {story['id']}")
 
             try:
                 # ✅ process_story 可能会传播 CancelledError
-                if await self.process_story(story):
+                async with self.state_manager.hold_lease(
+                    claimed_path, self.lease_ttl
+                ) as lease:
+                    story_succeeded = await self.process_story(story)
+                    if story_succeeded and lease.lost:
+                        # 故事可能已被其他进程接管，本次结果不计
+                        self.logger.warning(
+                            f"Lease on {story['id']} was lost during processing; "
+                            f"result discarded"
+                        )
+                        story_succeeded = False
+                    if story_succeeded:
+                        # 在释放租约前记录完成，其他进程不会再认领
+                        await self.state_manager.record_story_completion(
+                            self.epic_id, claimed_path
+                        )
+                if story_succeeded:
                     success_count += 1
+                    await self._record_section_hash(story)
                 elif not self.retry_failed:
                     if self.verbose:
                         self.logger.debug(
                             f"Continuing to next story after failure: {story['id']}"
                         )
+            except LeaseLostError as e:
+                self.logger.warning(f"[Epic Level] {e}; story {story['id']} abandoned")
+                continue
             except asyncio.CancelledError:
                 # 🎯 关键修复：SDK 内部取消不应中断 Epic 执行
                 # 完全封装，继续处理下一个 story
@@ -2269,19 +3073,39 @@ class EpicDriver:
                 # 回退到简单等待
                 await asyncio.sleep(1.0)
 
+        claimed_elsewhere = [p for p in stories_by_path if p not in processed_paths]
+        if claimed_elsewhere:
+            self.logger.info(
+                f"{len(claimed_elsewhere)} story(ies) leased by other workers, skipped: "
+                f"{claimed_elsewhere}"
+            )
+
         # Update progress
         await self._update_progress(
             "dev_qa",
             "completed",
-            {"completed_stories": success_count, "total_stories": len(stories)},
+            {"completed_stories": success_count, "total_stories": len(processed_paths)},
         )
 
         self.logger.info(
-            f"Dev-QA cycle complete: {success_count}/{len(stories)} stories succeeded"
+            f"Dev-QA cycle complete: {success_count}/{len(processed_paths)} stories succeeded"
         )
 
-        # Return True if all stories succeeded, False otherwise
-        return success_count == len(stories)
+        if claim_failures:
+            return False
+        if not processed_paths:
+            # 本进程未处理任何故事：仅当所有故事均已完成时视为成功
+            completed = await self.state_manager.get_completed_stories(list(stories_by_path))
+            if len(completed) < len(stories_by_path):
+                self.logger.warning(
+                    f"No story processed by this worker and "
+                    f"{len(stories_by_path) - len(completed)} story(ies) not completed"
+                )
+                return False
+            return True
+
+        # Return True if all stories processed by this worker succeeded
+        return success_count == len(processed_paths)
 
     def _validate_phase_gates(self) -> bool:
         """
@@ -2375,7 +3199,7 @@ class EpicDriver:
                 f"Configuration: max_iterations={self.max_iterations}, "
                 f"retry_failed={self.retry_failed}, verbose={self.verbose}, "
                 f"concurrent={self.concurrent}, skip_quality={self.skip_quality}, "
-                f"skip_tests={self.skip_tests}"
+                f"skip_tests={self.skip_tests}, incremental={self.incremental}"
             )
             self.logger.debug(config_str)
 
@@ -2412,6 +3236,17 @@ class EpicDriver:
             # Log cleanup summary
             self._log_cleanup_summary(epic_id, story_ids, cleanup_stats)
 
+            # 定时压缩数据库（incremental_vacuum + WAL 截断），未到期时跳过
+            maintenance_results = await self.state_manager.run_maintenance_if_due()
+            self.logger.debug(f"Database maintenance: {maintenance_results}")
+
+            # 记录本次运行开始时各故事的 Epic 章节哈希（成功后写入数据库）
+            for story in stories:
+                story["section_hash"] = self._compute_section_hash(story)
+
+            if self.incremental:
+                stories = await self._select_incremental_stories(stories)
+
             # Phase 1: Dev-QA Cycle
             self.logger.info("=== Phase 1: Dev-QA Cycle ===")
             await self._update_progress("dev_qa", "in_progress", {})
@@ -2449,6 +3284,13 @@ class EpicDriver:
                     f"成功同步 {sync_results.get('success_count', 0)} 个故事状态"
                 )
 
+            if self.unregenerated_stories:
+                self.logger.error(
+                    f"Stories not processed because they could not be regenerated: "
+                    f"{self.unregenerated_stories}"
+                )
+                return False
+
             self.logger.info("=== Epic Processing Complete ===")
             return True
 
@@ -2474,7 +3316,11 @@ class EpicDriver:
                 if hasattr(self, "log_manager") and self.log_manager:
                     self.log_manager.flush()
 
-                # 2. Finally cleanup logging
+                # 2. Close the state database connections
+                if getattr(self, "state_manager", None) is not None:
+                    await self.state_manager.close()
+
+                # 3. Finally cleanup logging
                 cleanup_logging()
 
             except Exception:
@@ -2498,6 +3344,14 @@ class EpicDriver:
                 test_dir=self.test_dir,
                 skip_quality=self.skip_quality,
                 skip_tests=self.skip_tests,
+                fix_workers=self.fix_workers,
+                state_manager=getattr(self, "state_manager", None),
+                use_gate_cache=self.use_gate_cache,
+                fix_call_budget=self.fix_call_budget,
+                fix_time_budget=self.fix_time_budget,
+                pipeline=(
+                    PipelineConfig.load(self.pipeline_config) if self.pipeline_config else None
+                ),
             )
 
             # Execute quality gates pipeline
@@ -2680,6 +3534,66 @@ For more information on quality gates, see docs/troubleshooting/quality-gates.md
         help="Enable timestamped log file creation (disabled by default)"
     )
 
+    _ = epic_parser.add_argument(
+        "--lease-ttl",
+        type=float,
+        default=600.0,
+        metavar="SECONDS",
+        help="Story lease lifetime when several drivers share progress.db (default: 600)",
+    )
+
+    _ = epic_parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only regenerate/re-develop stories whose epic section changed since the last successful run",
+    )
+
+    _ = epic_parser.add_argument(
+        "--max-no-progress-cycles",
+        type=int,
+        default=2,
+        metavar="N",
+        help="Stop a story after N consecutive Dev-QA cycles that change no story or source file (default: 2)",
+    )
+
+    _ = epic_parser.add_argument(
+        "--fix-workers",
+        type=int,
+        default=DEFAULT_FIX_WORKERS,
+        metavar="N",
+        help=f"Maximum files fixed concurrently in quality-gate fix phases (default: {DEFAULT_FIX_WORKERS})",
+    )
+
+    _ = epic_parser.add_argument(
+        "--no-gate-cache",
+        action="store_true",
+        help="Run every quality gate even if its inputs are unchanged since it last passed",
+    )
+
+    _ = epic_parser.add_argument(
+        "--fix-call-budget",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Maximum Ruff/BasedPyright SDK fix calls per cycle, retries included, highest-impact files first (default: no limit)",
+    )
+
+    _ = epic_parser.add_argument(
+        "--fix-time-budget",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="Stop starting new Ruff/BasedPyright fixes after SECONDS per cycle (default: no limit)",
+    )
+
+    _ = epic_parser.add_argument(
+        "--pipeline-config",
+        type=str,
+        default=None,
+        metavar="PATH",
+        help="Quality-gate pipeline definition (TOML or JSON): stages, dependencies, cycles, timeouts",
+    )
+
     # --- Subcommand 2: run-quality (new) ---
     quality_parser = subparsers.add_parser(
         'run-quality',
@@ -2710,6 +3624,36 @@ For more information on quality gates, see docs/troubleshooting/quality-gates.md
         '--max-cycles', type=int, default=3,
         help='Maximum fix cycles (default: 3)'
     )
+    quality_parser.add_argument(
+        '--fix-workers', type=int, default=DEFAULT_FIX_WORKERS,
+        help=f'Maximum files fixed concurrently (default: {DEFAULT_FIX_WORKERS})'
+    )
+    quality_parser.add_argument(
+        '--no-gate-cache', action='store_true',
+        help='Run every gate even if its inputs are unchanged since it last passed'
+    )
+    quality_parser.add_argument(
+        '--fix-call-budget', type=int, default=None,
+        help='Maximum SDK fix calls per cycle, retries included, highest-impact files first (default: no limit)'
+    )
+    quality_parser.add_argument(
+        '--fix-time-budget', type=float, default=None,
+        help='Stop starting new fixes after this many seconds per cycle (default: no limit)'
+    )
+    quality_parser.add_argument(
+        '--pipeline-config', type=str, default=None,
+        help='Pipeline definition (TOML or JSON): stages, dependencies, cycles, timeouts'
+    )
+    quality_parser.add_argument(
+        '--workspace', type=str, default=None,
+        help='Monorepo root: gate each package (pyproject.toml/setup.py or __init__.py '
+             'boundary) as its own shard; --source-dir/--test-dir are then ignored'
+    )
+    quality_parser.add_argument(
+        '--shard-workers', type=int, default=None,
+        help='Shards gated in parallel processes with --workspace '
+             '(default: min(4, CPUs, shards)); each shard uses --fix-workers fixers'
+    )
     quality_parser.add_argument(
         '--verbose', action='store_true',
         help='Enable verbose logging'
@@ -2749,6 +3693,34 @@ For more information on quality gates, see docs/troubleshooting/quality-gates.md
     if hasattr(args, 'max_iterations') and args.max_iterations <= 0:
         parser.error("--max-iterations must be a positive integer")
 
+    # Validate lease_ttl for run-epic command
+    if hasattr(args, 'lease_ttl') and args.lease_ttl <= 0:
+        parser.error("--lease-ttl must be positive")
+
+    if hasattr(args, 'max_no_progress_cycles') and args.max_no_progress_cycles < 1:
+        parser.error("--max-no-progress-cycles must be at least 1")
+
+    if hasattr(args, 'fix_workers') and args.fix_workers < 1:
+        parser.error("--fix-workers must be at least 1")
+
+    if getattr(args, 'fix_call_budget', None) is not None and args.fix_call_budget < 1:
+        parser.error("--fix-call-budget must be at least 1")
+
+    if getattr(args, 'fix_time_budget', None) is not None and args.fix_time_budget <= 0:
+        parser.error("--fix-time-budget must be positive")
+
+    if getattr(args, 'pipeline_config', None):
+        try:
+            PipelineConfig.load(args.pipeline_config)
+        except (OSError, ValueError, TypeError) as e:
+            parser.error(f"--pipeline-config: {e}")
+
+    if getattr(args, 'shard_workers', None) is not None and args.shard_workers < 1:
+        parser.error("--shard-workers must be at least 1")
+
+    if getattr(args, 'workspace', None) and not Path(args.workspace).is_dir():
+        parser.error(f"--workspace: directory not found: {args.workspace}")
+
     # Validate max_cycles for run-quality command
     if hasattr(args, 'max_cycles') and args.max_cycles <= 0:
         parser.error("--max-cycles must be a positive integer")
@@ -2761,7 +3733,32 @@ async def main():
     args = parse_arguments()
 
     # Route to corresponding handler
-    if args.command == 'run-quality':
+    if args.command == 'run-quality' and args.workspace:
+        # monorepo 分片质量门禁
+        results = await run_quality_gates_sharded(
+            workspace=args.workspace,
+            shard_workers=args.shard_workers,
+            epic_id=args.epic_id,
+            skip_quality=args.skip_quality,
+            skip_tests=args.skip_tests,
+            max_cycles=args.max_cycles,
+            verbose=args.verbose,
+            create_log_file=args.log_file,
+            fix_workers=args.fix_workers,
+            use_gate_cache=not args.no_gate_cache,
+            fix_call_budget=args.fix_call_budget,
+            fix_time_budget=args.fix_time_budget,
+            pipeline_config=args.pipeline_config,
+        )
+
+        if results.get("success"):
+            logger.info("✓ Quality gates completed successfully for all shards")
+            sys.exit(0)
+        else:
+            logger.error(f"✗ Quality gates failed: {results.get('errors') or results.get('error')}")
+            sys.exit(1)
+
+    elif args.command == 'run-quality':
         # 独立质量门禁
         results = await run_quality_gates_standalone(
             source_dir=args.source_dir,
@@ -2772,6 +3769,11 @@ async def main():
             max_cycles=args.max_cycles,
             verbose=args.verbose,
             create_log_file=args.log_file,
+            fix_workers=args.fix_workers,
+            use_gate_cache=not args.no_gate_cache,
+            fix_call_budget=args.fix_call_budget,
+            fix_time_budget=args.fix_time_budget,
+            pipeline_config=args.pipeline_config,
         )
 
         # 输出结果摘要
@@ -2807,6 +3809,14 @@ async def main():
             skip_quality=args.skip_quality,  # type: ignore[arg-type]
             skip_tests=args.skip_tests,  # type: ignore[arg-type]
             create_log_file=args.log_file,  # type: ignore[arg-type]
+            lease_ttl=args.lease_ttl,  # type: ignore[arg-type]
+            incremental=args.incremental,  # type: ignore[arg-type]
+            max_no_progress_cycles=args.max_no_progress_cycles,  # type: ignore[arg-type]
+            fix_workers=args.fix_workers,  # type: ignore[arg-type]
+            use_gate_cache=not args.no_gate_cache,  # type: ignore[arg-type]
+            fix_call_budget=args.fix_call_budget,  # type: ignore[arg-type]
+            fix_time_budget=args.fix_time_budget,  # type: ignore[arg-type]
+            pipeline_config=args.pipeline_config,  # type: ignore[arg-type]
         )
 
         success = await driver.run()
@@ -0,0 +1,209 @@
+"""Module for indexing the stories declared in an epic document."""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# "## Story 1.2: Title" (any heading level from 2 down)
+_STORY_HEADING_RE = re.compile(r"^(#{2,6})\s*Story\s+(\d+(?:\.\d+)?)\s*:\s*(.+?)\s*$")
+# "**Story ID**: 004.1" anywhere in a line
+_STORY_ID_RE = re.compile(r"\*\*Story ID\*\*\s*:\s*(\d+(?:\.\d+)?)")
+# "**Key**: value" / "- **Key**: value" metadata lines inside a story section
+_METADATA_RE = re.compile(r"^\s*(?:[-*]\s+)?\*\*([^*]+?)\*\*\s*:\s*(.+?)\s*$")
+_HEADING_RE = re.compile(r"^(#{1,6})\s")
+
+
+def normalize_story_number(number: str) -> str:
+    """Normalize a story number for comparison.
+
+    Leading zeros are removed from the epic part only: "004.1" -> "4.1",
+    "007" -> "7".
+
+    Args:
+        number: Story number as written in the epic.
+
+    Returns:
+        The normalized number.
+    """
+    if "." in number:
+        epic_part, story_part = number.split(".", 1)
+        return f"{epic_part.lstrip('0') or '0'}.{story_part}"
+    return number.lstrip("0") or "0"
+
+
+@dataclass
+class EpicStory:
+    """A story declared in an epic.
+
+    Attributes:
+        number: Story number as first written in the epic, e.g. "004.1".
+        title: Title from the story heading, if the story has one.
+        heading_level: Markdown level of the story heading.
+        span: (start, end) character offsets of the story section.
+        metadata: "**Key**: value" fields declared in the story section.
+    """
+
+    number: str
+    title: str | None = None
+    heading_level: int | None = None
+    span: tuple[int, int] | None = None
+    metadata: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def display_id(self) -> str:
+        """The ID used by the driver: "number: title", or the number alone."""
+        return f"{self.number}: {self.title}" if self.title else self.number
+
+
+class EpicIndex:
+    """Stories of an epic, tokenised in a single pass over the document.
+
+    Stories are keyed by normalized number. Stories with a heading come first
+    in document order, followed by stories only declared via "**Story ID**".
+    Indexes are shared per content hash, so repeated lookups on the same epic
+    reuse one parse; an index must not be modified.
+    """
+
+    def __init__(self, content: str, content_hash: str | None = None):
+        """Tokenise an epic document.
+
+        Args:
+            content: Epic markdown.
+            content_hash: SHA-256 of the content, if already computed.
+        """
+        self.content = content
+        self.content_hash = content_hash or hashlib.sha256(content.encode("utf-8")).hexdigest()
+        self.stories: dict[str, EpicStory] = {}
+        self._build()
+
+    @classmethod
+    def from_content(cls, content: str) -> "EpicIndex":
+        """Return the (cached) index for epic content.
+
+        Args:
+            content: Epic markdown.
+
+        Returns:
+            The shared index for this content.
+        """
+        return _index_cache.get(content)
+
+    @classmethod
+    def load(cls, epic_path: str | Path) -> "EpicIndex":
+        """Read an epic file and return its (cached) index.
+
+        Args:
+            epic_path: Path to the epic file.
+
+        Returns:
+            The shared index for the file content.
+        """
+        return cls.from_content(Path(epic_path).read_text(encoding="utf-8"))
+
+    def _build(self) -> None:
+        headed: dict[str, EpicStory] = {}
+        declared: dict[str, EpicStory] = {}
+        current: EpicStory | None = None
+        current_start = 0
+
+        def close(end: int) -> None:
+            nonlocal current
+            if current is not None:
+                current.span = (current_start, end)
+                current = None
+
+        offset = 0
+        for line in self.content.splitlines(keepends=True):
+            text = line.rstrip("\r\n")
+            heading = _STORY_HEADING_RE.match(text)
+            if heading:
+                close(offset)
+                level, number, title = len(heading.group(1)), heading.group(2), heading.group(3)
+                key = normalize_story_number(number)
+                if key not in headed:
+                    current = EpicStory(number=number, title=title, heading_level=level)
+                    current_start = offset
+                    headed[key] = current
+            elif current is not None:
+                other_heading = _HEADING_RE.match(text)
+                if text.startswith("---") or (
+                    other_heading
+                    and current.heading_level is not None
+                    and len(other_heading.group(1)) <= current.heading_level
+                ):
+                    close(offset)
+                else:
+                    field_match = _METADATA_RE.match(text)
+                    if field_match:
+                        current.metadata.setdefault(field_match.group(1).strip(), field_match.group(2))
+
+            if "**Story ID**" in text:
+                for number in _STORY_ID_RE.findall(text):
+                    declared.setdefault(normalize_story_number(number), EpicStory(number=number))
+            offset += len(line)
+        close(offset)
+
+        self.stories = dict(headed)
+        for key, story in declared.items():
+            self.stories.setdefault(key, story)
+
+    def get(self, number: str) -> EpicStory | None:
+        """Look up a story by number ("004.1" and "4.1" are the same story)."""
+        return self.stories.get(normalize_story_number(number.split(":")[0].strip()))
+
+    def story_numbers(self) -> list[str]:
+        """Story numbers in index order, e.g. ["1.1", "1.2"]."""
+        return [story.number for story in self.stories.values()]
+
+    def display_ids(self) -> list[str]:
+        """Driver-style story IDs, e.g. ["1.1: Title", "004.2"]."""
+        return [story.display_id for story in self.stories.values()]
+
+    def title(self, number: str) -> str | None:
+        """Title of a story, or None if it has no heading."""
+        story = self.get(number)
+        return story.title if story else None
+
+    def section_hash(self, number: str) -> str | None:
+        """SHA-256 of a story section, or None if the story has no section."""
+        section = self.section(number)
+        if section is None:
+            return None
+        return hashlib.sha256(section.encode("utf-8")).hexdigest()
+
+    def section(self, number: str) -> str | None:
+        """Text of a story section (heading included), or None if not found."""
+        story = self.get(number)
+        if story is None or story.span is None:
+            return None
+        start, end = story.span
+        return self.content[start:end].strip()
+
+
+class _EpicIndexCache:
+    """Small LRU cache of epic indexes keyed on content hash."""
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, EpicIndex] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, content: str) -> EpicIndex:
+        key = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        with self._lock:
+            index = self._entries.get(key)
+            if index is not None:
+                self._entries.move_to_end(key)
+                return index
+        index = EpicIndex(content, key)
+        with self._lock:
+            self._entries[key] = index
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return index
+
+
+_index_cache = _EpicIndexCache()
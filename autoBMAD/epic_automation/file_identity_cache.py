@@ -0,0 +1,81 @@
+"""Module for caching values derived from files, keyed on file identity.
+
+An entry is reused while the file's ``(st_mtime_ns, st_size, st_ino)`` is
+unchanged. As with git's "racy" index entries, files modified less than
+``racy_window_ns`` ago are never cached, so two same-size writes within one
+timestamp tick are never mistaken for an unchanged file.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+# File identity: (st_mtime_ns, st_size, st_ino)
+FileIdentity = tuple[int, int, int]
+
+
+class FileIdentityCache[V]:
+    """Thread-safe LRU cache of values keyed on (path, kind) and file identity.
+
+    ``kind`` separates values derived from the same file by different parsers.
+    The identity must be taken before the file is read: if the file changes
+    during the read, the next lookup sees a different identity and misses.
+    """
+
+    def __init__(self, max_entries: int = 1024, racy_window_ns: int = 1_000_000_000):
+        self.max_entries = max_entries
+        self.racy_window_ns = racy_window_ns
+        self._entries: OrderedDict[tuple[str, str], tuple[FileIdentity, V]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def file_identity(path: str | Path) -> FileIdentity | None:
+        """Return the identity of a file, or None if it cannot be stat'ed."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    @staticmethod
+    def _key(path: str | Path, kind: str) -> tuple[str, str]:
+        return (os.path.abspath(path), kind)
+
+    def get(self, path: str | Path, kind: str, identity: FileIdentity | None) -> V | None:
+        """Return the cached value if the file still has ``identity``, else None."""
+        if identity is None:
+            return None
+        key = self._key(path, kind)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == identity:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, path: str | Path, kind: str, identity: FileIdentity | None, value: V) -> None:
+        """Cache a value derived from the file as it was at ``identity``."""
+        if identity is None or time.time_ns() - identity[0] < self.racy_window_ns:
+            return
+        key = self._key(path, kind)
+        with self._lock:
+            self._entries[key] = (identity, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, path: str | Path | None = None) -> None:
+        """Drop all cached values of a file (or of all files)."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                return
+            abs_path = os.path.abspath(path)
+            for key in [k for k in self._entries if k[0] == abs_path]:
+                del self._entries[key]
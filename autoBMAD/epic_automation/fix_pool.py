@@ -0,0 +1,231 @@
+"""Module for fixing files concurrently in the quality-gate fix phases.
+
+A bounded set of workers takes groups of files from a queue and runs one fix
+per file. Each fix holds an advisory per-file lock, so two fixers never edit
+the same file at once. Files that import each other (and, optionally, files
+that import the same local module) form one group and are fixed one after the
+other by the same worker, since fixing one of them tends to touch the others.
+"""
+
+import asyncio
+import logging
+import time
+import weakref
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Sequence
+from contextlib import asynccontextmanager
+
+from autoBMAD.epic_automation.import_graph import file_key as _file_key
+from autoBMAD.epic_automation.import_graph import local_imports, search_roots
+
+logger = logging.getLogger(__name__)
+
+# Default number of concurrent fixers per fix phase
+DEFAULT_FIX_WORKERS = 4
+
+# Default fix attempts per file and cycle (each retry uses fresh diagnostics
+# and counts against the cycle's fix call budget)
+DEFAULT_FILE_FIX_ATTEMPTS = 3
+
+# Fix callback: file path -> None (errors are recorded by the callback itself)
+FileFixer = Callable[[str], Awaitable[None]]
+
+
+class FixBudget:
+    """SDK fix calls and wall-clock time left in one fix phase.
+
+    Every fix attempt takes one call, including per-file retries. First
+    attempts are started by ``run_fix_pool``, which applies the time budget
+    itself; retries are not started once the time is up.
+
+    Args:
+        max_calls: SDK fix calls for the phase; None for no limit.
+        time_budget: Seconds from now after which no retry is started; None
+            for no limit.
+    """
+
+    def __init__(self, max_calls: int | None = None, time_budget: float | None = None):
+        self.max_calls = max_calls
+        self.deadline = None if time_budget is None else time.monotonic() + time_budget
+        self.calls = 0
+
+    def take(self, path: str, attempt: int) -> bool:
+        """Take one call for a fix attempt; False if the budget is used up."""
+        if self.max_calls is not None and self.calls >= self.max_calls:
+            logger.info(
+                f"{path}: fix call budget of {self.max_calls} used up, "
+                f"skipping attempt {attempt}"
+            )
+            return False
+        if attempt > 1 and self.deadline is not None and time.monotonic() >= self.deadline:
+            logger.info(f"{path}: fix time budget used up, skipping attempt {attempt}")
+            return False
+        self.calls += 1
+        return True
+
+
+class FileLockRegistry:
+    """Advisory per-file locks shared by all fix phases in the process.
+
+    Locks are created per event loop, so the registry can outlive an
+    ``asyncio.run()`` call.
+    """
+
+    def __init__(self) -> None:
+        self._locks: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, dict[str, asyncio.Lock]
+        ] = weakref.WeakKeyDictionary()
+
+    def lock(self, path: str) -> asyncio.Lock:
+        """The lock for a file in the running event loop."""
+        locks = self._locks.setdefault(asyncio.get_running_loop(), {})
+        return locks.setdefault(_file_key(path), asyncio.Lock())
+
+    @asynccontextmanager
+    async def hold(self, *paths: str) -> AsyncIterator[None]:
+        """Hold the locks of several files (acquired in a fixed order)."""
+        keys = sorted({_file_key(path) for path in paths})
+        held: list[asyncio.Lock] = []
+        try:
+            for key in keys:
+                file_lock = self.lock(key)
+                await file_lock.acquire()
+                held.append(file_lock)
+            yield
+        finally:
+            for file_lock in reversed(held):
+                file_lock.release()
+
+
+# Process-wide registry used by the quality-gate controllers
+file_locks = FileLockRegistry()
+
+
+def group_by_imports(
+    files: Sequence[str],
+    roots: Iterable[str] = (),
+    shared_imports: bool = False,
+) -> list[list[str]]:
+    """Group files that are coupled through imports.
+
+    Two files end up in one group if one imports the other, or, with
+    ``shared_imports``, if both import the same local module (e.g. two tests
+    of one source module, whose fixes may edit that module). Absolute imports
+    are resolved against ``roots`` and the current directory.
+
+    Args:
+        files: Files to group (order is kept within and across groups).
+        roots: Import roots, e.g. the source directory and its parent.
+        shared_imports: Also group files importing the same local module.
+
+    Returns:
+        Groups of the given paths.
+    """
+    resolved_roots = search_roots(roots)
+    parent: dict[str, str] = {}
+
+    def find(key: str) -> str:
+        parent.setdefault(key, key)
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    def union(a: str, b: str) -> None:
+        parent[find(a)] = find(b)
+
+    keys = [_file_key(path) for path in files]
+    in_batch = set(keys)
+    for path, key in zip(files, keys, strict=True):
+        find(key)
+        for target in local_imports(path, resolved_roots):
+            if target in in_batch or shared_imports:
+                union(key, target)
+
+    groups: dict[str, list[str]] = {}
+    for path, key in zip(files, keys, strict=True):
+        groups.setdefault(find(key), []).append(path)
+    return list(groups.values())
+
+
+async def run_fix_pool(
+    files: Sequence[str],
+    fix_file: FileFixer,
+    max_workers: int = DEFAULT_FIX_WORKERS,
+    call_delay: float = 0.0,
+    group_imports: bool = True,
+    import_roots: Iterable[str] = (),
+    shared_imports: bool = False,
+    locks: FileLockRegistry | None = None,
+    time_budget: float | None = None,
+) -> list[str]:
+    """Run ``fix_file`` for every file with at most ``max_workers`` at a time.
+
+    Files are started in the given order (a group starts at the position of
+    its first file), so callers pass them most important first.
+
+    Args:
+        files: Files to fix.
+        fix_file: Fix callback; records its own errors.
+        max_workers: Maximum concurrent fixes (1 fixes files one by one).
+        call_delay: Pause between two fixes of the same worker (seconds).
+        group_imports: Fix import-coupled files in one worker, in order.
+        import_roots: Roots for resolving absolute imports.
+        shared_imports: Also group files importing the same local module.
+        locks: Lock registry; the process-wide one by default.
+        time_budget: Seconds after which no further fix is started (running
+            fixes finish, and at least one fix is always started); None for
+            no limit.
+
+    Returns:
+        The files whose fix was started, in start order.
+    """
+    if not files:
+        return []
+    locks = locks or file_locks
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+    started: list[str] = []
+
+    if group_imports and max_workers > 1 and len(files) > 1:
+        groups = await asyncio.to_thread(
+            group_by_imports, files, list(import_roots), shared_imports
+        )
+    else:
+        groups = [[path] for path in files]
+
+    queue: asyncio.Queue[list[str]] = asyncio.Queue()
+    for group in groups:
+        queue.put_nowait(group)
+    worker_count = max(1, min(max_workers, len(groups)))
+    logger.info(
+        f"Fixing {len(files)} file(s) in {len(groups)} group(s) "
+        f"with {worker_count} worker(s)"
+    )
+
+    async def worker() -> None:
+        first = True
+        while True:
+            try:
+                group = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            for path in group:
+                if not first and call_delay > 0:
+                    await asyncio.sleep(call_delay)
+                first = False
+                if deadline is not None and started and time.monotonic() >= deadline:
+                    return
+                started.append(path)
+                async with locks.hold(path):
+                    try:
+                        await fix_file(path)
+                    except Exception as e:
+                        # Fixers record their own errors; keep the worker alive
+                        logger.error(f"Fix worker failed on {path}: {e}", exc_info=True)
+
+    await asyncio.gather(*(worker() for _ in range(worker_count)))
+    if len(started) < len(files):
+        logger.info(
+            f"Fix time budget of {time_budget}s used up: "
+            f"{len(files) - len(started)} file(s) left for the next cycle"
+        )
+    return started
@@ -0,0 +1,149 @@
+"""Module for choosing which files a fix cycle spends its SDK calls on.
+
+Files are ranked by impact: the severity-weighted number of diagnostics in the
+file, scaled by how many modules import it (errors in a widely imported module
+tend to cause errors in its importers, and a fix there helps all of them).
+
+Files whose diagnostics were the same before two consecutive fix attempts are
+considered stuck and get no further attempts. A per-cycle call budget limits
+how many files are sent to the SDK; the rest wait for the next cycle.
+"""
+
+import asyncio
+import hashlib
+import logging
+from collections.abc import Iterable, Mapping, Sequence
+
+from autoBMAD.epic_automation.import_graph import count_importers, file_key
+
+logger = logging.getLogger(__name__)
+
+# Weight of one diagnostic by severity (unknown severities weigh 1.0)
+SEVERITY_WEIGHTS: dict[str, float] = {
+    "error": 3.0,
+    "warning": 1.0,
+    "information": 0.5,
+    "info": 0.5,
+    "hint": 0.25,
+}
+
+# Fix attempts with identical diagnostics after which a file is dropped
+DEFAULT_MAX_IDENTICAL_ATTEMPTS = 2
+
+Diagnostics = Sequence[Mapping[str, object]]
+
+
+def severity_score(errors: Diagnostics) -> float:
+    """Severity-weighted number of diagnostics."""
+    return sum(
+        SEVERITY_WEIGHTS.get(str(error.get("severity", "error")).lower(), 1.0)
+        for error in errors
+    )
+
+
+def diagnostics_signature(errors: Diagnostics) -> str:
+    """Digest of a file's diagnostics, ignoring positions.
+
+    Line numbers move whenever a fix edits the file, so only rule codes and
+    messages are compared.
+    """
+    entries = sorted(
+        f"{error.get('code') or error.get('rule') or ''}\0{error.get('message', '')}"
+        for error in errors
+    )
+    return hashlib.sha256("\n".join(entries).encode("utf-8", "surrogateescape")).hexdigest()
+
+
+class FixPrioritizer:
+    """Ranks the files of a fix cycle and tracks repeated failures.
+
+    One instance lives as long as its controller's fix loop, so it sees the
+    diagnostics of every cycle.
+
+    Args:
+        source_dir: Directory whose modules count as importers.
+        import_roots: Roots for resolving absolute imports.
+        max_calls: SDK fix calls per cycle; None for no limit.
+        max_identical_attempts: Attempts with unchanged diagnostics after
+            which a file is dropped.
+    """
+
+    def __init__(
+        self,
+        source_dir: str,
+        import_roots: Iterable[str] = (),
+        max_calls: int | None = None,
+        max_identical_attempts: int = DEFAULT_MAX_IDENTICAL_ATTEMPTS,
+    ):
+        self.source_dir = source_dir
+        self.import_roots = list(import_roots)
+        self.max_calls = max_calls
+        self.max_identical_attempts = max_identical_attempts
+        # file key -> (signature at the last attempt, attempts with that signature)
+        self._attempts: dict[str, tuple[str, int]] = {}
+        self.dropped: dict[str, str] = {}
+
+    def _is_stuck(self, path: str, errors: Diagnostics) -> bool:
+        previous = self._attempts.get(file_key(path))
+        return (
+            previous is not None
+            and previous[0] == diagnostics_signature(errors)
+            and previous[1] >= self.max_identical_attempts
+        )
+
+    async def plan(self, error_files: Mapping[str, Diagnostics]) -> list[str]:
+        """Files to fix this cycle, most impactful first.
+
+        Args:
+            error_files: Diagnostics per file.
+
+        Returns:
+            At most ``max_calls`` paths from ``error_files``.
+        """
+        candidates: list[str] = []
+        for path, errors in error_files.items():
+            if self._is_stuck(path, errors):
+                if path not in self.dropped:
+                    logger.warning(
+                        f"Dropping {path}: {self.max_identical_attempts} fix attempts "
+                        f"left its {len(errors)} diagnostic(s) unchanged"
+                    )
+                self.dropped[path] = diagnostics_signature(errors)
+            else:
+                self.dropped.pop(path, None)
+                candidates.append(path)
+        if not candidates:
+            return []
+
+        fan_in = await asyncio.to_thread(
+            count_importers, candidates, self.source_dir, self.import_roots
+        )
+        scores = {
+            path: severity_score(error_files[path]) * (1 + fan_in.get(file_key(path), 0))
+            for path in candidates
+        }
+        # Stable sort: equal scores keep the tool's order
+        ranked = sorted(candidates, key=lambda path: -scores[path])
+
+        if self.max_calls is not None and len(ranked) > self.max_calls:
+            logger.info(
+                f"Fix budget: {self.max_calls} of {len(ranked)} file(s) this cycle"
+            )
+            ranked = ranked[:self.max_calls]
+        logger.debug(
+            "Fix order: " + ", ".join(f"{path} ({scores[path]:.1f})" for path in ranked)
+        )
+        return ranked
+
+    def record_attempts(
+        self,
+        attempted: Iterable[str],
+        error_files: Mapping[str, Diagnostics],
+    ) -> None:
+        """Remember the diagnostics the attempted files were fixed against."""
+        for path in attempted:
+            signature = diagnostics_signature(error_files[path])
+            key = file_key(path)
+            previous = self._attempts.get(key)
+            count = previous[1] + 1 if previous and previous[0] == signature else 1
+            self._attempts[key] = (signature, count)
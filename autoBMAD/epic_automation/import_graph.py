@@ -0,0 +1,135 @@
+"""Module for resolving the local imports of Python files.
+
+Imports are read with ``ast`` (nothing is executed) and resolved to files on
+disk: relative imports against the importing file's package, absolute imports
+against a list of import roots. Imports that do not resolve to a local file
+(stdlib, third-party packages) are ignored.
+"""
+
+import ast
+import os
+from collections.abc import Iterable, Iterator, Sequence
+
+from autoBMAD.epic_automation.workspace_snapshot import DEFAULT_EXCLUDED_DIRS
+
+
+def file_key(path: str) -> str:
+    """Normalized absolute path used to compare files."""
+    return os.path.normcase(os.path.abspath(path))
+
+
+def search_roots(roots: Iterable[str]) -> list[str]:
+    """Absolute import roots, followed by the current directory."""
+    return list(dict.fromkeys(os.path.abspath(r) for r in (*roots, os.getcwd())))
+
+
+def _module_candidates(root: str, dotted: str) -> list[str]:
+    base = os.path.join(root, *dotted.split("."))
+    return [base + ".py", os.path.join(base, "__init__.py")]
+
+
+def local_imports(path: str, roots: Sequence[str]) -> set[str]:
+    """Normalized paths of the local modules a file imports.
+
+    Files that cannot be read or parsed import nothing.
+
+    Args:
+        path: Python file.
+        roots: Absolute import roots (see ``search_roots``).
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=path)
+    except (OSError, SyntaxError, ValueError):
+        return set()
+
+    candidates: list[str] = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                for root in roots:
+                    candidates.extend(_module_candidates(root, alias.name))
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                base = os.path.dirname(os.path.abspath(path))
+                for _ in range(node.level - 1):
+                    base = os.path.dirname(base)
+                bases = [base]
+            else:
+                bases = list(roots)
+            module = node.module or ""
+            for base in bases:
+                names = [module] if module else []
+                names.extend(
+                    f"{module}.{alias.name}" if module else alias.name
+                    for alias in node.names
+                    if alias.name != "*"
+                )
+                for name in names:
+                    candidates.extend(_module_candidates(base, name))
+                if not module:
+                    candidates.append(os.path.join(base, "__init__.py"))
+
+    own = file_key(path)
+    return {
+        key for key in (file_key(c) for c in candidates)
+        if key != own and os.path.isfile(key)
+    }
+
+
+def _python_files(source_dir: str) -> Iterator[str]:
+    for dirpath, dirnames, filenames in os.walk(source_dir):
+        dirnames[:] = [d for d in dirnames if d not in DEFAULT_EXCLUDED_DIRS]
+        for name in filenames:
+            if name.endswith(".py"):
+                yield os.path.join(dirpath, name)
+
+
+def find_importers(
+    targets: Iterable[str],
+    source_dir: str,
+    roots: Iterable[str] = (),
+) -> list[str]:
+    """Python files under ``source_dir`` that import any of ``targets``.
+
+    Args:
+        targets: Imported files.
+        source_dir: Directory searched for importers.
+        roots: Import roots for absolute imports.
+
+    Returns:
+        Sorted paths of the importers (targets themselves excluded).
+    """
+    target_keys = {file_key(t) for t in targets}
+    resolved_roots = search_roots(roots)
+    importers: list[str] = []
+    for path in _python_files(source_dir):
+        if file_key(path) in target_keys:
+            continue
+        if local_imports(path, resolved_roots) & target_keys:
+            importers.append(os.path.abspath(path))
+    return sorted(importers)
+
+
+def count_importers(
+    targets: Iterable[str],
+    source_dir: str,
+    roots: Iterable[str] = (),
+) -> dict[str, int]:
+    """Number of Python files under ``source_dir`` importing each target.
+
+    Args:
+        targets: Imported files.
+        source_dir: Directory searched for importers.
+        roots: Import roots for absolute imports.
+
+    Returns:
+        Mapping of normalized target path (see ``file_key``) to importer count.
+    """
+    counts = dict.fromkeys((file_key(t) for t in targets), 0)
+    resolved_roots = search_roots(roots)
+    for path in _python_files(source_dir):
+        for target in local_imports(path, resolved_roots):
+            if target in counts:
+                counts[target] += 1
+    return counts
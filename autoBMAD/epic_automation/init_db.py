@@ -13,6 +13,15 @@ Options:
     --force           Force recreation of existing database
     --verify          Verify existing database structure
     --verbose, -v     Enable verbose output
+
+Maintenance options (run against an existing database):
+    --backup [PATH]       Online backup via the sqlite3 backup API
+    --keep-backups N      Keep only the newest N timestamped backups
+    --retention-days N    Delete finished stories not updated for N days
+    --keep-per-epic N     Keep at most N finished stories per epic
+    --compact             Run incremental_vacuum and wal_checkpoint(TRUNCATE)
+    --scheduled           Only run retention/compaction when due
+    --interval-hours H    Minimum hours between scheduled runs (default: 24)
 """
 
 import argparse
@@ -20,6 +29,15 @@ import sqlite3
 import sys
 from pathlib import Path
 
+try:
+    from autoBMAD.epic_automation.db_maintenance import (
+        DatabaseMaintenance,
+        RetentionPolicy,
+    )
+except ImportError:
+    # Running as a standalone script from this directory
+    from db_maintenance import DatabaseMaintenance, RetentionPolicy  # type: ignore
+
 
 def create_tables(conn: sqlite3.Connection) -> None:
     """
@@ -30,6 +48,9 @@ def create_tables(conn: sqlite3.Connection) -> None:
     """
     cursor = conn.cursor()
 
+    # Enable incremental auto-vacuum (only takes effect on a new database)
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+
     # Create stories table
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS stories (
@@ -65,6 +86,80 @@ def create_tables(conn: sqlite3.Connection) -> None:
     except sqlite3.OperationalError:
         cursor.execute("ALTER TABLE stories ADD COLUMN version INTEGER DEFAULT 1")
 
+    # Create side table for compressed (zlib JSON) QA result payloads
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS story_qa_results (
+            story_path TEXT PRIMARY KEY,
+            payload BLOB NOT NULL,
+            raw_size INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Drop QA payloads together with their story records
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_stories_delete_qa_result
+        AFTER DELETE ON stories
+        BEGIN
+            DELETE FROM story_qa_results WHERE story_path = OLD.story_path;
+        END
+    """)
+
+    # Create story lease table (multi-process story claiming)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS story_leases (
+            story_path TEXT PRIMARY KEY,
+            epic_path TEXT NOT NULL,
+            owner_id TEXT NOT NULL,
+            acquired_at REAL NOT NULL,
+            heartbeat_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    """)
+
+    # Create story completion table (completed stories are not claimed again)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS story_completions (
+            story_path TEXT PRIMARY KEY,
+            epic_path TEXT NOT NULL,
+            owner_id TEXT NOT NULL,
+            story_digest TEXT,
+            completed_at REAL NOT NULL
+        )
+    """)
+
+    # Create epic section hash table (incremental mode)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS epic_section_hashes (
+            epic_path TEXT NOT NULL,
+            story_number TEXT NOT NULL,
+            section_hash TEXT NOT NULL,
+            story_path TEXT,
+            recorded_at REAL NOT NULL,
+            PRIMARY KEY (epic_path, story_number)
+        )
+    """)
+
+    # Create quality gate fingerprint cache tables
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS quality_gate_cache (
+            gate TEXT NOT NULL,
+            scope TEXT NOT NULL,
+            fingerprint TEXT NOT NULL,
+            recorded_at REAL NOT NULL,
+            PRIMARY KEY (gate, scope)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS file_fingerprints (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            sha256 TEXT NOT NULL
+        )
+    """)
+
     conn.commit()
     print("[OK] All tables created successfully")
 
@@ -233,6 +328,91 @@ def initialize_database(
         return 1
 
 
+def run_maintenance(
+    db_path: str,
+    backup: str | None = None,
+    keep_backups: int | None = None,
+    retention_days: int | None = None,
+    keep_per_epic: int | None = None,
+    compact: bool = False,
+    scheduled: bool = False,
+    interval_hours: float = 24.0,
+    verbose: bool = False,
+) -> int:
+    """
+    Run maintenance tasks against an existing database.
+
+    Args:
+        db_path: Path to database file
+        backup: Backup destination ("" for a timestamped file), None to skip
+        keep_backups: Keep only the newest N timestamped backups
+        retention_days: Delete finished stories older than N days
+        keep_per_epic: Keep at most N finished stories per epic
+        compact: Run incremental vacuum and WAL checkpoint
+        scheduled: Only run retention/compaction when their interval elapsed
+        interval_hours: Minimum hours between scheduled runs
+        verbose: Enable verbose output
+
+    Returns:
+        Exit code (0 for success, 1 for failure)
+    """
+    db_path_obj = Path(db_path).resolve()
+    if not db_path_obj.exists():
+        print(f"[ERROR] Database does not exist: {db_path_obj}")
+        return 1
+
+    maintenance = DatabaseMaintenance(db_path_obj)
+    retention = None
+    if retention_days is not None or keep_per_epic is not None:
+        retention = RetentionPolicy(
+            max_age_days=retention_days, keep_per_epic=keep_per_epic
+        )
+
+    try:
+        if backup is not None:
+            target = maintenance.backup(backup or None, keep_backups)
+            print(f"[OK] Backup created: {target}")
+        elif keep_backups is not None:
+            removed = maintenance.prune_backups(keep_backups)
+            print(f"[OK] Pruned {len(removed)} old backup(s)")
+
+        if scheduled:
+            results = maintenance.run_scheduled(interval_hours, retention)
+            for task, result in results.items():
+                if result.get("skipped"):
+                    print(f"[OK] {task}: not due, skipped")
+                else:
+                    print(f"[OK] {task}: {result}")
+            return 0
+
+        if retention is not None:
+            stats = maintenance.apply_retention(retention)
+            print(
+                f"[OK] Retention removed {stats['total']} record(s) "
+                f"(age: {stats['by_age']}, per-epic: {stats['per_epic']})"
+            )
+
+        if compact:
+            stats = maintenance.compact()
+            print(
+                f"[OK] Compaction released {stats['pages_released']} page(s), "
+                f"{stats['page_count']} page(s) in use"
+            )
+            if verbose:
+                for key, value in stats.items():
+                    print(f"    - {key}: {value}")
+
+        return 0
+
+    except Exception as e:
+        print(f"[ERROR] Database maintenance failed: {e}")
+        if verbose:
+            import traceback
+
+            traceback.print_exc()
+        return 1
+
+
 def main():
     """Main entry point."""
     parser = argparse.ArgumentParser(
@@ -257,6 +437,18 @@ Examples:
 
   # Create with verbose output
   python init_db.py --verbose
+
+  # Online backup, keeping the 7 newest backups
+  python init_db.py --backup --keep-backups 7
+
+  # Retention: drop finished stories older than 30 days, max 50 per epic
+  python init_db.py --retention-days 30 --keep-per-epic 50
+
+  # Reclaim space and truncate the WAL file
+  python init_db.py --compact
+
+  # Nightly job: retention + compaction, only when due
+  python init_db.py --scheduled --retention-days 30 --interval-hours 24
         """,
     )
 
@@ -281,8 +473,75 @@ Examples:
         "--verbose", "-v", action="store_true", help="Enable verbose output"
     )
 
+    maintenance_group = parser.add_argument_group("maintenance")
+    maintenance_group.add_argument(
+        "--backup",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="PATH",
+        help="Create an online backup (default: timestamped file next to the database)",
+    )
+    maintenance_group.add_argument(
+        "--keep-backups",
+        type=int,
+        metavar="N",
+        help="Keep only the newest N timestamped backups",
+    )
+    maintenance_group.add_argument(
+        "--retention-days",
+        type=int,
+        metavar="N",
+        help="Delete finished stories not updated for N days",
+    )
+    maintenance_group.add_argument(
+        "--keep-per-epic",
+        type=int,
+        metavar="N",
+        help="Keep at most N finished stories per epic",
+    )
+    maintenance_group.add_argument(
+        "--compact",
+        action="store_true",
+        help="Run incremental_vacuum and wal_checkpoint(TRUNCATE)",
+    )
+    maintenance_group.add_argument(
+        "--scheduled",
+        action="store_true",
+        help="Only run retention/compaction when their interval has elapsed",
+    )
+    maintenance_group.add_argument(
+        "--interval-hours",
+        type=float,
+        default=24.0,
+        metavar="H",
+        help="Minimum hours between scheduled runs (default: 24)",
+    )
+
     args = parser.parse_args()
 
+    if (
+        args.backup is not None
+        or args.keep_backups is not None
+        or args.retention_days is not None
+        or args.keep_per_epic is not None
+        or args.compact
+        or args.scheduled
+    ):
+        sys.exit(
+            run_maintenance(
+                db_path=args.db_path,
+                backup=args.backup,
+                keep_backups=args.keep_backups,
+                retention_days=args.retention_days,
+                keep_per_epic=args.keep_per_epic,
+                compact=args.compact,
+                scheduled=args.scheduled,
+                interval_hours=args.interval_hours,
+                verbose=args.verbose,
+            )
+        )
+
     # Initialize database
     exit_code = initialize_database(
         db_path=args.db_path,
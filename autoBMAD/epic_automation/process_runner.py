@@ -0,0 +1,319 @@
+"""Module for running tool commands (ruff, basedpyright, pytest) as subprocesses.
+
+Commands are started with ``asyncio.create_subprocess_exec`` (no shell) in
+their own process group, so a timeout kills the whole process tree rather
+than leaving grandchildren (node for basedpyright, pytest-xdist workers)
+running. Captured output is capped; stdout can instead be streamed line by
+line to a callback, e.g. to parse JSON-lines output as it arrives.
+
+On POSIX the command runs under a small launcher that waits for it with
+``wait4`` and reports the peak RSS and CPU time of the command and all of its
+descendants; asyncio reaps the direct child itself, so the runner cannot get
+that information otherwise. On Windows resource usage is not recorded.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+# Captured bytes kept per stream; the rest is dropped (and reported)
+DEFAULT_MAX_OUTPUT_BYTES = 16 * 1024 * 1024
+
+# Longest stdout line passed to a line callback
+MAX_LINE_BYTES = 4 * 1024 * 1024
+
+# Seconds to wait for pipes to close after the process tree was killed
+_DRAIN_TIMEOUT = 5.0
+
+_CHUNK_SIZE = 64 * 1024
+
+# POSIX launcher: argv = [fd, command...]. Spawns the command (inheriting
+# stdio), waits for it and writes the rusage of it and its descendants to fd.
+_LAUNCHER = r"""
+import json, os, resource, signal, sys
+fd = int(sys.argv[1])
+os.set_inheritable(fd, False)
+try:
+    pid = os.posix_spawnp(sys.argv[2], sys.argv[2:], os.environ)
+except OSError as e:
+    sys.stderr.write(f"{sys.argv[2]}: {e}\n")
+    sys.exit(127)
+for sig in (signal.SIGINT, signal.SIGTERM):
+    signal.signal(sig, lambda s, f, pid=pid: os.kill(pid, s))
+while True:
+    try:
+        _, status, _ = os.wait4(pid, 0)
+        break
+    except InterruptedError:
+        continue
+usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+scale = 1 if sys.platform == "darwin" else 1024
+os.write(fd, json.dumps({
+    "cpu_seconds": usage.ru_utime + usage.ru_stime,
+    "peak_rss_bytes": usage.ru_maxrss * scale,
+}).encode())
+os.close(fd)
+if os.WIFSIGNALED(status):
+    signal.signal(os.WTERMSIG(status), signal.SIG_DFL)
+    os.kill(os.getpid(), os.WTERMSIG(status))
+sys.exit(os.waitstatus_to_exitcode(status))
+"""
+
+# Line callback: one decoded stdout line (without the newline)
+LineCallback = Callable[[str], None]
+
+
+@dataclass
+class CommandResult:
+    """Outcome of one command.
+
+    Attributes:
+        args: Command and arguments.
+        returncode: Exit code (negative signal number on POSIX; -1 when the
+            command could not be started or timed out).
+        stdout: Captured stdout (empty when streamed to a callback).
+        stderr: Captured stderr.
+        duration: Wall-clock seconds.
+        timed_out: The process tree was killed on timeout.
+        truncated: Some output exceeded the capture limit and was dropped.
+        cpu_seconds: User + system CPU time of the command and its descendants.
+        peak_rss_bytes: Largest resident set size of any process in the tree.
+        error: Why the command could not be run, if it could not.
+    """
+
+    args: list[str]
+    returncode: int
+    stdout: str = ""
+    stderr: str = ""
+    duration: float = 0.0
+    timed_out: bool = False
+    truncated: bool = False
+    cpu_seconds: float | None = None
+    peak_rss_bytes: int | None = None
+    error: str | None = None
+
+    @property
+    def success(self) -> bool:
+        return self.error is None and not self.timed_out and self.returncode == 0
+
+    def describe(self) -> str:
+        """One-line summary for logs."""
+        parts = [f"rc={self.returncode}", f"{self.duration:.2f}s wall"]
+        if self.cpu_seconds is not None:
+            parts.append(f"{self.cpu_seconds:.2f}s cpu")
+        if self.peak_rss_bytes is not None:
+            parts.append(f"peak RSS {self.peak_rss_bytes / (1024 * 1024):.1f} MB")
+        if self.timed_out:
+            parts.append("timed out")
+        if self.truncated:
+            parts.append("output truncated")
+        return f"{os.path.basename(self.args[0])}: " + ", ".join(parts)
+
+
+def json_lines(callback: Callable[[object], None]) -> LineCallback:
+    """Line callback that decodes each non-empty line as JSON.
+
+    Lines that are not valid JSON (progress messages, warnings) are skipped.
+    """
+    def on_line(line: str) -> None:
+        line = line.strip()
+        if not line:
+            return
+        try:
+            callback(json.loads(line))
+        except json.JSONDecodeError:
+            logger.debug(f"Skipping non-JSON output line: {line[:200]}")
+
+    return on_line
+
+
+class _Capture:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.data = bytearray()
+        self.truncated = False
+
+    def add(self, chunk: bytes) -> None:
+        room = self.limit - len(self.data)
+        if len(chunk) > room:
+            self.truncated = True
+            chunk = chunk[:max(room, 0)]
+        self.data.extend(chunk)
+
+    def text(self) -> str:
+        return self.data.decode("utf-8", errors="replace")
+
+
+async def _read_stream(stream: asyncio.StreamReader, capture: _Capture) -> None:
+    while chunk := await stream.read(_CHUNK_SIZE):
+        capture.add(chunk)
+
+
+async def _read_lines(
+    stream: asyncio.StreamReader,
+    on_line: LineCallback,
+    overflow: _Capture,
+) -> None:
+    while True:
+        try:
+            line = await stream.readline()
+        except ValueError:
+            # Line longer than the stream limit; its data was discarded
+            overflow.truncated = True
+            continue
+        if not line:
+            return
+        on_line(line.decode("utf-8", errors="replace").rstrip("\r\n"))
+
+
+def _kill_tree(process: asyncio.subprocess.Process) -> None:
+    if process.returncode is not None:
+        return
+    try:
+        if sys.platform == "win32":
+            subprocess.run(
+                ["taskkill", "/F", "/T", "/PID", str(process.pid)],
+                capture_output=True,
+                check=False,
+            )
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.debug(f"Process tree kill failed for {process.pid}: {e}")
+    try:
+        process.kill()
+    except ProcessLookupError:
+        pass
+
+
+async def run_command(
+    args: Sequence[str],
+    timeout: float,
+    cwd: str | None = None,
+    on_stdout_line: LineCallback | None = None,
+    max_output_bytes: int = DEFAULT_MAX_OUTPUT_BYTES,
+) -> CommandResult:
+    """Run a command without a shell and wait for it.
+
+    Args:
+        args: Command and arguments; the command is looked up on PATH.
+        timeout: Seconds before the process tree is killed.
+        cwd: Working directory.
+        on_stdout_line: Receive stdout line by line instead of capturing it.
+        max_output_bytes: Capture limit per stream.
+
+    Returns:
+        The command result; never raises for command failures.
+    """
+    args = [str(a) for a in args]
+    started = time.monotonic()
+
+    executable = shutil.which(args[0])
+    if executable is None:
+        error = f"Command not found: {args[0]}"
+        logger.error(error)
+        return CommandResult(args=args, returncode=-1, stderr=error, error=error)
+
+    usage_read = usage_write = None
+    if sys.platform == "win32":
+        exec_args = [executable, *args[1:]]
+        platform_kwargs: dict[str, object] = {
+            "creationflags": subprocess.CREATE_NEW_PROCESS_GROUP,
+        }
+    else:
+        usage_read, usage_write = os.pipe()
+        exec_args = [sys.executable, "-c", _LAUNCHER, str(usage_write), executable, *args[1:]]
+        platform_kwargs = {"start_new_session": True, "pass_fds": (usage_write,)}
+
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *exec_args,
+            cwd=cwd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=MAX_LINE_BYTES,
+            **platform_kwargs,  # type: ignore[arg-type]
+        )
+    except OSError as e:
+        # usage_write is closed in finally
+        if usage_read is not None:
+            os.close(usage_read)
+        logger.error(f"Failed to start {args[0]}: {e}")
+        return CommandResult(args=args, returncode=-1, stderr=str(e), error=str(e))
+    finally:
+        if usage_write is not None:
+            os.close(usage_write)
+
+    assert process.stdout is not None and process.stderr is not None
+    stdout = _Capture(max_output_bytes)
+    stderr = _Capture(max_output_bytes)
+    if on_stdout_line is not None:
+        stdout_reader = _read_lines(process.stdout, on_stdout_line, stdout)
+    else:
+        stdout_reader = _read_stream(process.stdout, stdout)
+    readers = asyncio.gather(stdout_reader, _read_stream(process.stderr, stderr))
+
+    timed_out = False
+    try:
+        await asyncio.wait_for(process.wait(), timeout)
+    except TimeoutError:
+        timed_out = True
+        _kill_tree(process)
+        await process.wait()
+    except asyncio.CancelledError:
+        _kill_tree(process)
+        readers.cancel()
+        # Retrieve the readers' cancellation so it is not logged as unhandled
+        readers.add_done_callback(lambda f: f.cancelled() or f.exception())
+        if usage_read is not None:
+            os.close(usage_read)
+        raise
+    finally:
+        if timed_out or process.returncode is None:
+            _kill_tree(process)
+
+    try:
+        # Descendants outside the process group could keep the pipes open
+        await asyncio.wait_for(readers, _DRAIN_TIMEOUT if timed_out else None)
+    except TimeoutError:
+        stdout.truncated = True
+
+    cpu_seconds = peak_rss = None
+    if usage_read is not None:
+        try:
+            data = os.read(usage_read, 4096)
+            if data:
+                usage = json.loads(data)
+                cpu_seconds = float(usage["cpu_seconds"])
+                peak_rss = int(usage["peak_rss_bytes"])
+        except (OSError, ValueError, KeyError):
+            pass
+        finally:
+            os.close(usage_read)
+
+    returncode = process.returncode if process.returncode is not None else -1
+    result = CommandResult(
+        args=args,
+        returncode=-1 if timed_out else returncode,
+        stdout=stdout.text(),
+        stderr=stderr.text(),
+        duration=time.monotonic() - started,
+        timed_out=timed_out,
+        truncated=stdout.truncated or stderr.truncated,
+        cpu_seconds=cpu_seconds,
+        peak_rss_bytes=peak_rss,
+        error=f"Timeout after {timeout} seconds" if timed_out else None,
+    )
+    logger.info(f"Command finished: {result.describe()}")
+    return result
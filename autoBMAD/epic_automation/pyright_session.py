@@ -0,0 +1,404 @@
+"""Module for a long-running basedpyright language server per source root.
+
+The first check of a quality gate still runs ``basedpyright --outputjson``
+over the whole source directory. Regression checks after an SDK fix only need
+diagnostics for the touched files, so they go to a warm
+``basedpyright-langserver --stdio`` session that keeps the analysed program in
+memory and only re-checks what changed.
+
+Files changed on disk since the previous check are reported to the server
+(``didChange`` for open files, ``didChangeWatchedFiles`` for the rest), so the
+session never checks against stale content.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import weakref
+from pathlib import Path
+from typing import Any
+
+from autoBMAD.epic_automation.workspace_snapshot import WorkspaceSnapshot
+
+logger = logging.getLogger(__name__)
+
+LANGSERVER_COMMAND = "basedpyright-langserver"
+
+# Seconds to wait for the server to start or to return diagnostics
+DEFAULT_REQUEST_TIMEOUT = 300.0
+
+# LSP DiagnosticSeverity -> basedpyright CLI severity
+_SEVERITY = {1: "error", 2: "warning", 3: "information", 4: "hint"}
+
+# LSP FileChangeType
+_CREATED, _CHANGED, _DELETED = 1, 2, 3
+
+
+class PyrightSessionError(Exception):
+    """The language server failed or did not answer in time."""
+
+
+class _MethodNotFound(PyrightSessionError):
+    """The server does not implement a request (e.g. pull diagnostics)."""
+
+
+def _uri(path: str) -> str:
+    return Path(path).resolve().as_uri()
+
+
+class PyrightSession:
+    """One ``basedpyright-langserver`` process serving one source root.
+
+    The server runs in the project root (like the CLI, so it finds the same
+    pyproject/pyrightconfig); only the source root is watched for changes.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        project_root: str | None = None,
+        request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+    ):
+        self.root = os.path.abspath(root)
+        self.project_root = os.path.abspath(project_root or os.getcwd())
+        self.request_timeout = request_timeout
+        self._process: asyncio.subprocess.Process | None = None
+        self._reader_task: asyncio.Task[None] | None = None
+        self._next_id = 0
+        self._pending: dict[int, asyncio.Future[Any]] = {}
+        self._versions: dict[str, int] = {}
+        self._pushed: dict[str, tuple[int | None, list[dict[str, Any]]]] = {}
+        self._pushed_event = asyncio.Event()
+        self._pull_supported = True
+        self._snapshot: WorkspaceSnapshot | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.returncode is None
+
+    async def start(self) -> None:
+        """Start the server and run the LSP initialize handshake."""
+        executable = shutil.which(LANGSERVER_COMMAND)
+        if executable is None:
+            raise PyrightSessionError(f"{LANGSERVER_COMMAND} not found on PATH")
+
+        self._process = await asyncio.create_subprocess_exec(
+            executable, "--stdio",
+            cwd=self.project_root,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        self._reader_task = asyncio.create_task(self._read_messages())
+
+        root_uri = _uri(self.project_root)
+        await self._request("initialize", {
+            "processId": os.getpid(),
+            "rootUri": root_uri,
+            "workspaceFolders": [{"uri": root_uri, "name": os.path.basename(self.project_root)}],
+            "capabilities": {
+                "textDocument": {
+                    "synchronization": {"didSave": False},
+                    "publishDiagnostics": {"versionSupport": True},
+                    "diagnostic": {"dynamicRegistration": False},
+                },
+                "workspace": {
+                    "configuration": True,
+                    "workspaceFolders": True,
+                    "didChangeWatchedFiles": {"dynamicRegistration": False},
+                },
+            },
+        })
+        await self._notify("initialized", {})
+        self._snapshot = await asyncio.to_thread(WorkspaceSnapshot.take, [self.root])
+        logger.info(f"basedpyright language server started for {self.root}")
+
+    async def close(self) -> None:
+        """Shut the server down (killed if it does not exit promptly)."""
+        process = self._process
+        if process is None:
+            return
+        self._process = None
+        try:
+            if process.returncode is None:
+                await asyncio.wait_for(self._request("shutdown", None, process), 5)
+                await self._notify("exit", None, process)
+                await asyncio.wait_for(process.wait(), 5)
+        except (TimeoutError, PyrightSessionError, OSError):
+            pass
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            if self._reader_task is not None:
+                self._reader_task.cancel()
+            self._fail_pending(PyrightSessionError("language server closed"))
+
+    async def check(self, files: list[str]) -> list[dict[str, Any]]:
+        """Diagnostics for the given files, in basedpyright ``--outputjson`` shape.
+
+        Args:
+            files: Files to check (other files are still analysed as imports).
+
+        Returns:
+            ``generalDiagnostics``-style entries (file, severity, message,
+            range, rule).
+        """
+        async with self._lock:
+            if not self.alive:
+                raise PyrightSessionError("language server is not running")
+            await self._sync_workspace()
+
+            issues: list[dict[str, Any]] = []
+            for path in dict.fromkeys(os.path.abspath(f) for f in files):
+                if not path.endswith((".py", ".pyi")) or not os.path.isfile(path):
+                    continue
+                version = await self._sync_document(path)
+                diagnostics = await self._diagnostics(path, version)
+                issues.extend(self._to_issue(path, d) for d in diagnostics)
+            return issues
+
+    async def _sync_workspace(self) -> None:
+        """Report files changed on disk since the previous check."""
+        snapshot = await asyncio.to_thread(WorkspaceSnapshot.take, [self.root])
+        previous = self._snapshot or snapshot
+        changes = []
+        for path in previous.changed_files(snapshot):
+            if path in self._versions:
+                if path in snapshot.files:
+                    await self._sync_document(path)
+                else:
+                    del self._versions[path]
+                    await self._notify("textDocument/didClose", {"textDocument": {"uri": _uri(path)}})
+                continue
+            if path not in snapshot.files:
+                change_type = _DELETED
+            elif path not in previous.files:
+                change_type = _CREATED
+            else:
+                change_type = _CHANGED
+            changes.append({"uri": _uri(path), "type": change_type})
+        if changes:
+            await self._notify("workspace/didChangeWatchedFiles", {"changes": changes})
+        self._snapshot = snapshot
+
+    async def _sync_document(self, path: str) -> int:
+        """Send the file's current content; returns the document version."""
+        with open(path, encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        uri = _uri(path)
+        version = self._versions.get(path, 0) + 1
+        self._versions[path] = version
+        if version == 1:
+            await self._notify("textDocument/didOpen", {
+                "textDocument": {"uri": uri, "languageId": "python", "version": version, "text": text},
+            })
+        else:
+            await self._notify("textDocument/didChange", {
+                "textDocument": {"uri": uri, "version": version},
+                "contentChanges": [{"text": text}],
+            })
+        return version
+
+    async def _diagnostics(self, path: str, version: int) -> list[dict[str, Any]]:
+        uri = _uri(path)
+        if self._pull_supported:
+            try:
+                report = await self._request(
+                    "textDocument/diagnostic", {"textDocument": {"uri": uri}}
+                )
+                return list((report or {}).get("items", []))
+            except _MethodNotFound:
+                self._pull_supported = False
+
+        # Push fallback: wait for diagnostics published for this version
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.request_timeout
+        while True:
+            pushed_version, diagnostics = self._pushed.get(uri, (None, []))
+            if pushed_version is not None and pushed_version >= version:
+                return diagnostics
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise PyrightSessionError(f"no diagnostics published for {path}")
+            self._pushed_event.clear()
+            try:
+                await asyncio.wait_for(self._pushed_event.wait(), remaining)
+            except TimeoutError:
+                pass
+
+    @staticmethod
+    def _to_issue(path: str, diagnostic: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "file": path,
+            "severity": _SEVERITY.get(diagnostic.get("severity", 1), "error"),
+            "message": diagnostic.get("message", ""),
+            "range": diagnostic.get("range", {}),
+            "rule": diagnostic.get("code"),
+        }
+
+    # --- JSON-RPC transport ---
+
+    async def _send(self, message: dict[str, Any], process: asyncio.subprocess.Process | None = None) -> None:
+        process = process or self._process
+        if process is None or process.stdin is None:
+            raise PyrightSessionError("language server is not running")
+        body = json.dumps({"jsonrpc": "2.0", **message}).encode("utf-8")
+        try:
+            process.stdin.write(f"Content-Length: {len(body)}\r\n\r\n".encode("ascii") + body)
+            await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError) as e:
+            raise PyrightSessionError(f"language server pipe closed: {e}") from e
+
+    async def _notify(self, method: str, params: Any, process: asyncio.subprocess.Process | None = None) -> None:
+        await self._send({"method": method, "params": params}, process)
+
+    async def _request(self, method: str, params: Any, process: asyncio.subprocess.Process | None = None) -> Any:
+        self._next_id += 1
+        request_id = self._next_id
+        future: asyncio.Future[Any] = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            await self._send({"id": request_id, "method": method, "params": params}, process)
+            return await asyncio.wait_for(future, self.request_timeout)
+        except TimeoutError as e:
+            raise PyrightSessionError(f"{method} timed out after {self.request_timeout}s") from e
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _read_messages(self) -> None:
+        # Keep the process: close() clears self._process before the shutdown
+        # handshake, and server requests during it still need replies
+        process = self._process
+        assert process is not None and process.stdout is not None
+        stdout = process.stdout
+        try:
+            while True:
+                length = None
+                while True:
+                    line = await stdout.readline()
+                    if not line:
+                        raise EOFError
+                    line = line.strip()
+                    if not line:
+                        break
+                    name, _, value = line.decode("ascii").partition(":")
+                    if name.lower() == "content-length":
+                        length = int(value)
+                if length is None:
+                    continue
+                message = json.loads(await stdout.readexactly(length))
+                await self._dispatch(message, process)
+        except (EOFError, asyncio.IncompleteReadError, ConnectionResetError):
+            self._fail_pending(PyrightSessionError("language server exited"))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"basedpyright language server reader failed: {e}", exc_info=True)
+            self._fail_pending(PyrightSessionError(str(e)))
+
+    async def _dispatch(
+        self, message: dict[str, Any], process: asyncio.subprocess.Process | None = None
+    ) -> None:
+        method = message.get("method")
+        if method is None:
+            future = self._pending.get(message.get("id", -1))
+            if future is None or future.done():
+                return
+            error = message.get("error")
+            if error is None:
+                future.set_result(message.get("result"))
+            elif error.get("code") == -32601:
+                future.set_exception(_MethodNotFound(error.get("message", "")))
+            else:
+                future.set_exception(PyrightSessionError(error.get("message", str(error))))
+            return
+
+        if method == "textDocument/publishDiagnostics":
+            params = message.get("params", {})
+            self._pushed[params.get("uri", "")] = (
+                params.get("version"), params.get("diagnostics", [])
+            )
+            self._pushed_event.set()
+        elif "id" in message:
+            # Server -> client request; configuration gets defaults, the rest null
+            result: Any = None
+            if method == "workspace/configuration":
+                items = (message.get("params") or {}).get("items", [])
+                result = [None] * len(items)
+            await self._send({"id": message["id"], "result": result}, process)
+
+    def _fail_pending(self, error: Exception) -> None:
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+
+
+class PyrightSessionRegistry:
+    """Warm sessions per (event loop, source root).
+
+    Concurrent first uses of a root share one start: a per-root lock is held
+    while the server starts, so only one language server runs per root.
+    """
+
+    def __init__(self) -> None:
+        self._sessions: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, dict[str, PyrightSession]
+        ] = weakref.WeakKeyDictionary()
+        self._start_locks: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, dict[str, asyncio.Lock]
+        ] = weakref.WeakKeyDictionary()
+
+    async def get(self, root: str) -> PyrightSession | None:
+        """The running session for a root, started on first use.
+
+        Returns:
+            The session, or None if the language server cannot be started.
+        """
+        loop = asyncio.get_running_loop()
+        sessions = self._sessions.setdefault(loop, {})
+        key = os.path.normcase(os.path.abspath(root))
+        session = sessions.get(key)
+        if session is not None and session.alive:
+            return session
+
+        start_lock = self._start_locks.setdefault(loop, {}).setdefault(key, asyncio.Lock())
+        async with start_lock:
+            # Another caller may have started the session while we waited
+            session = sessions.get(key)
+            if session is not None and session.alive:
+                return session
+            if session is not None:
+                await session.close()
+
+            session = PyrightSession(root)
+            try:
+                await session.start()
+            except (PyrightSessionError, OSError) as e:
+                logger.warning(f"basedpyright warm session unavailable for {root}: {e}")
+                await session.close()
+                sessions.pop(key, None)
+                return None
+            sessions[key] = session
+            return session
+
+    async def discard(self, root: str) -> None:
+        """Close and forget the session for a root (e.g. after it failed)."""
+        sessions = self._sessions.get(asyncio.get_running_loop(), {})
+        session = sessions.pop(os.path.normcase(os.path.abspath(root)), None)
+        if session is not None:
+            await session.close()
+
+    async def close_all(self) -> None:
+        """Close every session of the running event loop."""
+        sessions = self._sessions.pop(asyncio.get_running_loop(), {})
+        for session in sessions.values():
+            await session.close()
+
+
+# Process-wide registry used by BasedPyrightAgent
+pyright_sessions = PyrightSessionRegistry()
@@ -0,0 +1,174 @@
+"""Module for skipping quality gates whose inputs have not changed.
+
+A gate's fingerprint covers everything its outcome depends on: the files under
+its input directories, the tool configuration files that apply to them and the
+version of the tool. When a gate passes cleanly the fingerprint is stored in
+progress.db; the next run skips the gate if the fingerprint is unchanged.
+
+Fingerprints hash file contents, but a file is only read when its
+(size, mtime_ns) differs from the last time it was hashed, so a fingerprint of
+an unchanged tree costs one ``stat`` per file. Files modified within the last
+few seconds are hashed again next time, since a later write within the same
+mtime tick would not change their stat signature.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections.abc import Sequence
+from typing import Any
+
+from autoBMAD.epic_automation.import_graph import file_key
+from autoBMAD.epic_automation.process_runner import run_command
+from autoBMAD.epic_automation.workspace_snapshot import WorkspaceSnapshot, file_digest
+
+logger = logging.getLogger(__name__)
+
+# Files whose content changes how ruff, basedpyright or pytest behave
+CONFIG_FILE_NAMES = (
+    "pyproject.toml", "ruff.toml", ".ruff.toml", "pyrightconfig.json",
+    "setup.cfg", "pytest.ini", "tox.ini",
+)
+
+# Tools whose version is part of each gate's fingerprint
+GATE_TOOLS: dict[str, tuple[str, ...]] = {
+    "ruff": ("ruff",),
+    "basedpyright": ("basedpyright",),
+    "ruff_format": ("ruff",),
+    "pytest": ("pytest",),
+}
+
+# Stat signatures this recent are not trusted to identify the content
+_RACY_WINDOW_NS = 2_000_000_000
+
+# Tool versions, looked up once per process
+_tool_versions: dict[str, str] = {}
+
+
+async def tool_version(tool: str) -> str:
+    """``<tool> --version`` output, or a marker if the tool cannot be run."""
+    if tool not in _tool_versions:
+        result = await run_command([tool, "--version"], timeout=60)
+        if result.success:
+            _tool_versions[tool] = (result.stdout or result.stderr).strip()
+        else:
+            # Not cached: the gate itself fails, and the next lookup may succeed
+            return f"unavailable: {result.error or result.returncode}"
+    return _tool_versions[tool]
+
+
+def _config_files(dirs: Sequence[str]) -> list[str]:
+    """Config files in the given directories and all of their ancestors."""
+    found: list[str] = []
+    for start in dirs:
+        current = os.path.abspath(start)
+        while True:
+            for name in CONFIG_FILE_NAMES:
+                path = os.path.join(current, name)
+                if os.path.isfile(path):
+                    found.append(path)
+            parent = os.path.dirname(current)
+            if parent == current:
+                break
+            current = parent
+    return sorted(set(found))
+
+
+class QualityGateCache:
+    """Fingerprints of the quality-gate inputs, checked against progress.db.
+
+    Args:
+        state_manager: StateManager holding the cache tables.
+        source_dir: Source directory (input of every gate).
+        test_dir: Test directory (also an input of the pytest gate).
+        project_root: Directory the tools run in (default: current directory).
+    """
+
+    def __init__(
+        self,
+        state_manager: Any,
+        source_dir: str,
+        test_dir: str,
+        project_root: str | None = None,
+    ):
+        self.state_manager = state_manager
+        self.source_dir = os.path.abspath(source_dir)
+        self.test_dir = os.path.abspath(test_dir)
+        self.project_root = os.path.abspath(project_root or os.getcwd())
+
+    def _inputs(self, gate: str) -> list[str]:
+        if gate == "pytest":
+            return [self.source_dir, self.test_dir]
+        return [self.source_dir]
+
+    def scope(self, gate: str) -> str:
+        """Key of the checked directories, stored alongside the fingerprint."""
+        return "|".join(file_key(path) for path in (*self._inputs(gate), self.project_root))
+
+    async def _content_digests(self, snapshot: WorkspaceSnapshot) -> dict[str, str]:
+        """SHA-256 of every snapshot file, reusing hashes whose stat is unchanged."""
+        paths = sorted(snapshot.files)
+        known = await self.state_manager.get_file_fingerprints(paths)
+
+        digests: dict[str, str] = {}
+        stale: list[str] = []
+        for path in paths:
+            size, mtime_ns = snapshot.files[path]
+            entry = known.get(path)
+            if entry is not None and entry[0] == size and entry[1] == mtime_ns:
+                digests[path] = entry[2]
+            else:
+                stale.append(path)
+
+        if stale:
+            hashed = await asyncio.to_thread(lambda: [file_digest(p) for p in stale])
+            racy_after = time.time_ns() - _RACY_WINDOW_NS
+            updates: list[tuple[str, int, int, str]] = []
+            for path, digest in zip(stale, hashed, strict=True):
+                if digest is None:
+                    digests[path] = "unreadable"
+                    continue
+                digests[path] = digest
+                size, mtime_ns = snapshot.files[path]
+                if mtime_ns < racy_after:
+                    updates.append((path, size, mtime_ns, digest))
+            await self.state_manager.record_file_fingerprints(updates)
+            logger.debug(f"Hashed {len(stale)} of {len(paths)} file(s)")
+        return digests
+
+    async def fingerprint(self, gate: str) -> str:
+        """Current fingerprint of a gate's inputs.
+
+        Args:
+            gate: Gate name (see ``GATE_TOOLS``).
+
+        Returns:
+            Hex SHA-256.
+        """
+        inputs = self._inputs(gate)
+        configs = _config_files([*inputs, self.project_root])
+        snapshot = await asyncio.to_thread(WorkspaceSnapshot.take, [*inputs, *configs])
+        digests = await self._content_digests(snapshot)
+
+        h = hashlib.sha256()
+        h.update(f"gate\0{gate}\n".encode())
+        for tool in GATE_TOOLS.get(gate, ()):
+            h.update(f"tool\0{tool}\0{await tool_version(tool)}\n".encode())
+        for path in sorted(digests):
+            h.update(f"file\0{path}\0{digests[path]}\n".encode("utf-8", "surrogateescape"))
+        return h.hexdigest()
+
+    async def is_fresh(self, gate: str) -> bool:
+        """Whether the gate passed on exactly the current inputs before."""
+        stored = await self.state_manager.get_gate_fingerprint(gate, self.scope(gate))
+        if stored is None:
+            return False
+        return stored == await self.fingerprint(gate)
+
+    async def record_pass(self, gate: str) -> bool:
+        """Store the current fingerprint as the gate's last passing one."""
+        return await self.state_manager.record_gate_fingerprint(
+            gate, self.scope(gate), await self.fingerprint(gate)
+        )
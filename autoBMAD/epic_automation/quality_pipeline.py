@@ -0,0 +1,329 @@
+"""Module for declaring the quality-gate pipeline as a graph of stages.
+
+A pipeline is a list of stages. Each stage runs one gate (a built-in gate or an
+external command) and may name the stages it needs to run after. Stages whose
+dependencies are done run concurrently, up to ``max_parallel`` at a time, with
+one exception: the built-in gates edit the tree (ruff autofixes, formatting,
+SDK fixes of sources and tests) and fingerprint it when they pass, so they run
+one at a time. Only ``command`` stages run alongside them or each other.
+Dependencies only order stages: a stage still runs when one it needs failed,
+just as the fixed pipeline kept going after a failed gate.
+
+The pipeline can be loaded from a TOML or JSON file::
+
+    max_parallel = 2
+
+    [[stages]]
+    name = "static"
+    gate = "static_checks"
+    max_cycles = 5
+    sdk_call_delay = 2
+
+    [[stages]]
+    name = "format"
+    gate = "ruff_format"
+    needs = ["static"]
+
+    [[stages]]
+    name = "bandit"
+    gate = "command"
+    command = ["bandit", "-q", "-r", "{source_dir}"]
+    timeout = 120
+
+    [[stages]]
+    name = "pytest"
+    gate = "pytest"
+    needs = ["format"]
+    fix_workers = 2
+"""
+
+import asyncio
+import json
+import logging
+import time
+import tomllib
+from collections.abc import Awaitable, Callable, Mapping
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Built-in gates: ruff + basedpyright with combined fixes, each tool alone,
+# ruff format, pytest with fixes, and an external command without fixes
+GATES = frozenset({"static_checks", "ruff", "basedpyright", "ruff_format", "pytest", "command"})
+
+# Timeout of a command stage without its own timeout (seconds)
+DEFAULT_COMMAND_TIMEOUT = 600
+
+# Built-in gates that write to a fixed result slot and can only run once
+_SINGLE_GATES = {
+    "static_checks": ("ruff", "basedpyright"),
+    "ruff": ("ruff",),
+    "basedpyright": ("basedpyright",),
+    "ruff_format": ("ruff_format",),
+    "pytest": ("pytest",),
+}
+
+# Gates that edit files; they never run concurrently with each other
+WRITING_GATES = frozenset(_SINGLE_GATES)
+
+
+@dataclass
+class StageConfig:
+    """One stage of the pipeline.
+
+    Attributes:
+        name: Unique stage name.
+        gate: Gate to run (see ``GATES``).
+        needs: Stages that must finish before this one starts.
+        max_cycles: Check/fix cycles (fixing gates).
+        sdk_call_delay: Seconds between two SDK calls of one fix worker.
+        sdk_timeout: Seconds per SDK fix call (ruff / basedpyright gates).
+        fix_workers: Files fixed concurrently; None uses the orchestrator's.
+        timeout: Seconds before the whole stage is cancelled; None for none
+            (command stages then use ``DEFAULT_COMMAND_TIMEOUT``).
+        command: Command for ``command`` stages; ``{source_dir}`` and
+            ``{test_dir}`` are substituted.
+        blocking: A failed ``command`` stage fails the pipeline (the
+            built-in gates keep their own rules).
+        enabled: Disabled stages are skipped (and still satisfy ``needs``).
+    """
+
+    name: str
+    gate: str
+    needs: list[str] = field(default_factory=list)
+    max_cycles: int = 3
+    sdk_call_delay: int = 10
+    sdk_timeout: int = 600
+    fix_workers: int | None = None
+    timeout: float | None = None
+    command: list[str] | None = None
+    blocking: bool = True
+    enabled: bool = True
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "StageConfig":
+        known = {f.name for f in fields(cls)}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"Unknown stage option(s): {', '.join(sorted(unknown))}")
+        if "name" not in data or "gate" not in data:
+            raise ValueError("Every stage needs a name and a gate")
+        stage = cls(**dict(data))
+        stage.needs = list(stage.needs)
+        if stage.command is not None:
+            stage.command = [str(arg) for arg in stage.command]
+        return stage
+
+
+@dataclass
+class PipelineConfig:
+    """The stages of the quality-gate pipeline.
+
+    Attributes:
+        stages: Stages in declaration order.
+        max_parallel: Stages running at the same time; None for no limit.
+    """
+
+    stages: list[StageConfig]
+    max_parallel: int | None = None
+
+    def __post_init__(self) -> None:
+        self.validate()
+
+    @classmethod
+    def default(cls, combined_static_checks: bool = True, max_cycles: int = 3) -> "PipelineConfig":
+        """The standard pipeline: static checks, then ruff format, then pytest.
+
+        Args:
+            combined_static_checks: One stage running ruff and basedpyright
+                together; False runs them as two stages, one after the other.
+            max_cycles: Check/fix cycles of each fixing gate.
+        """
+        if combined_static_checks:
+            static = [StageConfig("static_checks", "static_checks", max_cycles=max_cycles)]
+        else:
+            static = [
+                StageConfig("ruff", "ruff", max_cycles=max_cycles),
+                StageConfig("basedpyright", "basedpyright", needs=["ruff"], max_cycles=max_cycles),
+            ]
+        return cls([
+            *static,
+            StageConfig("ruff_format", "ruff_format", needs=[static[-1].name]),
+            StageConfig("pytest", "pytest", needs=["ruff_format"], max_cycles=max_cycles),
+        ])
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "PipelineConfig":
+        stages = data.get("stages")
+        if not isinstance(stages, list) or not stages:
+            raise ValueError("Pipeline config needs a non-empty 'stages' list")
+        return cls(
+            stages=[StageConfig.from_dict(stage) for stage in stages],
+            max_parallel=data.get("max_parallel"),
+        )
+
+    @classmethod
+    def load(cls, path: str | Path) -> "PipelineConfig":
+        """Read a pipeline from a ``.toml`` or ``.json`` file.
+
+        Raises:
+            OSError: The file cannot be read.
+            ValueError: The file is not a valid pipeline.
+        """
+        path = Path(path)
+        text = path.read_text(encoding="utf-8")
+        if path.suffix.lower() == ".json":
+            data = json.loads(text)
+        else:
+            data = tomllib.loads(text)
+        return cls.from_dict(data)
+
+    def validate(self) -> None:
+        """Check names, gates, dependencies and the absence of cycles.
+
+        Raises:
+            ValueError: Describing the first problem found.
+        """
+        names = [stage.name for stage in self.stages]
+        duplicates = {name for name in names if names.count(name) > 1}
+        if duplicates:
+            raise ValueError(f"Duplicate stage name(s): {', '.join(sorted(duplicates))}")
+        if self.max_parallel is not None and self.max_parallel < 1:
+            raise ValueError("max_parallel must be at least 1")
+
+        slots: dict[str, str] = {}
+        for stage in self.stages:
+            if stage.gate not in GATES:
+                raise ValueError(f"Stage '{stage.name}': unknown gate '{stage.gate}'")
+            if stage.gate == "command" and not stage.command:
+                raise ValueError(f"Stage '{stage.name}': command stages need a command")
+            for slot in _SINGLE_GATES.get(stage.gate, ()):
+                if slot in slots:
+                    raise ValueError(
+                        f"Stages '{slots[slot]}' and '{stage.name}' both run {slot}"
+                    )
+                slots[slot] = stage.name
+            for need in stage.needs:
+                if need not in names:
+                    raise ValueError(f"Stage '{stage.name}' needs unknown stage '{need}'")
+            if stage.max_cycles < 1:
+                raise ValueError(f"Stage '{stage.name}': max_cycles must be at least 1")
+            if stage.fix_workers is not None and stage.fix_workers < 1:
+                raise ValueError(f"Stage '{stage.name}': fix_workers must be at least 1")
+            if stage.timeout is not None and stage.timeout <= 0:
+                raise ValueError(f"Stage '{stage.name}': timeout must be positive")
+        self.ordered()
+
+    def ordered(self) -> list[StageConfig]:
+        """Stages in dependency order (declaration order among independent ones).
+
+        Raises:
+            ValueError: The dependencies contain a cycle.
+        """
+        by_name = {stage.name: stage for stage in self.stages}
+        ordered: list[StageConfig] = []
+        state: dict[str, str] = {}
+
+        def visit(name: str, path: list[str]) -> None:
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Stage dependency cycle: {' -> '.join([*path, name])}")
+            state[name] = "visiting"
+            for need in by_name[name].needs:
+                visit(need, [*path, name])
+            state[name] = "done"
+            ordered.append(by_name[name])
+
+        for stage in self.stages:
+            visit(stage.name, [])
+        return ordered
+
+
+@dataclass
+class StageOutcome:
+    """How one stage ended.
+
+    Attributes:
+        status: "completed", "failed", "timed_out", "error" or "skipped".
+        duration: Wall-clock seconds.
+        result: The gate's result dict.
+    """
+
+    status: str
+    duration: float
+    result: dict[str, Any]
+
+
+# Stage runner: stage -> gate result dict with at least a "success" key
+StageRunner = Callable[[StageConfig], Awaitable[dict[str, Any]]]
+
+
+async def run_pipeline(
+    config: PipelineConfig,
+    run_stage: StageRunner,
+    is_enabled: Callable[[StageConfig], bool] | None = None,
+) -> dict[str, StageOutcome]:
+    """Run the stages as a graph.
+
+    Each stage starts once all stages it needs have finished; stages of
+    ``WRITING_GATES`` additionally wait until no other such stage runs. Stage
+    exceptions and timeouts are turned into outcomes, so one stage never
+    stops the others.
+
+    Args:
+        config: Pipeline to run.
+        run_stage: Runs one stage.
+        is_enabled: Extra filter for enabled stages (e.g. CLI skip flags).
+
+    Returns:
+        Outcome per stage name, in dependency order.
+    """
+    ordered = config.ordered()
+    semaphore = asyncio.Semaphore(config.max_parallel or len(ordered))
+    # Held by a stage that edits the tree, so its fixes and the fingerprint of
+    # its pass only see its own edits
+    writer_lock = asyncio.Lock()
+    tasks: dict[str, asyncio.Task[StageOutcome]] = {}
+
+    async def run_one(stage: StageConfig) -> StageOutcome:
+        if stage.needs:
+            await asyncio.gather(*(tasks[need] for need in stage.needs))
+        if not stage.enabled or (is_enabled is not None and not is_enabled(stage)):
+            logger.info(f"Stage '{stage.name}' skipped")
+            return StageOutcome("skipped", 0.0, {"success": True, "skipped": True})
+
+        async with AsyncExitStack() as stack:
+            if stage.gate in WRITING_GATES:
+                await stack.enter_async_context(writer_lock)
+            await stack.enter_async_context(semaphore)
+            logger.info(f"Stage '{stage.name}' ({stage.gate}) started")
+            started = time.monotonic()
+            try:
+                result = await asyncio.wait_for(run_stage(stage), stage.timeout)
+                status = "completed" if result.get("success") else "failed"
+            except TimeoutError:
+                error = f"Stage '{stage.name}' timed out after {stage.timeout}s"
+                logger.error(error)
+                result = {"success": False, "error": error}
+                status = "timed_out"
+            except Exception as e:
+                error = f"Stage '{stage.name}' error: {e}"
+                logger.error(error, exc_info=True)
+                result = {"success": False, "error": error}
+                status = "error"
+            duration = round(time.monotonic() - started, 2)
+            logger.info(f"Stage '{stage.name}' {status} in {duration}s")
+            return StageOutcome(status, duration, result)
+
+    for stage in ordered:
+        tasks[stage.name] = asyncio.create_task(run_one(stage), name=f"stage:{stage.name}")
+    try:
+        await asyncio.gather(*tasks.values())
+    finally:
+        for task in tasks.values():
+            task.cancel()
+    return {name: task.result() for name, task in tasks.items()}
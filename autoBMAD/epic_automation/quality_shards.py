@@ -0,0 +1,274 @@
+"""Module for splitting a monorepo into shards for the quality gates.
+
+A shard is one package of the workspace with its own source and test
+directory. Each shard gets its own pipeline, so a failing package does not
+hold up the others, and its diagnostics stay separate in the error summary.
+
+Package roots are found in two ways:
+
+- Project roots: directories with a ``pyproject.toml`` or ``setup.py``. The
+  sources are ``src/`` (src layout), the single top-level package (flat
+  layout) or the project directory itself; the tests are ``tests/`` or
+  ``test/``. A project file at the workspace root only marks the workspace
+  when other projects are nested in it.
+- Package boundaries: outside any project, a directory with an
+  ``__init__.py`` whose parent has none is a shard of its own; its tests are
+  its ``tests/`` subdirectory.
+"""
+
+import json
+import logging
+import os
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Files marking a project root
+PROJECT_FILES = ("pyproject.toml", "setup.py")
+
+# Directories never searched for packages
+SKIP_DIRS = frozenset({
+    "__pycache__", "node_modules", "build", "dist", "site-packages",
+    "venv", "env", "htmlcov",
+})
+
+# Directory names holding tests rather than a package
+TEST_DIR_NAMES = ("tests", "test")
+
+# Default number of shards gated at the same time (one process each)
+DEFAULT_SHARD_WORKERS = 4
+
+# Directory of the error summary JSON files (as written by the orchestrator)
+ERRORS_DIR = Path("autoBMAD/epic_automation/errors")
+
+
+@dataclass
+class Shard:
+    """One package of the workspace.
+
+    Attributes:
+        name: Path of the package root relative to the workspace.
+        root: Absolute package root.
+        source_dir: Absolute source directory.
+        test_dir: Absolute test directory (may not exist; pytest is then
+            skipped for the shard).
+        kind: "project" (project file) or "package" (``__init__`` boundary).
+    """
+
+    name: str
+    root: str
+    source_dir: str
+    test_dir: str
+    kind: str
+
+
+def _skipped(name: str) -> bool:
+    return name.startswith(".") or name in SKIP_DIRS or name.endswith(".egg-info")
+
+
+def _subdirs(directory: Path) -> list[Path]:
+    try:
+        return sorted(
+            entry for entry in directory.iterdir()
+            if entry.is_dir() and not entry.is_symlink() and not _skipped(entry.name)
+        )
+    except OSError as e:
+        logger.warning(f"Cannot list {directory}: {e}")
+        return []
+
+
+def _is_project(directory: Path) -> bool:
+    return any((directory / name).is_file() for name in PROJECT_FILES)
+
+
+def _is_package(directory: Path) -> bool:
+    return (directory / "__init__.py").is_file()
+
+
+def _test_dir(root: Path) -> Path:
+    for name in TEST_DIR_NAMES:
+        if (root / name).is_dir():
+            return root / name
+    return root / TEST_DIR_NAMES[0]
+
+
+def _project_shard(workspace: Path, root: Path) -> Shard:
+    if (root / "src").is_dir():
+        source = root / "src"
+    else:
+        packages = [
+            sub for sub in _subdirs(root)
+            if _is_package(sub) and sub.name not in TEST_DIR_NAMES
+        ]
+        source = packages[0] if len(packages) == 1 else root
+    return Shard(
+        name=root.relative_to(workspace).as_posix(),
+        root=str(root),
+        source_dir=str(source),
+        test_dir=str(_test_dir(root)),
+        kind="project",
+    )
+
+
+def _package_shard(workspace: Path, package: Path) -> Shard:
+    return Shard(
+        name=package.relative_to(workspace).as_posix(),
+        root=str(package),
+        source_dir=str(package),
+        test_dir=str(package / TEST_DIR_NAMES[0]),
+        kind="package",
+    )
+
+
+def discover_shards(workspace: str | Path) -> list[Shard]:
+    """Find the package roots under a workspace.
+
+    Args:
+        workspace: Monorepo root.
+
+    Returns:
+        Shards sorted by name; a workspace without nested packages is one
+        shard named ".".
+    """
+    workspace = Path(workspace).resolve()
+    shards: list[Shard] = []
+
+    def walk(directory: Path) -> None:
+        for sub in _subdirs(directory):
+            if _is_project(sub):
+                shards.append(_project_shard(workspace, sub))
+            elif _is_package(sub):
+                if sub.name not in TEST_DIR_NAMES:
+                    shards.append(_package_shard(workspace, sub))
+            else:
+                walk(sub)
+
+    walk(workspace)
+    if not shards:
+        shards.append(_project_shard(workspace, workspace))
+    elif _is_project(workspace):
+        logger.info(
+            f"{workspace} holds {len(shards)} package(s); its project file is "
+            f"treated as the workspace manifest"
+        )
+    shards.sort(key=lambda shard: shard.name)
+    logger.info(f"Discovered {len(shards)} shard(s): {', '.join(s.name for s in shards)}")
+    return shards
+
+
+def shard_epic_id(epic_id: str, shard: Shard) -> str:
+    """Identifier of a shard's run (used in its error summary file name)."""
+    return epic_id if shard.name == "." else f"{epic_id}-{shard.name}"
+
+
+def shard_file_stem(epic_id: str, shard: Shard) -> str:
+    """File-name-safe identifier of a shard's run (for its output files)."""
+    return shard_epic_id(epic_id, shard).replace("/", "_").replace("\\", "_").replace(":", "_")
+
+
+def merge_shard_results(
+    epic_id: str,
+    workspace: str,
+    shards: Sequence[Shard],
+    results: Mapping[str, dict[str, Any]],
+) -> dict[str, Any]:
+    """Combine the per-shard results into one result.
+
+    The run succeeds when every shard succeeds. Errors and quality warnings
+    are tagged with their shard; when any shard has warnings a combined
+    error summary JSON is written.
+
+    Args:
+        epic_id: Identifier of the whole run.
+        workspace: Monorepo root.
+        shards: The gated shards.
+        results: Result per shard name.
+
+    Returns:
+        Result dict with the keys of a single run plus ``shards``.
+    """
+    errors: list[str] = []
+    warnings: list[dict[str, Any]] = []
+    for shard in shards:
+        result = results.get(shard.name) or {}
+        shard_errors = list(result.get("errors") or [])
+        if result.get("error"):
+            shard_errors.append(result["error"])
+        if not result.get("success") and not shard_errors:
+            shard_errors.append("failed")
+        errors.extend(f"[{shard.name}] {error}" for error in shard_errors)
+        warnings.extend(
+            {**warning, "shard": shard.name}
+            for warning in result.get("quality_warnings") or []
+        )
+
+    merged: dict[str, Any] = {
+        "success": not errors,
+        "epic_id": epic_id,
+        "workspace": workspace,
+        "errors": errors,
+        "quality_warnings": warnings,
+        "error_summary_json": None,
+        "shards": {shard.name: results.get(shard.name) or {} for shard in shards},
+    }
+    if warnings:
+        merged["error_summary_json"] = write_merged_error_summary(
+            epic_id, workspace, shards, results, warnings
+        )
+    return merged
+
+
+def write_merged_error_summary(
+    epic_id: str,
+    workspace: str,
+    shards: Sequence[Shard],
+    results: Mapping[str, dict[str, Any]],
+    warnings: Sequence[dict[str, Any]],
+) -> str | None:
+    """Write the error summary of a sharded run.
+
+    Same layout as the single-run summary, with the tool entries tagged by
+    shard and a ``shards`` list pointing at each shard's own summary.
+
+    Returns:
+        Path of the JSON file, or None if it could not be written.
+    """
+    summary = {
+        "epic_id": epic_id,
+        "timestamp": datetime.now(UTC).isoformat().replace("+00:00", "Z"),
+        "workspace": workspace,
+        "shards": [
+            {
+                "name": shard.name,
+                "source_dir": shard.source_dir,
+                "test_dir": shard.test_dir,
+                "success": bool((results.get(shard.name) or {}).get("success")),
+                "error_summary_json": (results.get(shard.name) or {}).get("error_summary_json"),
+            }
+            for shard in shards
+        ],
+        "tools": list(warnings),
+    }
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    safe_epic_id = epic_id.replace("/", "_").replace("\\", "_").replace(":", "_")
+    filepath = ERRORS_DIR / f"quality_errors_{safe_epic_id}_{timestamp}.json"
+    try:
+        ERRORS_DIR.mkdir(parents=True, exist_ok=True)
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False, default=str)
+    except OSError as e:
+        logger.error(f"Failed to write error summary {filepath}: {e}")
+        return None
+
+    logger.info(f"Error summary written to: {filepath}")
+    return str(filepath)
+
+
+def default_shard_workers(shard_count: int) -> int:
+    """Shard processes to run when none is configured."""
+    return max(1, min(DEFAULT_SHARD_WORKERS, shard_count, os.cpu_count() or 1))
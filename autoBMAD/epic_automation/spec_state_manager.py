@@ -1,12 +1,32 @@
 """Module for managing the state of specifications."""
 
+import ast
+import json
 import sqlite3
+import time
+from collections.abc import Iterable, Mapping
 from pathlib import Path
 from typing import Any
 
+SPEC_STATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS spec_state (
+        file_path TEXT NOT NULL,
+        section TEXT NOT NULL,
+        data TEXT NOT NULL,
+        fingerprint TEXT,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (file_path, section)
+    )
+"""
+
 
 class SpecStateManager:
-    """A class to manage the state of specifications using SQLite."""
+    """A class to manage the state of specifications using SQLite.
+
+    State is stored per (file, section) as JSON. An optional fingerprint
+    (e.g. a content hash of the source file) can be stored with each section so
+    cached parse results are only returned while the source is unchanged.
+    """
 
     def __init__(self, db_path: Path):
         """Initialize the SpecStateManager with a database path.
@@ -22,55 +42,188 @@ class SpecStateManager:
         if self.connection is None:
             self.connection = sqlite3.connect(self.db_path)
         cursor = self.connection.cursor()
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS spec_state (
-                file_path TEXT NOT NULL,
-                section TEXT NOT NULL,
-                data TEXT NOT NULL,
-                PRIMARY KEY (file_path)
+        self._migrate_legacy_table(cursor)
+        cursor.execute(SPEC_STATE_TABLE_SQL)
+        self.connection.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            self.create_tables()
+        assert self.connection is not None
+        return self.connection
+
+    @staticmethod
+    def _migrate_legacy_table(cursor: sqlite3.Cursor) -> None:
+        """Convert the old file_path-keyed table with repr() values."""
+        columns = cursor.execute("PRAGMA table_info(spec_state)").fetchall()
+        if not columns:
+            return
+        pk_columns = [col[1] for col in columns if col[5]]
+        if pk_columns != ["file_path"]:
+            return
+
+        rows = cursor.execute("SELECT file_path, section, data FROM spec_state").fetchall()
+        cursor.execute("DROP TABLE spec_state")
+        cursor.execute(SPEC_STATE_TABLE_SQL)
+        now = time.time()
+        migrated: list[tuple[str, str, str, None, float]] = []
+        for file_path, section, data in rows:
+            try:
+                value = ast.literal_eval(data)
+            except (ValueError, SyntaxError):
+                value = data
+            migrated.append(
+                (file_path, section, json.dumps(value, default=str), None, now)
             )
-            """
+        cursor.executemany(
+            "INSERT INTO spec_state (file_path, section, data, fingerprint, updated_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            migrated,
         )
-        self.connection.commit()
 
-    def save_state(self, file_path: str, section: str, data: dict[str, Any]) -> None:
-        """Save the state to the database.
+    def save_state(
+        self,
+        file_path: str,
+        section: str,
+        data: Any,
+        fingerprint: str | None = None,
+    ) -> None:
+        """Save the state of one section to the database.
 
         Args:
             file_path: The path to the file.
             section: The section of the file.
-            data: The data to be saved.
+            data: JSON-serialisable data to be saved.
+            fingerprint: Optional fingerprint of the source file.
         """
-        if self.connection is None:
-            self.create_tables()
-        if self.connection is not None:
-            cursor = self.connection.cursor()
-            cursor.execute(
-                "INSERT OR REPLACE INTO spec_state (file_path, section, data) VALUES (?, ?, ?)",
-                (file_path, section, str(data)),
+        self.save_states([(file_path, section, data)], fingerprint=fingerprint)
+
+    def save_states(
+        self,
+        items: Iterable[tuple[str, str, Any]],
+        fingerprint: str | None = None,
+    ) -> int:
+        """Save many sections in a single transaction.
+
+        Args:
+            items: (file_path, section, data) tuples.
+            fingerprint: Optional fingerprint stored with every item.
+
+        Returns:
+            Number of sections written.
+        """
+        now = time.time()
+        rows = [
+            (file_path, section, json.dumps(data, default=str), fingerprint, now)
+            for file_path, section, data in items
+        ]
+        if not rows:
+            return 0
+        connection = self._connect()
+        with connection:
+            connection.executemany(
+                """
+                INSERT INTO spec_state (file_path, section, data, fingerprint, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(file_path, section) DO UPDATE SET
+                    data = excluded.data,
+                    fingerprint = excluded.fingerprint,
+                    updated_at = excluded.updated_at
+                """,
+                rows,
             )
-            self.connection.commit()
+        return len(rows)
 
-    def load_state(self, file_path: str) -> dict[str, Any] | None:
-        """Load the state from the database.
+    def save_file_state(
+        self,
+        file_path: str,
+        sections: Mapping[str, Any],
+        fingerprint: str | None = None,
+        replace: bool = True,
+    ) -> int:
+        """Save all sections of one file in a single transaction.
 
         Args:
             file_path: The path to the file.
+            sections: Mapping of section name to data.
+            fingerprint: Optional fingerprint of the source file.
+            replace: Remove stored sections that are not in ``sections``.
 
         Returns:
-            The loaded state, or None if no state is found.
+            Number of sections written.
         """
-        if self.connection is None:
+        connection = self._connect()
+        with connection:
+            if replace:
+                connection.execute(
+                    "DELETE FROM spec_state WHERE file_path = ?", (file_path,)
+                )
+            return self.save_states(
+                ((file_path, section, data) for section, data in sections.items()),
+                fingerprint=fingerprint,
+            )
+
+    def load_state(
+        self, file_path: str, section: str, fingerprint: str | None = None
+    ) -> Any | None:
+        """Load the state of one section from the database.
+
+        Args:
+            file_path: The path to the file.
+            section: The section of the file.
+            fingerprint: If given, only return data saved with this fingerprint.
+
+        Returns:
+            The loaded data, or None if no (current) state is found.
+        """
+        connection = self._connect()
+        row = connection.execute(
+            "SELECT data, fingerprint FROM spec_state WHERE file_path = ? AND section = ?",
+            (file_path, section),
+        ).fetchone()
+        if row is None or (fingerprint is not None and row[1] != fingerprint):
             return None
-        cursor = self.connection.cursor()
-        cursor.execute(
-            "SELECT section, data FROM spec_state WHERE file_path = ?", (file_path,)
-        )
-        row = cursor.fetchone()
-        if row:
-            return {"section": row[0], "data": row[1]}
-        return None
+        return json.loads(row[0])
+
+    def load_file_state(
+        self, file_path: str, fingerprint: str | None = None
+    ) -> dict[str, Any]:
+        """Load all sections of one file with a single query.
+
+        Args:
+            file_path: The path to the file.
+            fingerprint: If given, only return sections saved with this
+                fingerprint.
+
+        Returns:
+            Mapping of section name to data (empty if nothing is stored).
+        """
+        connection = self._connect()
+        rows = connection.execute(
+            "SELECT section, data, fingerprint FROM spec_state WHERE file_path = ?",
+            (file_path,),
+        ).fetchall()
+        return {
+            section: json.loads(data)
+            for section, data, stored_fingerprint in rows
+            if fingerprint is None or stored_fingerprint == fingerprint
+        }
+
+    def delete_file_state(self, file_path: str) -> int:
+        """Delete all stored sections of one file.
+
+        Args:
+            file_path: The path to the file.
+
+        Returns:
+            Number of sections deleted.
+        """
+        connection = self._connect()
+        with connection:
+            cursor = connection.execute(
+                "DELETE FROM spec_state WHERE file_path = ?", (file_path,)
+            )
+        return cursor.rowcount
 
     def close(self) -> None:
         """Close the database connection."""
@@ -15,25 +15,129 @@
 import asyncio
 import json
 import logging
+import os
 import re
-import shutil
+import socket
 import sqlite3
+import threading
+import time
+import uuid
 import warnings
-from contextlib import asynccontextmanager
+import zlib
+from contextlib import asynccontextmanager, contextmanager
 from datetime import datetime
 from functools import wraps
 from pathlib import Path
-from typing import Any, Callable, TypeVar, Union, cast, List, Dict
+from typing import Any, Awaitable, Callable, Iterator, TypeVar, Union, cast, List, Dict
 
-from autoBMAD.epic_automation.agents.config import StoryStatus, QAResult
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from autoBMAD.epic_automation.agents.config import QAResult, StoryStatus
+from autoBMAD.epic_automation.db_maintenance import (
+    DatabaseMaintenance,
+    RetentionPolicy,
+    apply_retention,
+)
+from autoBMAD.epic_automation.workspace_snapshot import file_digest
 
 logger = logging.getLogger(__name__)
 
 # Type variable for decorator
 F = TypeVar("F", bound=Callable[..., Any])
+T = TypeVar("T")
 
 __all__ = ['StateManager', 'StoryStatus', 'QAResult']
 
+# QA结果侧表：zlib 压缩的 JSON，按需通过 load_qa_result() 加载
+QA_RESULTS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS story_qa_results (
+        story_path TEXT PRIMARY KEY,
+        payload BLOB NOT NULL,
+        raw_size INTEGER NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# 删除故事记录时同步删除其QA结果
+QA_RESULTS_TRIGGER_SQL = """
+    CREATE TRIGGER IF NOT EXISTS trg_stories_delete_qa_result
+    AFTER DELETE ON stories
+    BEGIN
+        DELETE FROM story_qa_results WHERE story_path = OLD.story_path;
+    END
+"""
+
+# 故事租约：多个 epic_driver 进程共享 progress.db 时记录故事归属
+STORY_LEASES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS story_leases (
+        story_path TEXT PRIMARY KEY,
+        epic_path TEXT NOT NULL,
+        owner_id TEXT NOT NULL,
+        acquired_at REAL NOT NULL,
+        heartbeat_at REAL NOT NULL,
+        expires_at REAL NOT NULL
+    )
+"""
+
+# 故事完成记录：成功处理后保留，认领时跳过内容未变化的已完成故事
+# （故事文件被重新生成或修改后可再次认领）
+STORY_COMPLETIONS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS story_completions (
+        story_path TEXT PRIMARY KEY,
+        epic_path TEXT NOT NULL,
+        owner_id TEXT NOT NULL,
+        story_digest TEXT,
+        completed_at REAL NOT NULL
+    )
+"""
+
+# Epic 中每个故事章节的哈希（最近一次成功处理时），用于增量模式。
+# 不随 stories 记录清理，跨运行保留
+EPIC_SECTION_HASHES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS epic_section_hashes (
+        epic_path TEXT NOT NULL,
+        story_number TEXT NOT NULL,
+        section_hash TEXT NOT NULL,
+        story_path TEXT,
+        recorded_at REAL NOT NULL,
+        PRIMARY KEY (epic_path, story_number)
+    )
+"""
+
+# 质量门最近一次通过时的源码树指纹（每个质量门、每个检查范围一条），
+# 指纹未变化时跳过该质量门
+QUALITY_GATE_CACHE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS quality_gate_cache (
+        gate TEXT NOT NULL,
+        scope TEXT NOT NULL,
+        fingerprint TEXT NOT NULL,
+        recorded_at REAL NOT NULL,
+        PRIMARY KEY (gate, scope)
+    )
+"""
+
+# 文件内容哈希缓存：(size, mtime_ns) 未变化时复用 sha256，避免重复读取文件
+FILE_FINGERPRINTS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS file_fingerprints (
+        path TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        sha256 TEXT NOT NULL
+    )
+"""
+
+# 列表查询只读取窄列，不包含QA结果载荷
+STORY_LIST_COLUMNS = """
+    epic_path, story_path, status, iteration,
+    EXISTS(
+        SELECT 1 FROM story_qa_results q WHERE q.story_path = stories.story_path
+    ) AS has_qa_result,
+    error_message, created_at, updated_at, phase, version
+"""
+
 
 def deprecated(reason: str) -> Callable[[F], F]:
     """标记方法为废弃"""
@@ -89,56 +193,276 @@ class DeadlockDetector:
             self.lock_waiters.pop(lock_name, None)
 
 
-class DatabaseConnectionPool:
-    """数据库连接池"""
+def _is_busy_error(error: sqlite3.OperationalError) -> bool:
+    """判断是否为其他进程持有写锁导致的 SQLITE_BUSY/LOCKED 错误"""
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
 
-    def __init__(self, max_connections: int = 5):
+class DatabaseConnectionPool:
+    """
+    数据库连接池
+
+    - 延迟创建：首次获取时才打开连接，按需增长到 max_connections
+    - 健康检查：交出连接前执行 ``SELECT 1``，失效连接会被替换
+    - 线程友好：连接以 check_same_thread=False 打开，持有者可将操作放到
+      执行器线程；执行器线程中的同步代码通过 thread_connection() 获取线程本地
+      连接（如定时维护任务）
+    - 指标：等待时间、利用率、创建/关闭/超时次数，见 get_metrics()
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 5,
+        busy_timeout_ms: int = 5000,
+        max_busy_retries: int = 5,
+        busy_retry_delay: float = 0.1,
+        acquire_timeout: float = 30.0,
+    ):
         self.max_connections: int = max_connections
         self.connections: asyncio.Queue[sqlite3.Connection] = asyncio.Queue(
             maxsize=max_connections
         )
         self.connection_params: Dict[str, Any] = {}
+        # 多进程共享 progress.db 时的锁等待与重试配置
+        self.busy_timeout_ms: int = busy_timeout_ms
+        self.max_busy_retries: int = max_busy_retries
+        self.busy_retry_delay: float = busy_retry_delay
+        self.acquire_timeout: float = acquire_timeout
+
+        self.db_path: Path | None = None
+        self._created: int = 0
+        self._in_use: int = 0
+        self._local = threading.local()
+        self._thread_connections: list[sqlite3.Connection] = []
+        self._thread_lock = threading.Lock()
+        self._metrics: dict[str, float] = {
+            "acquisitions": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+            "timeouts": 0,
+            "connections_created": 0,
+            "connections_closed": 0,
+            "health_check_failures": 0,
+            "peak_in_use": 0,
+        }
 
     async def initialize(self, db_path: Path):
-        """初始化连接池"""
-        for _ in range(self.max_connections):
-            conn = sqlite3.connect(db_path)
-            conn.execute("PRAGMA journal_mode=WAL")  # 启用WAL模式提高并发性能
-            conn.execute("PRAGMA synchronous=NORMAL")  # 平衡性能和安全性
-            conn.execute("PRAGMA cache_size=10000")  # 设置缓存大小
-            conn.execute("PRAGMA temp_store=memory")  # 临时表存储在内存中
-            await self.connections.put(conn)
+        """初始化连接池（仅记录数据库路径，连接在首次使用时创建）"""
+        self.db_path = db_path
+
+    def _open_connection(self) -> sqlite3.Connection:
+        """打开并配置一个新连接"""
+        if self.db_path is None:
+            raise RuntimeError("Database connection pool not initialized")
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+        )
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA journal_mode=WAL")  # 启用WAL模式提高并发性能
+        conn.execute("PRAGMA synchronous=NORMAL")  # 平衡性能和安全性
+        conn.execute("PRAGMA cache_size=10000")  # 设置缓存大小
+        conn.execute("PRAGMA temp_store=memory")  # 临时表存储在内存中
+        self._metrics["connections_created"] += 1
+        return conn
+
+    def _close_connection(self, conn: sqlite3.Connection) -> None:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        self._metrics["connections_closed"] += 1
 
-    async def get_connection(self) -> sqlite3.Connection:
-        """获取数据库连接"""
+    def _is_healthy(self, conn: sqlite3.Connection) -> bool:
+        """用廉价查询检查连接是否可用"""
         try:
-            conn: sqlite3.Connection = await asyncio.wait_for(
-                self.connections.get(), timeout=5.0
-            )
-            return conn
-        except TimeoutError:
-            raise RuntimeError("Database connection pool exhausted")
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            self._metrics["health_check_failures"] += 1
+            return False
+
+    async def get_connection(self) -> sqlite3.Connection:
+        """获取数据库连接（无空闲连接且未达上限时新建）"""
+        start = time.monotonic()
+        deadline = start + self.acquire_timeout
+
+        while True:
+            try:
+                conn = self.connections.get_nowait()
+            except asyncio.QueueEmpty:
+                if self._created < self.max_connections:
+                    self._created += 1
+                    try:
+                        conn = self._open_connection()
+                    except Exception:
+                        self._created -= 1
+                        raise
+                else:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        if remaining <= 0:
+                            raise TimeoutError
+                        conn = await asyncio.wait_for(
+                            self.connections.get(), timeout=remaining
+                        )
+                    except TimeoutError:
+                        self._metrics["timeouts"] += 1
+                        raise RuntimeError(
+                            f"Database connection pool exhausted after "
+                            f"{self.acquire_timeout}s ({self._in_use}/"
+                            f"{self.max_connections} connections in use)"
+                        )
+
+            if self._is_healthy(conn):
+                break
+            # 失效连接：关闭并释放名额，重新获取
+            self._close_connection(conn)
+            self._created -= 1
+
+        waited = time.monotonic() - start
+        self._in_use += 1
+        self._metrics["acquisitions"] += 1
+        self._metrics["total_wait_seconds"] += waited
+        self._metrics["max_wait_seconds"] = max(self._metrics["max_wait_seconds"], waited)
+        self._metrics["peak_in_use"] = max(self._metrics["peak_in_use"], self._in_use)
+        return conn
 
     async def return_connection(self, conn: sqlite3.Connection):
         """归还数据库连接"""
+        self._in_use = max(self._in_use - 1, 0)
+        if conn.in_transaction:
+            # 持有者异常退出时未提交的事务不能带回池中
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                pass
         try:
-            await self.connections.put(conn)
+            self.connections.put_nowait(conn)
         except asyncio.QueueFull:
-            conn.close()
+            self._close_connection(conn)
+            self._created = max(self._created - 1, 0)
+
+    @contextmanager
+    def thread_connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        获取当前线程专用的连接（供执行器线程中的同步代码使用）。
+
+        每个线程复用自己的连接，不占用异步连接池名额；close() 时统一关闭。
+        """
+        conn: sqlite3.Connection | None = getattr(self._local, "conn", None)
+        if conn is None or not self._is_healthy(conn):
+            conn = self._open_connection()
+            self._local.conn = conn
+            with self._thread_lock:
+                self._thread_connections.append(conn)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                # 未提交的事务不能留给该线程的下一个使用者
+                try:
+                    conn.rollback()
+                except sqlite3.Error:
+                    pass
+
+    def get_metrics(self) -> dict[str, Any]:
+        """获取连接池指标（等待时间、利用率等）"""
+        acquisitions = self._metrics["acquisitions"]
+        return {
+            **self._metrics,
+            "max_connections": self.max_connections,
+            "open_connections": self._created,
+            "idle_connections": self.connections.qsize(),
+            "in_use": self._in_use,
+            "utilisation": self._in_use / self.max_connections
+            if self.max_connections
+            else 0.0,
+            "avg_wait_seconds": self._metrics["total_wait_seconds"] / acquisitions
+            if acquisitions
+            else 0.0,
+            "thread_connections": len(self._thread_connections),
+        }
+
+    def close(self) -> None:
+        """关闭所有空闲连接和线程本地连接（之后再获取连接时会重新打开）"""
+        while True:
+            try:
+                conn = self.connections.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            self._close_connection(conn)
+            self._created = max(self._created - 1, 0)
+        with self._thread_lock:
+            for conn in self._thread_connections:
+                self._close_connection(conn)
+            self._thread_connections.clear()
+        self._local = threading.local()
+
+    async def retry_on_busy(self, operation: Callable[[], Awaitable[T]]) -> T:
+        """
+        执行数据库操作，遇到 busy/locked 错误时指数退避重试。
+
+        busy_timeout 已让单条语句等待锁；本方法处理等待超时后仍失败的情况，
+        以及 BEGIN IMMEDIATE 等需要整体重做的事务。
+
+        Args:
+            operation: 无参异步函数，每次重试都会重新调用
+
+        Returns:
+            operation 的返回值
+        """
+        delay = self.busy_retry_delay
+        for attempt in range(self.max_busy_retries + 1):
+            try:
+                return await operation()
+            except sqlite3.OperationalError as e:
+                if not _is_busy_error(e) or attempt >= self.max_busy_retries:
+                    raise
+                logger.debug(
+                    f"Database busy (attempt {attempt + 1}/{self.max_busy_retries}), "
+                    f"retrying in {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
+                delay *= 2
+        raise RuntimeError("unreachable")
+
+
+class LeaseLostError(RuntimeError):
+    """故事租约在处理期间被其他进程接管。"""
+
+
+class StoryLease:
+    """hold_lease 期间的租约状态。"""
+
+    def __init__(self, story_path: str):
+        self.story_path: str = story_path
+        self.lost: bool = False
 
 
 class StateManager:
     """修复后的SQLite-based状态管理器，用于跟踪故事进度。"""
 
-    def __init__(self, db_path: str = "progress.db", use_connection_pool: bool = True):
+    def __init__(
+        self,
+        db_path: str = "progress.db",
+        use_connection_pool: bool = True,
+        owner_id: str | None = None,
+    ):
         """
         初始化状态管理器。
 
         Args:
             db_path: SQLite数据库文件路径
             use_connection_pool: 是否使用连接池
+            owner_id: 故事租约的持有者标识（默认: 主机名:PID:随机后缀）
         """
         self.db_path: Path = Path(db_path)
+        self.owner_id: str = owner_id or (
+            f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        )
         self._lock: asyncio.Lock = asyncio.Lock()
         self._deadlock_detector: DeadlockDetector = DeadlockDetector()
         self._connection_pool: DatabaseConnectionPool | None = (
@@ -150,10 +474,15 @@ class StateManager:
         # 延迟初始化连接池，避免在同步上下文中创建任务
         # 连接池将在第一次使用时初始化
         self._connection_pool_initialized: bool = False
+        self._pool_init_lock: asyncio.Lock = asyncio.Lock()
 
     async def _ensure_connection_pool_initialized(self):
-        """确保连接池在使用前被初始化"""
-        if self._connection_pool and not self._connection_pool_initialized:
+        """确保连接池在使用前被初始化（并发首次调用只初始化一次）"""
+        if not self._connection_pool or self._connection_pool_initialized:
+            return
+        async with self._pool_init_lock:
+            if self._connection_pool_initialized:
+                return
             await self._connection_pool.initialize(self.db_path)
             # 对于内存数据库，确保表结构存在
             if str(self.db_path) == ":memory:":
@@ -177,6 +506,13 @@ class StateManager:
                             version INTEGER DEFAULT 1
                         )
                     """)
+                    cursor.execute(QA_RESULTS_TABLE_SQL)
+                    cursor.execute(QA_RESULTS_TRIGGER_SQL)
+                    cursor.execute(STORY_LEASES_TABLE_SQL)
+                    cursor.execute(STORY_COMPLETIONS_TABLE_SQL)
+                    cursor.execute(EPIC_SECTION_HASHES_TABLE_SQL)
+                    cursor.execute(QUALITY_GATE_CACHE_TABLE_SQL)
+                    cursor.execute(FILE_FINGERPRINTS_TABLE_SQL)
                     conn.commit()
                 finally:
                     await self._connection_pool.return_connection(conn)
@@ -188,6 +524,9 @@ class StateManager:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
 
+        # 新建数据库启用增量 auto_vacuum（对已有数据库无影响，由维护任务转换）
+        cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+
         # 创建stories表
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS stories (
@@ -224,6 +563,43 @@ class StateManager:
             logger.info("Database migration: adding version column")
             cursor.execute("ALTER TABLE stories ADD COLUMN version INTEGER DEFAULT 1")
 
+        # QA结果侧表
+        cursor.execute(QA_RESULTS_TABLE_SQL)
+        cursor.execute(QA_RESULTS_TRIGGER_SQL)
+
+        # 故事租约表
+        cursor.execute(STORY_LEASES_TABLE_SQL)
+        cursor.execute(STORY_COMPLETIONS_TABLE_SQL)
+
+        # Epic 故事章节哈希表（增量模式）
+        cursor.execute(EPIC_SECTION_HASHES_TABLE_SQL)
+
+        # 质量门指纹缓存表
+        cursor.execute(QUALITY_GATE_CACHE_TABLE_SQL)
+        cursor.execute(FILE_FINGERPRINTS_TABLE_SQL)
+
+        # Database migration: move inline qa_result text into the side table
+        cursor.execute(
+            "SELECT story_path, qa_result FROM stories WHERE qa_result IS NOT NULL"
+        )
+        legacy_rows = cursor.fetchall()
+        if legacy_rows:
+            logger.info(
+                f"Database migration: moving {len(legacy_rows)} qa_result payload(s) "
+                f"to story_qa_results"
+            )
+            for story_path, qa_result_text in legacy_rows:
+                raw = qa_result_text.encode("utf-8")
+                cursor.execute(
+                    """
+                    INSERT OR REPLACE INTO story_qa_results
+                    (story_path, payload, raw_size)
+                    VALUES (?, ?, ?)
+                    """,
+                    (story_path, zlib.compress(raw), len(raw)),
+                )
+            cursor.execute("UPDATE stories SET qa_result = NULL WHERE qa_result IS NOT NULL")
+
         conn.commit()
         conn.close()
 
@@ -263,11 +639,27 @@ class StateManager:
                             version INTEGER DEFAULT 1
                         )
                     """)
+                    cursor.execute(QA_RESULTS_TABLE_SQL)
+                    cursor.execute(QA_RESULTS_TRIGGER_SQL)
+                    cursor.execute(STORY_LEASES_TABLE_SQL)
+                    cursor.execute(STORY_COMPLETIONS_TABLE_SQL)
+                    cursor.execute(EPIC_SECTION_HASHES_TABLE_SQL)
+                    cursor.execute(QUALITY_GATE_CACHE_TABLE_SQL)
+                    cursor.execute(FILE_FINGERPRINTS_TABLE_SQL)
                     conn.commit()
                 yield conn
             finally:
                 conn.close()
 
+    async def close(self) -> None:
+        """关闭连接池中的连接（运行结束时调用；之后使用会重新打开连接）"""
+        if not self._connection_pool:
+            return
+        async with self._lock:
+            self._connection_pool.close()
+            # 内存数据库随连接关闭而丢失，再次使用时需重建表结构
+            self._connection_pool_initialized = False
+
     async def update_story_status(
         self,
         story_path: str,
@@ -360,10 +752,10 @@ class StateManager:
                 )
                 existing = cursor.fetchone()
 
-                # 清理qa_result
-                qa_result_str = None
+                # 压缩qa_result（写入侧表，不内联到stories）
+                qa_result_payload = None
                 if qa_result:
-                    qa_result_str = self._clean_qa_result_for_json(qa_result)
+                    qa_result_payload = self._encode_qa_result(qa_result)
 
                 if existing:
                     _, current_version = existing
@@ -386,13 +778,13 @@ class StateManager:
                         SET status = ?,
                             phase = ?,
                             iteration = ?,
-                            qa_result = ?,
+                            qa_result = NULL,
                             error_message = ?,
                             updated_at = CURRENT_TIMESTAMP,
                             version = version + 1
                         WHERE story_path = ?
                     """,
-                        (status, phase, iteration, qa_result_str, error, story_path),
+                        (status, phase, iteration, error, story_path),
                     )
                     logger.info(
                         f"Updated status for {story_path}: {status} (version {current_version + 1})"
@@ -403,8 +795,8 @@ class StateManager:
                     cursor.execute(
                         """
                         INSERT INTO stories
-                        (epic_path, story_path, status, phase, iteration, qa_result, error_message, version)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, 1)
+                        (epic_path, story_path, status, phase, iteration, error_message, version)
+                        VALUES (?, ?, ?, ?, ?, ?, 1)
                     """,
                         (
                             epic_path,
@@ -412,7 +804,6 @@ class StateManager:
                             status,
                             phase,
                             iteration or 0,
-                            qa_result_str,
                             error,
                         ),
                     )
@@ -421,6 +812,26 @@ class StateManager:
                     )
                     current_version = 1
 
+                # 与原先的整行更新语义一致：未提供qa_result时清除旧结果
+                if qa_result_payload is not None:
+                    payload, raw_size = qa_result_payload
+                    cursor.execute(
+                        """
+                        INSERT INTO story_qa_results (story_path, payload, raw_size)
+                        VALUES (?, ?, ?)
+                        ON CONFLICT(story_path) DO UPDATE SET
+                            payload = excluded.payload,
+                            raw_size = excluded.raw_size,
+                            updated_at = CURRENT_TIMESTAMP
+                    """,
+                        (story_path, payload, raw_size),
+                    )
+                else:
+                    cursor.execute(
+                        "DELETE FROM story_qa_results WHERE story_path = ?",
+                        (story_path,),
+                    )
+
                 conn.commit()
                 return True, current_version
 
@@ -444,6 +855,70 @@ class StateManager:
             logger.warning(f"Failed to clean QA result for JSON: {e}")
             return None
 
+    def _encode_qa_result(self, qa_result: Any) -> "tuple[bytes, int] | None":
+        """将QA结果序列化为JSON并用zlib压缩，返回 (压缩载荷, 原始字节数)"""
+        qa_result_str = self._clean_qa_result_for_json(qa_result)
+        if qa_result_str is None:
+            return None
+        raw = qa_result_str.encode("utf-8")
+        return zlib.compress(raw), len(raw)
+
+    @staticmethod
+    def _decode_qa_result(payload: bytes) -> Any:
+        """解压并解析QA结果载荷"""
+        text = zlib.decompress(payload).decode("utf-8")
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            return text
+
+    @staticmethod
+    def _row_to_story(row: tuple[Any, ...]) -> dict[str, Any]:
+        """将 STORY_LIST_COLUMNS 查询行转换为故事字典"""
+        story: dict[str, Any] = {
+            "epic_path": row[0],
+            "story_path": row[1],
+            "status": row[2],
+            "iteration": row[3],
+            "has_qa_result": bool(row[4]),
+            "created_at": row[6],
+            "updated_at": row[7],
+            "phase": row[8],
+            "version": row[9],
+        }
+        if row[5]:  # error_message
+            story["error"] = row[5]
+        return story
+
+    async def load_qa_result(self, story_path: str) -> Any:
+        """
+        按需加载故事的QA结果。
+
+        Args:
+            story_path: 故事文件路径
+
+        Returns:
+            QA结果（通常为字典），如果不存在则返回None
+        """
+        try:
+            async with self._lock:
+                async with self._get_db_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(
+                        "SELECT payload FROM story_qa_results WHERE story_path = ?",
+                        (story_path,),
+                    )
+                    row = cursor.fetchone()
+
+            if row is None:
+                return None
+            return self._decode_qa_result(row[0])
+
+        except Exception as e:
+            logger.error(f"Failed to load QA result for {story_path}: {e}")
+            logger.debug(f"Error details: {e}", exc_info=True)
+            return None
+
     @asynccontextmanager
     async def managed_operation(self):
         """
@@ -479,9 +954,8 @@ class StateManager:
                     cursor = conn.cursor()
 
                     cursor.execute(
-                        """
-                        SELECT epic_path, story_path, status, iteration, qa_result,
-                               error_message, created_at, updated_at, phase, version
+                        f"""
+                        SELECT {STORY_LIST_COLUMNS}
                         FROM stories
                         WHERE story_path = ?
                     """,
@@ -491,27 +965,7 @@ class StateManager:
                     row = cursor.fetchone()
 
                     if row:
-                        result = {
-                            "epic_path": row[0],
-                            "story_path": row[1],
-                            "status": row[2],
-                            "iteration": row[3],
-                            "created_at": row[6],
-                            "updated_at": row[7],
-                            "phase": row[8],
-                            "version": row[9],
-                        }
-
-                        if row[4]:  # qa_result
-                            try:
-                                result["qa_result"] = json.loads(row[4])
-                            except json.JSONDecodeError:
-                                result["qa_result"] = row[4]
-
-                        if row[5]:  # error_message
-                            result["error"] = row[5]
-
-                        return result
+                        return self._row_to_story(row)
 
                     return None
 
@@ -532,38 +986,13 @@ class StateManager:
                 async with self._get_db_connection() as conn:
                     cursor = conn.cursor()
 
-                    cursor.execute("""
-                        SELECT epic_path, story_path, status, iteration, qa_result,
-                               error_message, created_at, updated_at, phase, version
+                    cursor.execute(f"""
+                        SELECT {STORY_LIST_COLUMNS}
                         FROM stories
                         ORDER BY created_at
                     """)
 
-                    rows = cursor.fetchall()
-                    stories = []
-
-                    for row in rows:
-                        story = {
-                            "epic_path": row[0],
-                            "story_path": row[1],
-                            "status": row[2],
-                            "iteration": row[3],
-                            "created_at": row[6],
-                            "updated_at": row[7],
-                            "phase": row[8],
-                            "version": row[9],
-                        }
-
-                        if row[4]:  # qa_result
-                            try:
-                                story["qa_result"] = json.loads(row[4])
-                            except json.JSONDecodeError:
-                                story["qa_result"] = row[4]
-
-                        if row[5]:  # error_message
-                            story["error"] = row[5]
-
-                        stories.append(story)
+                    stories = [self._row_to_story(row) for row in cursor.fetchall()]
 
                     return stories
 
@@ -587,39 +1016,14 @@ class StateManager:
                 async with self._get_db_connection() as conn:
                     cursor = conn.cursor()
 
-                    cursor.execute("""
-                        SELECT epic_path, story_path, status, iteration, qa_result,
-                               error_message, created_at, updated_at, phase, version
+                    cursor.execute(f"""
+                        SELECT {STORY_LIST_COLUMNS}
                         FROM stories
                         WHERE status = ?
                         ORDER BY created_at
                     """, (status,))
 
-                    rows = cursor.fetchall()
-                    stories = []
-
-                    for row in rows:
-                        story = {
-                            "epic_path": row[0],
-                            "story_path": row[1],
-                            "status": row[2],
-                            "iteration": row[3],
-                            "created_at": row[6],
-                            "updated_at": row[7],
-                            "phase": row[8],
-                            "version": row[9],
-                        }
-
-                        if row[4]:  # qa_result
-                            try:
-                                story["qa_result"] = json.loads(row[4])
-                            except json.JSONDecodeError:
-                                story["qa_result"] = row[4]
-
-                        if row[5]:  # error_message
-                            story["error"] = row[5]
-
-                        stories.append(story)
+                    stories = [self._row_to_story(row) for row in cursor.fetchall()]
 
                     return stories
 
@@ -658,25 +1062,27 @@ class StateManager:
             logger.debug(f"Error details: {e}", exc_info=True)
             return {}
 
-    async def create_backup(self) -> str | None:
+    async def create_backup(
+        self, backup_path: str | None = None, keep_backups: int | None = None
+    ) -> str | None:
         """
-        创建数据库备份。
+        使用 SQLite 在线备份 API 创建数据库备份。
+
+        按页分批复制，WAL 模式下运行中的数据库也能得到一致的快照。
+
+        Args:
+            backup_path: 备份文件路径（默认在数据库旁生成带时间戳的文件）
+            keep_backups: 仅保留最近的 N 个带时间戳的备份
 
         Returns:
             备份文件路径，如果失败则返回None
         """
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_path = (
-                self.db_path.parent
-                / f"{self.db_path.stem}_backup_{timestamp}{self.db_path.suffix}"
+            maintenance = DatabaseMaintenance(self.db_path)
+            target = await asyncio.to_thread(
+                maintenance.backup, backup_path, keep_backups
             )
-
-            # 使用文件复制而不是数据库备份，因为SQLite支持热备份
-            shutil.copy2(self.db_path, backup_path)
-
-            logger.info(f"Database backup created: {backup_path}")
-            return str(backup_path)
+            return str(target)
 
         except Exception as e:
             logger.error(f"Failed to create backup: {e}")
@@ -726,20 +1132,9 @@ class StateManager:
         try:
             async with self._lock:
                 async with self._get_db_connection() as conn:
-                    cursor = conn.cursor()
-
-                    # 清理旧的stories记录
-                    cursor.execute(
-                        f"""
-                        DELETE FROM stories
-                        WHERE updated_at < datetime('now', '-{days} days')
-                        AND status IN ('completed', 'failed')
-                    """
-                    )
-
-                    deleted_count = cursor.rowcount
-
-                    conn.commit()
+                    # 清理旧的stories记录（参数化查询）
+                    stats = apply_retention(conn, RetentionPolicy(max_age_days=days))
+                    deleted_count = stats["total"]
 
                     logger.info(f"Cleaned up {deleted_count} old records")
                     return deleted_count
@@ -749,6 +1144,40 @@ class StateManager:
             logger.debug(f"Error details: {e}", exc_info=True)
             return 0
 
+    async def run_maintenance_if_due(
+        self,
+        interval_hours: float = 24.0,
+        retention: RetentionPolicy | None = None,
+    ) -> dict[str, Any]:
+        """
+        执行到期的定时维护任务（保留策略、incremental_vacuum、WAL 截断）。
+
+        Args:
+            interval_hours: 同一任务两次执行的最小间隔（小时）
+            retention: 保留策略，为 None 时只做压缩
+
+        Returns:
+            各任务的执行结果
+        """
+        if str(self.db_path) == ":memory:":
+            return {}
+
+        try:
+            async with self._lock:
+                # 执行器线程使用连接池的线程本地连接（不占用异步连接名额）
+                connection = None
+                if self._connection_pool:
+                    await self._ensure_connection_pool_initialized()
+                    connection = self._connection_pool.thread_connection
+                maintenance = DatabaseMaintenance(self.db_path, connection=connection)
+                return await asyncio.to_thread(
+                    maintenance.run_scheduled, interval_hours, retention
+                )
+        except Exception as e:
+            logger.error(f"Scheduled database maintenance failed: {e}")
+            logger.debug(f"Error details: {e}", exc_info=True)
+            return {"error": str(e)}
+
     async def cleanup_epic_stories(self, epic_id: str, story_ids: List[str]) -> int:
         """
         清理当前 Epic 相关 Story 的历史记录
@@ -770,16 +1199,21 @@ class StateManager:
                     cursor = conn.cursor()
 
                     # 构建参数化查询 - 使用LIKE匹配story_path中的故事ID
+                    # 其他进程持有有效租约的故事正在处理中，不清理
                     query = f"""
                         DELETE FROM stories
                         WHERE epic_path LIKE ?
                           AND ({' OR '.join([f'story_path LIKE ?' for _ in story_ids])})
+                          AND story_path NOT IN (
+                              SELECT story_path FROM story_leases
+                              WHERE owner_id != ? AND expires_at >= ?
+                          )
                     """
                     # epic_id 作为匹配模式
                     epic_pattern = f"%{epic_id}%" if not epic_id.startswith('%') and not epic_id.endswith('%') else epic_id
                     # story_id 匹配模式 - 匹配任何包含该ID的路径
                     story_patterns = [f"%{sid}%" for sid in story_ids]
-                    params = [epic_pattern] + story_patterns
+                    params = [epic_pattern] + story_patterns + [self.owner_id, time.time()]
 
                     cursor.execute(query, params)
                     deleted_count = cursor.rowcount
@@ -952,8 +1386,7 @@ class StateManager:
                     # 构建参数化查询
                     placeholders = ','.join(['?'] * len(story_ids))
                     query = f"""
-                        SELECT epic_path, story_path, status, iteration, qa_result,
-                               error_message, created_at, updated_at, phase, version
+                        SELECT {STORY_LIST_COLUMNS}
                         FROM stories
                         WHERE epic_path = ? AND story_path IN ({placeholders})
                         ORDER BY updated_at DESC
@@ -961,31 +1394,7 @@ class StateManager:
                     params = [epic_path] + story_ids
 
                     cursor.execute(query, params)
-                    rows = cursor.fetchall()
-
-                    stories = []
-                    for row in rows:
-                        story = {
-                            "epic_path": row[0],
-                            "story_path": row[1],
-                            "status": row[2],
-                            "iteration": row[3],
-                            "created_at": row[6],
-                            "updated_at": row[7],
-                            "phase": row[8],
-                            "version": row[9],
-                        }
-
-                        if row[4]:  # qa_result
-                            try:
-                                story["qa_result"] = json.loads(row[4])
-                            except json.JSONDecodeError:
-                                story["qa_result"] = row[4]
-
-                        if row[5]:  # error_message
-                            story["error"] = row[5]
-
-                        stories.append(story)
+                    stories = [self._row_to_story(row) for row in cursor.fetchall()]
 
                     logger.debug(
                         f"get_stories_by_ids: Found {len(stories)} stories for epic {epic_path} "
@@ -998,6 +1407,560 @@ class StateManager:
             logger.debug(f"Error details: {e}", exc_info=True)
             return []
 
+    # ------------------------------------------------------------------
+    # 故事租约（多进程安全的故事认领）
+    # ------------------------------------------------------------------
+
+    def _is_stale_owner(self, owner_id: str) -> bool:
+        """
+        判断租约持有者是否为本机上已退出的进程。
+
+        跨主机或无法判断时返回 False，由租约过期时间兜底。
+        """
+        parts = owner_id.split(":")
+        if len(parts) < 2 or parts[0] != socket.gethostname():
+            return False
+        try:
+            pid = int(parts[1])
+        except ValueError:
+            return False
+        if pid == os.getpid():
+            return False
+        if psutil is not None:
+            return not psutil.pid_exists(pid)
+        if os.name == "posix":
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                return True
+            except PermissionError:
+                return False
+        return False
+
+    async def _story_digests(self, story_paths: list[str]) -> dict[str, str | None]:
+        """故事文件内容的 SHA-256（在线程中读取）。"""
+        return await asyncio.to_thread(lambda: {p: file_digest(p) for p in story_paths})
+
+    @staticmethod
+    def _completed_among(
+        cursor: sqlite3.Cursor, digests: dict[str, str | None]
+    ) -> "set[str]":
+        """完成记录与当前文件内容一致的故事路径。"""
+        if not digests:
+            return set()
+        placeholders = ",".join("?" * len(digests))
+        cursor.execute(
+            f"""
+            SELECT story_path, story_digest FROM story_completions
+            WHERE story_path IN ({placeholders})
+            """,
+            list(digests),
+        )
+        return {
+            story_path
+            for story_path, story_digest in cursor.fetchall()
+            if story_digest is not None and story_digest == digests.get(story_path)
+        }
+
+    async def claim_next_story(
+        self,
+        epic_path: str,
+        story_paths: list[str],
+        ttl: float = 600.0,
+        exclude: set[str] | None = None,
+    ) -> str | None:
+        """
+        原子地认领下一个可处理的故事。
+
+        在 BEGIN IMMEDIATE 事务中按顺序检查 story_paths，返回第一个未完成且没有有效租约
+        （无租约、已过期、持有者进程已退出或属于自己）的故事，并写入本进程的租约。
+        已完成的故事（完成记录与当前文件内容一致）不再认领。
+
+        Args:
+            epic_path: Epic文件路径
+            story_paths: 按处理顺序排列的候选故事路径
+            ttl: 租约有效期（秒），需要通过 heartbeat_lease 续期
+            exclude: 本进程已处理过、不再认领的故事路径
+
+        Returns:
+            认领成功的故事路径，没有可认领的故事时返回None
+
+        Raises:
+            Exception: 认领事务失败（如数据库持续锁定）；此时没有写入租约，
+                调用方应稍后重试，而不是在无租约的情况下处理故事
+        """
+        candidates = [p for p in story_paths if not exclude or p not in exclude]
+        if not candidates:
+            return None
+        digests = await self._story_digests(candidates)
+
+        async def _claim() -> str | None:
+            async with self._lock:
+                async with self._get_db_connection() as conn:
+                    now = time.time()
+                    cursor = conn.cursor()
+                    cursor.execute("BEGIN IMMEDIATE")
+                    try:
+                        completed = self._completed_among(cursor, digests)
+                        placeholders = ",".join("?" * len(candidates))
+                        cursor.execute(
+                            f"""
+                            SELECT story_path, owner_id, expires_at
+                            FROM story_leases
+                            WHERE story_path IN ({placeholders})
+                            """,
+                            candidates,
+                        )
+                        leases = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+                        for story_path in candidates:
+                            if story_path in completed:
+                                continue
+                            lease = leases.get(story_path)
+                            if lease is not None:
+                                owner, expires_at = lease
+                                if (
+                                    owner != self.owner_id
+                                    and expires_at >= now
+                                    and not self._is_stale_owner(owner)
+                                ):
+                                    continue
+                            cursor.execute(
+                                """
+                                INSERT INTO story_leases
+                                (story_path, epic_path, owner_id, acquired_at,
+                                 heartbeat_at, expires_at)
+                                VALUES (?, ?, ?, ?, ?, ?)
+                                ON CONFLICT(story_path) DO UPDATE SET
+                                    epic_path = excluded.epic_path,
+                                    owner_id = excluded.owner_id,
+                                    acquired_at = excluded.acquired_at,
+                                    heartbeat_at = excluded.heartbeat_at,
+                                    expires_at = excluded.expires_at
+                                """,
+                                (story_path, epic_path, self.owner_id, now, now, now + ttl),
+                            )
+                            conn.commit()
+                            logger.info(f"[Lease] {self.owner_id} claimed {story_path}")
+                            return story_path
+
+                        conn.commit()
+                        return None
+                    except BaseException:
+                        conn.rollback()
+                        raise
+
+        try:
+            if self._connection_pool:
+                await self._ensure_connection_pool_initialized()
+                return await self._connection_pool.retry_on_busy(_claim)
+            return await _claim()
+        except Exception as e:
+            # 没有租约时不能处理故事：交由调用方退避重试
+            logger.error(f"[Lease] Failed to claim next story: {e}")
+            logger.debug(f"Error details: {e}", exc_info=True)
+            raise
+
+    async def record_story_completion(self, epic_path: str, story_path: str) -> bool:
+        """
+        记录故事已成功完成（在释放租约之前调用，避免其他进程在两者之间认领）。
+
+        记录包含故事文件当前内容的哈希；文件之后被修改时记录失效。
+
+        Args:
+            epic_path: Epic文件路径
+            story_path: 故事文件路径
+
+        Returns:
+            是否记录成功
+        """
+        digest = (await self._story_digests([story_path]))[story_path]
+
+        async def _record() -> bool:
+            async with self._lock:
+                async with self._get_db_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(
+                        """
+                        INSERT OR REPLACE INTO story_completions
+                        (story_path, epic_path, owner_id, story_digest, completed_at)
+                        VALUES (?, ?, ?, ?, ?)
+                        """,
+                        (story_path, epic_path, self.owner_id, digest, time.time()),
+                    )
+                    conn.commit()
+                    return True
+
+        try:
+            if self._connection_pool:
+                await self._ensure_connection_pool_initialized()
+                return await self._connection_pool.retry_on_busy(_record)
+            return await _record()
+        except Exception as e:
+            logger.error(f"[Lease] Failed to record completion of {story_path}: {e}")
+            logger.debug(f"Error details: {e}", exc_info=True)
+            return False
+
+    async def get_completed_stories(self, story_paths: list[str]) -> "set[str]":
+        """
+        返回已完成（完成记录与当前文件内容一致）的故事路径。
+
+        Args:
+            story_paths: 故事文件路径
+
+        Returns:
+            已完成的故事路径集合，查询失败时返回空集合
+        """
+        if not story_paths:
+            return set()
+        digests = await self._story_digests(story_paths)
+        try:
+            async with self._lock:
+                async with self._get_db_connection() as conn:
+                    return self._completed_among(conn.cursor(), digests)
+        except Exception as e:
+            logger.error(f"[Lease] Failed to read story completions: {e}")
+            logger.debug(f"Error details: {e}", exc_info=True)
+            return set()
+
+    async def _renew_lease(self, story_path: str, ttl: float) -> bool:
+        """续期租约；仍持有时返回True，数据库错误时抛出异常。"""
+        async def _heartbeat() -> bool:
+            async with self._lock:
+                async with self._get_db_connection() as conn:
+                    now = time.time()
+                    cursor = conn.cursor()
+                    cursor.execute(
+                        """
+                        UPDATE story_leases
+                        SET heartbeat_at = ?, expires_at = ?
+                        WHERE story_path = ? AND owner_id = ?
+                        """,
+                        (now, now + ttl, story_path, self.owner_id),
+                    )
+                    conn.commit()
+                    return cursor.rowcount == 1
+
+        if self._connection_pool:
+            await self._ensure_connection_pool_initialized()
+            return await self._connection_pool.retry_on_busy(_heartbeat)
+        return await _heartbeat()
+
+    async def heartbeat_lease(self, story_path: str, ttl: float = 600.0) -> bool:
+        """
+        续期本进程持有的故事租约。
+
+        Args:
+            story_path: 故事文件路径
+            ttl: 从现在起的租约有效期（秒）
+
+        Returns:
+            仍持有租约时返回True；租约已被其他进程接管或续期失败时返回False
+        """
+        try:
+            held = await self._renew_lease(story_path, ttl)
+            if not held:
+                logger.warning(f"[Lease] Lease lost for {story_path}")
+            return held
+        except Exception as e:
+            logger.error(f"[Lease] Heartbeat failed for {story_path}: {e}")
+            return False
+
+    async def release_lease(self, story_path: str) -> bool:
+        """
+        释放本进程持有的故事租约。
+
+        Args:
+            story_path: 故事文件路径
+
+        Returns:
+            是否释放了租约
+        """
+        async def _release() -> bool:
+            async with self._lock:
+                async with self._get_db_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(
+                        "DELETE FROM story_leases WHERE story_path = ? AND owner_id = ?",
+                        (story_path, self.owner_id),
+                    )
+                    conn.commit()
+                    return cursor.rowcount == 1
+
+        try:
+            if self._connection_pool:
+                await self._ensure_connection_pool_initialized()
+                return await self._connection_pool.retry_on_busy(_release)
+            return await _release()
+        except Exception as e:
+            logger.error(f"[Lease] Failed to release lease for {story_path}: {e}")
+            return False
+
+    @asynccontextmanager
+    async def hold_lease(self, story_path: str, ttl: float = 600.0):
+        """
+        在上下文期间为已认领的故事定期续期租约，退出时释放。
+
+        租约被其他进程接管（或续期持续失败直到租约过期）时，取消上下文所在的任务，
+        并在上下文中抛出 LeaseLostError；若主体吸收了取消，则通过 lease.lost 标记。
+
+        Args:
+            story_path: 已通过 claim_next_story 认领的故事路径
+            ttl: 租约有效期（秒），每 ttl/3 秒续期一次
+
+        Yields:
+            StoryLease: 租约状态（lost 为 True 时不应再记录该故事的结果）
+        """
+        lease = StoryLease(story_path)
+        body_task = asyncio.current_task()
+        # 本处对主体任务发出、尚未撤销的取消请求
+        cancel_requested = False
+
+        async def _heartbeat_loop() -> None:
+            nonlocal cancel_requested
+            renewed_at = time.monotonic()
+            while True:
+                await asyncio.sleep(ttl / 3)
+                try:
+                    held = await self._renew_lease(story_path, ttl)
+                except Exception as e:
+                    # 续期失败时租约仍在有效期内，下次再试
+                    logger.warning(f"[Lease] Heartbeat failed for {story_path}: {e}")
+                    held = time.monotonic() - renewed_at < ttl
+                else:
+                    renewed_at = time.monotonic()
+                if not held:
+                    lease.lost = True
+                    logger.error(
+                        f"[Lease] Lease lost for {story_path}, stopping work on it"
+                    )
+                    if body_task is not None:
+                        cancel_requested = True
+                        body_task.cancel()
+                    return
+
+        heartbeat_task = asyncio.create_task(_heartbeat_loop())
+        try:
+            yield lease
+        except asyncio.CancelledError:
+            if cancel_requested and body_task is not None:
+                cancel_requested = False
+                if body_task.uncancel() == 0:
+                    raise LeaseLostError(f"Lease lost for {story_path}") from None
+            raise
+        finally:
+            heartbeat_task.cancel()
+            try:
+                await heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            if cancel_requested and body_task is not None:
+                # 主体吸收了取消：撤销本处发出的取消请求
+                body_task.uncancel()
+            if not lease.lost:
+                await self.release_lease(story_path)
+
+    # ------------------------------------------------------------------
+    # Epic 章节哈希（增量模式）
+    # ------------------------------------------------------------------
+
+    async def get_section_hashes(self, epic_path: str) -> dict[str, str]:
+        """
+        获取 Epic 各故事章节在最近一次成功处理时的哈希。
+
+        Args:
+            epic_path: Epic 标识
+
+        Returns:
+            {story_number: section_hash}，失败时返回空字典
+        """
+        try:
+            async with self._lock:
+                async with self._get_db_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(
+                        "SELECT story_number, section_hash FROM epic_section_hashes "
+                        "WHERE epic_path = ?",
+                        (epic_path,),
+                    )
+                    return {row[0]: row[1] for row in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"Failed to load section hashes for {epic_path}: {e}")
+            logger.debug("Section hash load error details", exc_info=True)
+            return {}
+
+    async def record_section_hash(
+        self,
+        epic_path: str,
+        story_number: str,
+        section_hash: str,
+        story_path: str | None = None,
+    ) -> bool:
+        """
+        记录故事处理成功时其 Epic 章节的哈希。
+
+        Args:
+            epic_path: Epic 标识
+            story_number: 规范化的故事编号（如 "4.1"）
+            section_hash: 章节内容哈希
+            story_path: 故事文件路径
+
+        Returns:
+            是否记录成功
+        """
+        try:
+            async with self._lock:
+                async with self._get_db_connection() as conn:
+                    conn.execute(
+                        """
+                        INSERT INTO epic_section_hashes
+                            (epic_path, story_number, section_hash, story_path, recorded_at)
+                        VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT(epic_path, story_number) DO UPDATE SET
+                            section_hash = excluded.section_hash,
+                            story_path = excluded.story_path,
+                            recorded_at = excluded.recorded_at
+                        """,
+                        (epic_path, story_number, section_hash, story_path, time.time()),
+                    )
+                    conn.commit()
+                    return True
+        except Exception as e:
+            logger.error(f"Failed to record section hash for {story_number}: {e}")
+            logger.debug("Section hash record error details", exc_info=True)
+            return False
+
+    # ------------------------------------------------------------------
+    # 质量门指纹缓存
+    # ------------------------------------------------------------------
+
+    async def get_gate_fingerprint(self, gate: str, scope: str) -> str | None:
+        """
+        获取质量门最近一次通过时的指纹。
+
+        Args:
+            gate: 质量门名称（ruff / basedpyright / ruff_format / pytest）
+            scope: 检查范围标识（规范化的目录路径）
+
+        Returns:
+            指纹，未记录或失败时返回 None
+        """
+        try:
+            async with self._lock:
+                async with self._get_db_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(
+                        "SELECT fingerprint FROM quality_gate_cache "
+                        "WHERE gate = ? AND scope = ?",
+                        (gate, scope),
+                    )
+                    row = cursor.fetchone()
+                    return row[0] if row else None
+        except Exception as e:
+            logger.error(f"Failed to load gate fingerprint for {gate}: {e}")
+            logger.debug("Gate fingerprint load error details", exc_info=True)
+            return None
+
+    async def record_gate_fingerprint(self, gate: str, scope: str, fingerprint: str) -> bool:
+        """
+        记录质量门通过时的指纹。
+
+        Args:
+            gate: 质量门名称
+            scope: 检查范围标识
+            fingerprint: 源码树指纹
+
+        Returns:
+            是否记录成功
+        """
+        try:
+            async with self._lock:
+                async with self._get_db_connection() as conn:
+                    conn.execute(
+                        """
+                        INSERT INTO quality_gate_cache (gate, scope, fingerprint, recorded_at)
+                        VALUES (?, ?, ?, ?)
+                        ON CONFLICT(gate, scope) DO UPDATE SET
+                            fingerprint = excluded.fingerprint,
+                            recorded_at = excluded.recorded_at
+                        """,
+                        (gate, scope, fingerprint, time.time()),
+                    )
+                    conn.commit()
+                    return True
+        except Exception as e:
+            logger.error(f"Failed to record gate fingerprint for {gate}: {e}")
+            logger.debug("Gate fingerprint record error details", exc_info=True)
+            return False
+
+    async def get_file_fingerprints(
+        self, paths: list[str]
+    ) -> dict[str, "tuple[int, int, str]"]:
+        """
+        获取文件的已知内容哈希。
+
+        Args:
+            paths: 绝对文件路径
+
+        Returns:
+            {path: (size, mtime_ns, sha256)}，失败时返回空字典
+        """
+        try:
+            async with self._lock:
+                async with self._get_db_connection() as conn:
+                    cursor = conn.cursor()
+                    known: dict[str, tuple[int, int, str]] = {}
+                    # 分批查询，避免超过 SQLite 参数数量上限
+                    for i in range(0, len(paths), 500):
+                        chunk = paths[i:i + 500]
+                        cursor.execute(
+                            "SELECT path, size, mtime_ns, sha256 FROM file_fingerprints "
+                            f"WHERE path IN ({','.join('?' * len(chunk))})",
+                            chunk,
+                        )
+                        for path, size, mtime_ns, sha256 in cursor.fetchall():
+                            known[path] = (size, mtime_ns, sha256)
+                    return known
+        except Exception as e:
+            logger.error(f"Failed to load file fingerprints: {e}")
+            logger.debug("File fingerprint load error details", exc_info=True)
+            return {}
+
+    async def record_file_fingerprints(
+        self, entries: list[tuple[str, int, int, str]]
+    ) -> bool:
+        """
+        记录文件内容哈希。
+
+        Args:
+            entries: (path, size, mtime_ns, sha256) 列表
+
+        Returns:
+            是否记录成功
+        """
+        if not entries:
+            return True
+        try:
+            async with self._lock:
+                async with self._get_db_connection() as conn:
+                    conn.executemany(
+                        """
+                        INSERT INTO file_fingerprints (path, size, mtime_ns, sha256)
+                        VALUES (?, ?, ?, ?)
+                        ON CONFLICT(path) DO UPDATE SET
+                            size = excluded.size,
+                            mtime_ns = excluded.mtime_ns,
+                            sha256 = excluded.sha256
+                        """,
+                        entries,
+                    )
+                    conn.commit()
+                    return True
+        except Exception as e:
+            logger.error(f"Failed to record file fingerprints: {e}")
+            logger.debug("File fingerprint record error details", exc_info=True)
+            return False
+
     def get_health_status(self) -> "dict[str, Any]":
         """
         获取数据库健康状态。
@@ -1015,6 +1978,9 @@ class StateManager:
                 "connection_pool_size": self._connection_pool.max_connections
                 if self._connection_pool
                 else 0,
+                "connection_pool_metrics": self._connection_pool.get_metrics()
+                if self._connection_pool
+                else {},
             }
         except Exception as e:
             logger.error(f"Failed to get health status: {e}")
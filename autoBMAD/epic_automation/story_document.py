@@ -0,0 +1,212 @@
+"""Module for parsing story markdown files into a structured document model."""
+
+import re
+from functools import cached_property
+from pathlib import Path
+
+from autoBMAD.epic_automation.doc_parser import DocumentParser
+from autoBMAD.epic_automation.file_identity_cache import FileIdentityCache
+
+_STATUS_LINE_RE = re.compile(r"^\*\*Status\*\*:\s*(.+)$", re.MULTILINE)
+_NUMBERED_ITEM_RE = re.compile(r"^\d+\.")
+_TASK_RE = re.compile(r"^- \[[ xX]\]\s*Task \d+:\s*(.+)$")
+_SUBTASK_RE = re.compile(r"^\s*-\s*\[x\]\s*(.+)")
+# Opening/closing line of a fenced code block (``` or ~~~, indented up to 3 spaces)
+_FENCE_RE = re.compile(r"^[ ]{0,3}(`{3,}|~{3,})")
+
+
+class StoryDocument(DocumentParser):
+    """A story markdown file split into sections in a single pass.
+
+    Sections are keyed by their level-2 heading text ("## Acceptance Criteria"
+    -> "Acceptance Criteria") and include any deeper subsections. Lines inside
+    fenced code blocks are never headings (e.g. Python comments in Dev Notes,
+    or a "## Status" in a markdown example). Accessors are computed lazily from
+    the sections and cached on the instance, so a document must not be modified
+    after it has been parsed.
+    """
+
+    def __init__(self, file_path: Path | None = None, content: str | None = None):
+        """Initialize the StoryDocument.
+
+        Args:
+            file_path: Path to the story file.
+            content: Story content; read from ``file_path`` when omitted.
+        """
+        super().__init__(file_path or Path())
+        if content is not None:
+            self.content = content
+        elif file_path is not None:
+            self.read_file()
+        self.title_line: str = ""
+        self.headings: list[tuple[int, str]] = []
+        self.sections: dict[str, str] = {}
+        self._split_sections()
+
+    @classmethod
+    def from_content(cls, content: str, file_path: Path | None = None) -> "StoryDocument":
+        """Build a document from already loaded content.
+
+        Args:
+            content: Story markdown.
+            file_path: Optional path the content was read from.
+
+        Returns:
+            The parsed document.
+        """
+        return cls(file_path, content)
+
+    @classmethod
+    def load(cls, file_path: str | Path) -> "StoryDocument":
+        """Load a story file, reusing the cached document while it is unchanged.
+
+        Args:
+            file_path: Path to the story file.
+
+        Returns:
+            The parsed document (shared; do not modify).
+        """
+        return _document_cache.load(Path(file_path))
+
+    def _split_sections(self) -> None:
+        """Split the content into headings and level-2 sections in one pass."""
+        current: str | None = None
+        body: list[str] = []
+        fence: str | None = None
+        for line in self.content.splitlines():
+            marker = _FENCE_RE.match(line)
+            if marker:
+                if fence is None:
+                    fence = marker.group(1)
+                elif marker.group(1)[0] == fence[0] and len(marker.group(1)) >= len(fence):
+                    fence = None
+            elif fence is None and line.startswith("#"):
+                level = len(line) - len(line.lstrip("#"))
+                text = line[level:].strip()
+                self.headings.append((level, text))
+                if level == 1 and not self.title_line:
+                    self.title_line = text
+                if level == 2:
+                    if current is not None:
+                        self.sections[current] = "\n".join(body).strip()
+                    current = text
+                    body = []
+                    continue
+            if current is not None:
+                body.append(line)
+        if current is not None:
+            self.sections[current] = "\n".join(body).strip()
+
+    def section(self, name: str) -> str | None:
+        """Return the body of a level-2 section.
+
+        Args:
+            name: Heading text, e.g. "Dev Notes".
+
+        Returns:
+            The section body, or None if the section does not exist.
+        """
+        return self.sections.get(name)
+
+    def has_section(self, name: str) -> bool:
+        """Check whether a level-2 section whose heading starts with ``name`` exists."""
+        return any(heading.startswith(name) for heading in self.sections)
+
+    def _section_lines(self, name: str) -> list[str]:
+        body = self.sections.get(name)
+        if not body:
+            return []
+        return [line.strip() for line in body.splitlines() if line.strip()]
+
+    @cached_property
+    def title(self) -> str:
+        """The story title: the first level-1 heading after its "Story x.y:" prefix."""
+        if ":" in self.title_line:
+            return self.title_line.rsplit(":", 1)[1].strip()
+        return self.title_line
+
+    @cached_property
+    def status(self) -> str | None:
+        """The raw status value, e.g. "Ready for Review"."""
+        for line in self._section_lines("Status"):
+            value = line
+            if ":" in value and value.lstrip("*").lower().startswith("status"):
+                value = value.split(":", 1)[1]
+            value = value.strip().strip("*").strip()
+            if value:
+                return value
+        match = _STATUS_LINE_RE.search(self.content)
+        if match:
+            return match.group(1).strip().strip("*").strip()
+        return None
+
+    @cached_property
+    def acceptance_criteria(self) -> list[str]:
+        """Numbered acceptance criteria, or bullet items if none are numbered."""
+        lines = self._section_lines("Acceptance Criteria")
+        numbered = [line for line in lines if _NUMBERED_ITEM_RE.match(line)]
+        return numbered or [line for line in lines if line.startswith("-")]
+
+    @cached_property
+    def tasks(self) -> list[str]:
+        """Top-level checklist items of the "Tasks / Subtasks" section."""
+        body = self.sections.get("Tasks / Subtasks", "")
+        return [line.strip() for line in body.splitlines() if line.startswith("- [")]
+
+    @cached_property
+    def task_titles(self) -> list[str]:
+        """Titles of "- [ ] Task N: title" items."""
+        titles: list[str] = []
+        for line in self.tasks:
+            match = _TASK_RE.match(line)
+            if match:
+                titles.append(match.group(1).strip())
+        return titles
+
+    @cached_property
+    def subtasks(self) -> list[str]:
+        """Checked checklist items anywhere in the document."""
+        return [line.strip() for line in self.content.splitlines() if _SUBTASK_RE.match(line)]
+
+    @property
+    def dev_notes(self) -> str:
+        """The "Dev Notes" section body."""
+        return self.sections.get("Dev Notes", "")
+
+    @property
+    def testing(self) -> str:
+        """The "Testing" section body."""
+        return self.sections.get("Testing", "")
+
+    @property
+    def dev_agent_record(self) -> str:
+        """The "Dev Agent Record" section body."""
+        return self.sections.get("Dev Agent Record", "")
+
+
+class _StoryDocumentCache(FileIdentityCache[StoryDocument]):
+    """Process-wide cache of parsed story documents keyed on file identity."""
+
+    def __init__(self) -> None:
+        super().__init__(max_entries=256)
+
+    def load(self, file_path: Path) -> StoryDocument:
+        # Identity is taken before reading: a write during the read changes it
+        identity = self.file_identity(file_path)
+        document = self.get(file_path, "document", identity)
+        if document is None:
+            document = StoryDocument(file_path, file_path.read_text(encoding="utf-8"))
+            self.put(file_path, "document", identity, document)
+        return document
+
+
+_document_cache = _StoryDocumentCache()
+
+
+def invalidate_story_document(file_path: str | Path | None = None) -> None:
+    """Drop a cached story document (or all of them).
+
+    Args:
+        file_path: Story file to drop; all entries when None.
+    """
+    _document_cache.invalidate(file_path)
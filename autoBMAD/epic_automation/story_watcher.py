@@ -0,0 +1,179 @@
+"""Module for waiting on story status changes.
+
+On Linux the story's directory is watched with inotify, so a write by an agent
+wakes the waiter immediately. Elsewhere (or if inotify is unavailable) the
+file identity is polled; in both cases the status is only re-parsed when the
+file actually changed.
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+import sys
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
+from autoBMAD.epic_automation.agents.state_agent import (
+    parse_status_from_file,
+    story_status_cache,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 0.2
+
+# Status parser: story path -> core status (None if it cannot be parsed)
+StatusParser = Callable[[str], Awaitable[str | None]]
+
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _load_libc() -> ctypes.CDLL | None:
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        # Probe for the symbols (AttributeError if missing)
+        libc.inotify_init1  # noqa: B018
+        libc.inotify_add_watch  # noqa: B018
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+_libc = _load_libc()
+
+
+class _InotifyWatch:
+    """inotify watch on a story's directory, filtered to the story's file name.
+
+    Watching the directory (not the file) also catches editors and agents that
+    replace the file via rename.
+    """
+
+    def __init__(self, path: Path):
+        assert _libc is not None
+        self._name = os.fsencode(path.name)
+        self._fd = _libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = _libc.inotify_add_watch(self._fd, os.fsencode(str(path.parent)), _WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, f"inotify_add_watch failed for {path.parent}")
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        self._loop.add_reader(self._fd, self._on_readable)
+
+    def _on_readable(self) -> None:
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, _, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+            start = offset + _EVENT_HEADER.size
+            name = data[start:start + name_len].rstrip(b"\0")
+            offset = start + name_len
+            if name == self._name:
+                self._changed.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait until the file is touched; False on timeout."""
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except TimeoutError:
+            return False
+        self._changed.clear()
+        return True
+
+    def close(self) -> None:
+        self._loop.remove_reader(self._fd)
+        os.close(self._fd)
+
+
+def _open_watch(path: Path) -> _InotifyWatch | None:
+    if _libc is None:
+        return None
+    try:
+        return _InotifyWatch(path)
+    except (OSError, RuntimeError, NotImplementedError) as e:
+        # NotImplementedError: event loop without add_reader support
+        logger.debug(f"inotify unavailable for {path}, polling instead: {e}")
+        return None
+
+
+async def _parse_from_header(story_path: str) -> str:
+    return parse_status_from_file(story_path)
+
+
+async def wait_for_status_change(
+    story_path: str | Path,
+    timeout: float,
+    previous_status: str | None = None,
+    parse_status: StatusParser | None = None,
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+) -> str | None:
+    """Wait until the story's status differs from ``previous_status``.
+
+    The status is parsed once up front (a change made before the call returns
+    immediately) and then only after the file changes.
+
+    Args:
+        story_path: Story file.
+        timeout: Maximum time to wait in seconds.
+        previous_status: Status to compare against; the current status when
+            omitted.
+        parse_status: Async status parser; header regex parser by default.
+        poll_interval: Polling interval when inotify is not available.
+
+    Returns:
+        The new status, or None if it did not change within ``timeout``.
+    """
+    path = Path(story_path)
+    parse = parse_status or _parse_from_header
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+
+    # Watch before the first parse so no write can slip in between
+    watch = _open_watch(path)
+    try:
+        identity = None if watch is not None else story_status_cache.file_identity(path)
+        status = await parse(str(story_path))
+        if previous_status is None:
+            previous_status = status
+        elif status != previous_status:
+            return status
+
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            if watch is not None:
+                # An event is itself the change signal, even within one mtime tick
+                if not await watch.wait(remaining):
+                    return None
+            else:
+                await asyncio.sleep(min(poll_interval, remaining))
+                new_identity = story_status_cache.file_identity(path)
+                if new_identity == identity:
+                    continue
+                identity = new_identity
+            status = await parse(str(story_path))
+            if status != previous_status:
+                return status
+    finally:
+        if watch is not None:
+            watch.close()
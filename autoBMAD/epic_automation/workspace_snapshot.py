@@ -0,0 +1,102 @@
+"""Module for cheap snapshots of the working tree.
+
+A snapshot records (size, mtime_ns) for every file under a set of roots, so
+two snapshots can be compared to tell whether, and which, files changed
+without reading file contents.
+"""
+
+import hashlib
+import os
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# Directories that never hold source changes made by an agent
+DEFAULT_EXCLUDED_DIRS = frozenset({
+    ".git", ".hg", ".svn", "__pycache__", ".pytest_cache", ".ruff_cache",
+    ".mypy_cache", ".venv", "venv", "node_modules", ".tox", "logs",
+})
+
+# File stat signature: (st_size, st_mtime_ns)
+FileSignature = tuple[int, int]
+
+
+@dataclass(frozen=True)
+class WorkspaceSnapshot:
+    """Stat signatures of the files under one or more roots.
+
+    Attributes:
+        files: Mapping of absolute file path to (size, mtime_ns).
+    """
+
+    files: dict[str, FileSignature] = field(default_factory=dict)
+
+    @classmethod
+    def take(
+        cls,
+        roots: Iterable[str | Path],
+        excluded_dirs: frozenset[str] = DEFAULT_EXCLUDED_DIRS,
+    ) -> "WorkspaceSnapshot":
+        """Stat every file under the given roots.
+
+        Missing roots are skipped; a root may also be a single file.
+
+        Args:
+            roots: Directories (or files) to snapshot.
+            excluded_dirs: Directory names that are not descended into.
+
+        Returns:
+            The snapshot.
+        """
+        files: dict[str, FileSignature] = {}
+        for root in dict.fromkeys(os.path.abspath(r) for r in roots):
+            if os.path.isfile(root):
+                cls._add(files, root)
+                continue
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames[:] = [d for d in dirnames if d not in excluded_dirs]
+                for name in filenames:
+                    cls._add(files, os.path.join(dirpath, name))
+        return cls(files)
+
+    @staticmethod
+    def _add(files: dict[str, FileSignature], path: str) -> None:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        files[path] = (st.st_size, st.st_mtime_ns)
+
+    @property
+    def digest(self) -> str:
+        """SHA-256 over the sorted (path, size, mtime_ns) entries."""
+        h = hashlib.sha256()
+        for path in sorted(self.files):
+            size, mtime_ns = self.files[path]
+            h.update(f"{path}\0{size}\0{mtime_ns}\n".encode("utf-8", "surrogateescape"))
+        return h.hexdigest()
+
+    def changed_files(self, later: "WorkspaceSnapshot") -> list[str]:
+        """Files added, removed or modified between this snapshot and ``later``.
+
+        Args:
+            later: A snapshot taken after this one.
+
+        Returns:
+            Sorted absolute paths.
+        """
+        changed = {
+            path for path, signature in later.files.items()
+            if self.files.get(path) != signature
+        }
+        changed.update(path for path in self.files if path not in later.files)
+        return sorted(changed)
+
+
+def file_digest(path: str | Path) -> str | None:
+    """SHA-256 of a file's content, or None if it cannot be read."""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+    except OSError:
+        return None